@@ -9,13 +9,19 @@
 #----------------------------------------------------------------------
 
 import lldb
+import array
+import bisect
+import collections
 import commands
+import itertools
 import optparse
 import os
 import os.path
 import re
 import shlex
 import string
+import struct
+import sys
 import tempfile
 import lldb.utils.symbolication
 
@@ -253,6 +259,8 @@ def type_flags_to_string(type_flags):
         type_str = 'segment'
     elif type_flags & 64:
         type_str = 'vm_region'
+    elif type_flags & 128:
+        type_str = 'region'
     else:
         type_str = hex(type_flags)
     return type_str
@@ -274,6 +282,9 @@ def type_flags_to_description(type_flags, ptr_addr, ptr_size, offset):
     elif type_flags & 64:
         sb_addr = lldb.debugger.GetSelectedTarget().ResolveLoadAddress(ptr_addr + offset)
         type_str = 'vm_region [%#x - %#x), %s + %u, %s' % (ptr_addr, ptr_addr + ptr_size, sb_addr.section.name, sb_addr.offset, sb_addr)
+    elif type_flags & 128:
+        type_str = 'region [%#x - %#x)' % (ptr_addr, ptr_addr + ptr_size)
+        show_offset = True
     else:
         type_str = '%#x' % (ptr_addr,)
         show_offset = True
@@ -430,6 +441,124 @@ info''' % (options.max_frames, options.max_history, addr);
         result.AppendMessage('error: expression failed "%s" => %s' % (expr, expr_sbvalue.error))
 
 
+def display_match_entry (result, options, process, target, malloc_sbvalue, malloc_addr, malloc_size, offset, type_flags):
+    '''Display a single match in the malloc block (or other memory range) at
+    "malloc_addr" that is "offset" bytes into it. "malloc_sbvalue" is a
+    pointer to the block that is used to figure out the dynamic type of the
+    block and can be None. Returns True if the match was displayed.'''
+    print_entry = True
+    description = None
+    if options.offset >= 0 and options.offset != offset:
+        print_entry = False
+    else:                    
+        match_addr = malloc_addr + offset
+        #result.AppendMessage (hex(malloc_addr + offset))
+        if type_flags == 64:
+            search_stack_old = options.search_stack
+            search_segments_old = options.search_segments
+            search_heap_old = options.search_heap
+            search_vm_regions = options.search_vm_regions
+            options.search_stack = True
+            options.search_segments = True
+            options.search_heap = True
+            options.search_vm_regions = False
+            if malloc_info_impl (lldb.debugger, result, options, [hex(malloc_addr + offset)]):
+                print_entry = False
+            options.search_stack = search_stack_old
+            options.search_segments = search_segments_old
+            options.search_heap = search_heap_old
+            options.search_vm_regions = search_vm_regions
+        if print_entry:
+            description = '%#16.16x: %s' % (match_addr, type_flags_to_description(type_flags, malloc_addr, malloc_size, offset))
+            if options.show_size:
+                description += ' <%5u>' % (malloc_size)
+            if options.show_range:
+                description += ' [%#x - %#x)' % (malloc_addr, malloc_addr + malloc_size)
+            derefed_dynamic_value = None
+            dynamic_value = None
+            if malloc_sbvalue:
+                dynamic_value = malloc_sbvalue.GetDynamicValue(lldb.eDynamicCanRunTarget)
+            if dynamic_value is None:
+                # Scanned memory isn't a malloc block, so there is no type to show
+                pass
+            elif dynamic_value.type.name == 'void *':
+                if options.type == 'pointer' and malloc_size == 4096:
+                    error = lldb.SBError()
+                    data = bytearray(process.ReadMemory(malloc_addr, 16, error))
+                    if data == '\xa1\xa1\xa1\xa1AUTORELEASE!':
+                        ptr_size = target.addr_size
+                        thread = process.ReadUnsignedFromMemory (malloc_addr + 16 + ptr_size, ptr_size, error)
+                        #   4 bytes  0xa1a1a1a1
+                        #  12 bytes  'AUTORELEASE!'
+                        # ptr bytes  autorelease insertion point
+                        # ptr bytes  pthread_t
+                        # ptr bytes  next colder page
+                        # ptr bytes  next hotter page
+                        #   4 bytes  this page's depth in the list
+                        #   4 bytes  high-water mark
+                        description += ' AUTORELEASE! for pthread_t %#x' % (thread)
+                #     else:
+                #         description += 'malloc(%u)' % (malloc_size)
+                # else:
+                #     description += 'malloc(%u)' % (malloc_size)
+            else:
+                derefed_dynamic_value = dynamic_value.deref
+                if derefed_dynamic_value:                        
+                    derefed_dynamic_type = derefed_dynamic_value.type
+                    derefed_dynamic_type_size = derefed_dynamic_type.size
+                    derefed_dynamic_type_name = derefed_dynamic_type.name
+                    description += ' '
+                    description += derefed_dynamic_type_name
+                    if offset < derefed_dynamic_type_size:
+                        member_list = list();
+                        get_member_types_for_offset (derefed_dynamic_type, offset, member_list)
+                        if member_list:
+                            member_path = ''
+                            for member in member_list:
+                                member_name = member.name
+                                if member_name: 
+                                    if member_path:
+                                        member_path += '.'
+                                    member_path += member_name
+                            if member_path:
+                                if options.ivar_regex_blacklist:
+                                    for ivar_regex in options.ivar_regex_blacklist:
+                                        if ivar_regex.match(member_path):
+                                            print_entry = False
+                                description += '.%s' % (member_path)
+                    else:
+                        description += '%u bytes after %s' % (offset - derefed_dynamic_type_size, derefed_dynamic_type_name)
+                else:
+                    # strip the "*" from the end of the name since we were unable to dereference this
+                    description += dynamic_value.type.name[0:-1]
+    if print_entry:
+        result_output = ''
+        if description:
+            result_output += description
+            if options.print_type and derefed_dynamic_value:
+                result_output += ' %s' % (derefed_dynamic_value)
+            if options.print_object_description and dynamic_value:
+                desc = dynamic_value.GetObjectDescription()
+                if desc:
+                    result_output += '\n%s' % (desc)
+        if result_output:
+            result.AppendMessage(result_output)
+        if options.memory:
+            cmd_result = lldb.SBCommandReturnObject()
+            if options.format == None:
+                memory_command = "memory read --force 0x%x 0x%x" % (malloc_addr, malloc_addr + malloc_size)
+            else:
+                memory_command = "memory read --force -f %s 0x%x 0x%x" % (options.format, malloc_addr, malloc_addr + malloc_size)
+            if options.verbose:
+                result.AppendMessage(memory_command)
+            lldb.debugger.GetCommandInterpreter().HandleCommand(memory_command, cmd_result)
+            result.AppendMessage(cmd_result.GetOutput())
+        if options.stack_history:
+            dump_stack_history_entries(options, result, malloc_addr, 1)
+        elif options.stack:
+            dump_stack_history_entries(options, result, malloc_addr, 0)
+    return print_entry
+
 def display_match_results (result, options, arg_str_description, expr, print_no_matches = True):
     frame = lldb.debugger.GetSelectedTarget().GetProcess().GetSelectedThread().GetSelectedFrame()
     if not frame:
@@ -452,7 +581,6 @@ def display_match_results (result, options, arg_str_description, expr, print_no_
             i = 0
             match_idx = 0
             while 1:
-                print_entry = True
                 match_entry = match_value[i]; i += 1
                 if i > options.max_matches:
                     result.AppendMessage('warning: the max number of matches (%u) was reached, use the --max-matches option to get more results' % (options.max_matches))
@@ -462,115 +590,9 @@ def display_match_results (result, options, arg_str_description, expr, print_no_
                     break
                 malloc_size = int(match_entry.size)
                 offset = int(match_entry.offset)
-                
-                if options.offset >= 0 and options.offset != offset:
-                    print_entry = False
-                else:                    
-                    match_addr = malloc_addr + offset
-                    type_flags = int(match_entry.type)
-                    #result.AppendMessage (hex(malloc_addr + offset))
-                    if type_flags == 64:
-                        search_stack_old = options.search_stack
-                        search_segments_old = options.search_segments
-                        search_heap_old = options.search_heap
-                        search_vm_regions = options.search_vm_regions
-                        options.search_stack = True
-                        options.search_segments = True
-                        options.search_heap = True
-                        options.search_vm_regions = False
-                        if malloc_info_impl (lldb.debugger, result, options, [hex(malloc_addr + offset)]):
-                            print_entry = False
-                        options.search_stack = search_stack_old
-                        options.search_segments = search_segments_old
-                        options.search_heap = search_heap_old
-                        options.search_vm_regions = search_vm_regions
-                    if print_entry:
-                        description = '%#16.16x: %s' % (match_addr, type_flags_to_description(type_flags, malloc_addr, malloc_size, offset))
-                        if options.show_size:
-                            description += ' <%5u>' % (malloc_size)
-                        if options.show_range:
-                            description += ' [%#x - %#x)' % (malloc_addr, malloc_addr + malloc_size)
-                        derefed_dynamic_value = None
-                        dynamic_value = match_entry.addr.sbvalue.GetDynamicValue(lldb.eDynamicCanRunTarget)
-                        if dynamic_value.type.name == 'void *':
-                            if options.type == 'pointer' and malloc_size == 4096:
-                                error = lldb.SBError()
-                                process = expr_sbvalue.GetProcess()
-                                target = expr_sbvalue.GetTarget()
-                                data = bytearray(process.ReadMemory(malloc_addr, 16, error))
-                                if data == '\xa1\xa1\xa1\xa1AUTORELEASE!':
-                                    ptr_size = target.addr_size
-                                    thread = process.ReadUnsignedFromMemory (malloc_addr + 16 + ptr_size, ptr_size, error)
-                                    #   4 bytes  0xa1a1a1a1
-                                    #  12 bytes  'AUTORELEASE!'
-                                    # ptr bytes  autorelease insertion point
-                                    # ptr bytes  pthread_t
-                                    # ptr bytes  next colder page
-                                    # ptr bytes  next hotter page
-                                    #   4 bytes  this page's depth in the list
-                                    #   4 bytes  high-water mark
-                                    description += ' AUTORELEASE! for pthread_t %#x' % (thread)
-                            #     else:
-                            #         description += 'malloc(%u)' % (malloc_size)
-                            # else:
-                            #     description += 'malloc(%u)' % (malloc_size)
-                        else:
-                            derefed_dynamic_value = dynamic_value.deref
-                            if derefed_dynamic_value:                        
-                                derefed_dynamic_type = derefed_dynamic_value.type
-                                derefed_dynamic_type_size = derefed_dynamic_type.size
-                                derefed_dynamic_type_name = derefed_dynamic_type.name
-                                description += ' '
-                                description += derefed_dynamic_type_name
-                                if offset < derefed_dynamic_type_size:
-                                    member_list = list();
-                                    get_member_types_for_offset (derefed_dynamic_type, offset, member_list)
-                                    if member_list:
-                                        member_path = ''
-                                        for member in member_list:
-                                            member_name = member.name
-                                            if member_name: 
-                                                if member_path:
-                                                    member_path += '.'
-                                                member_path += member_name
-                                        if member_path:
-                                            if options.ivar_regex_blacklist:
-                                                for ivar_regex in options.ivar_regex_blacklist:
-                                                    if ivar_regex.match(member_path):
-                                                        print_entry = False
-                                            description += '.%s' % (member_path)
-                                else:
-                                    description += '%u bytes after %s' % (offset - derefed_dynamic_type_size, derefed_dynamic_type_name)
-                            else:
-                                # strip the "*" from the end of the name since we were unable to dereference this
-                                description += dynamic_value.type.name[0:-1]
-                if print_entry:
+                type_flags = int(match_entry.type)
+                if display_match_entry (result, options, expr_sbvalue.GetProcess(), expr_sbvalue.GetTarget(), match_entry.addr.sbvalue, malloc_addr, malloc_size, offset, type_flags):
                     match_idx += 1
-                    result_output = ''
-                    if description:
-                        result_output += description
-                        if options.print_type and derefed_dynamic_value:
-                            result_output += ' %s' % (derefed_dynamic_value)
-                        if options.print_object_description and dynamic_value:
-                            desc = dynamic_value.GetObjectDescription()
-                            if desc:
-                                result_output += '\n%s' % (desc)
-                    if result_output:
-                        result.AppendMessage(result_output)
-                    if options.memory:
-                        cmd_result = lldb.SBCommandReturnObject()
-                        if options.format == None:
-                            memory_command = "memory read --force 0x%x 0x%x" % (malloc_addr, malloc_addr + malloc_size)
-                        else:
-                            memory_command = "memory read --force -f %s 0x%x 0x%x" % (options.format, malloc_addr, malloc_addr + malloc_size)
-                        if options.verbose:
-                            result.AppendMessage(memory_command)
-                        lldb.debugger.GetCommandInterpreter().HandleCommand(memory_command, cmd_result)
-                        result.AppendMessage(cmd_result.GetOutput())
-                    if options.stack_history:
-                        dump_stack_history_entries(options, result, malloc_addr, 1)
-                    elif options.stack:
-                        dump_stack_history_entries(options, result, malloc_addr, 0)
             return i
         elif print_no_matches:
             result.AppendMessage('no matches found for %s' % (arg_str_description))
@@ -578,6 +600,553 @@ def display_match_results (result, options, arg_str_description, expr, print_no_
         result.AppendMessage(str(expr_sbvalue.error))
     return 0
     
+g_memory_region_regex = re.compile('response: start:([0-9a-fA-F]+);size:([0-9a-fA-F]+);(permissions:([-rwx]*);)?')
+
+def get_gdb_remote_writable_regions(debugger):
+    '''Get the writable memory regions of a GDB remote process by sending
+    "qMemoryRegionInfo" packets, returns an empty list if the process
+    doesn't support them.'''
+    regions = list()
+    interpreter = debugger.GetCommandInterpreter()
+    addr = 0
+    while True:
+        cmd_result = lldb.SBCommandReturnObject()
+        interpreter.HandleCommand('process plugin packet send qMemoryRegionInfo:%x' % addr, cmd_result)
+        match = g_memory_region_regex.search(cmd_result.GetOutput() or '')
+        if not match:
+            break
+        start_addr = int(match.group(1), 16)
+        end_addr = start_addr + int(match.group(2), 16)
+        if end_addr <= addr:
+            break
+        permissions = match.group(4)
+        if permissions is None or 'w' in permissions:
+            regions.append((start_addr, end_addr))
+        addr = end_addr
+    return regions
+
+def get_proc_maps_writable_regions(pid):
+    '''Get the writable memory regions of a local linux process from
+    /proc/<pid>/maps, returns an empty list if the file can't be read.'''
+    regions = list()
+    try:
+        maps_file = open('/proc/%u/maps' % pid)
+    except IOError:
+        return regions
+    for line in maps_file:
+        fields = line.split()
+        if len(fields) >= 2 and 'w' in fields[1]:
+            (start_addr, end_addr) = fields[0].split('-')
+            regions.append((int(start_addr, 16), int(end_addr, 16)))
+    maps_file.close()
+    return regions
+
+def get_elf_core_writable_regions(core_path):
+    '''Get the writable PT_LOAD segments of an ELF core file'''
+    regions = list()
+    f = open(core_path, 'rb')
+    ident = f.read(16)
+    if len(ident) < 16 or ident[0:4] != '\x7fELF':
+        f.close()
+        raise ValueError('"%s" is not an ELF file' % core_path)
+    if ident[5] == '\x02':
+        byte_order = '>'
+    else:
+        byte_order = '<'
+    is_64 = ident[4] == '\x02'
+    if is_64:
+        f.seek(32)
+        (e_phoff, ) = struct.unpack(byte_order + 'Q', f.read(8))
+        f.seek(54)
+        # p_type, p_flags, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz
+        phdr_format = byte_order + 'IIQQQQQ'
+    else:
+        f.seek(28)
+        (e_phoff, ) = struct.unpack(byte_order + 'I', f.read(4))
+        f.seek(42)
+        # p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags
+        phdr_format = byte_order + 'IIIIIII'
+    (e_phentsize, e_phnum) = struct.unpack(byte_order + 'HH', f.read(4))
+    phdr_size = struct.calcsize(phdr_format)
+    for phdr_idx in range(e_phnum):
+        f.seek(e_phoff + phdr_idx * e_phentsize)
+        phdr = struct.unpack(phdr_format, f.read(phdr_size))
+        if is_64:
+            (p_type, p_flags, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz) = phdr
+        else:
+            (p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags) = phdr
+        # PT_LOAD segments that are writable (PF_W) and have contents in the core file
+        if p_type == 1 and p_flags & 2 and p_filesz > 0:
+            regions.append((p_vaddr, p_vaddr + p_filesz))
+    f.close()
+    return regions
+
+def get_writable_sections_and_stacks(process):
+    '''Get the data sections of all modules and the stacks of all threads,
+    used when the memory regions of the process can't be enumerated.'''
+    regions = list()
+    target = process.target
+    for module in target.modules:
+        for section in module.sections:
+            name = section.name
+            if name not in ('__TEXT', '__LINKEDIT', '__PAGEZERO', '.text'):
+                base = section.GetLoadAddress(target)
+                size = section.GetByteSize()
+                if base != lldb.LLDB_INVALID_ADDRESS and size > 0:
+                    regions.append((base, base + size))
+    for thread in process:
+        if thread.GetNumFrames() == 0:
+            continue
+        min_sp = thread.frame[0].sp
+        max_sp = min_sp
+        for frame in thread.frames:
+            sp = frame.sp
+            if sp < min_sp: min_sp = sp
+            if sp > max_sp: max_sp = sp
+        min_sp -= target.GetStackRedZoneSize()
+        if min_sp < max_sp:
+            regions.append((min_sp, max_sp))
+    return regions
+
+def merge_overlapping_regions(regions):
+    '''Sort the (start_addr, end_addr) tuples in "regions" and merge the
+    ones that overlap, so no memory is scanned twice'''
+    merged = list()
+    for (start_addr, end_addr) in sorted(regions):
+        if merged and start_addr < merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end_addr))
+        else:
+            merged.append((start_addr, end_addr))
+    return merged
+
+def get_scan_regions(debugger, process, options):
+    '''Get the writable memory regions to scan for pointers, as sorted
+    (start_addr, end_addr) tuples that don't overlap'''
+    if options.core_file:
+        regions = get_elf_core_writable_regions(options.core_file)
+    else:
+        regions = get_gdb_remote_writable_regions(debugger)
+        if not regions:
+            regions = get_proc_maps_writable_regions(process.GetProcessID())
+        if not regions:
+            regions = get_writable_sections_and_stacks(process)
+    return merge_overlapping_regions(regions)
+
+def get_word_array_typecode(word_size):
+    '''Get the array typecode for words of "word_size" bytes, raises a
+    ValueError if this python has none, like a 32 bit python 2 with 8 byte
+    pointers.'''
+    for typecode in ('I', 'L', 'Q'):
+        try:
+            if array.array(typecode).itemsize == word_size:
+                return typecode
+        except ValueError:
+            pass # The 'Q' typecode isn't available in python 2
+    raise ValueError('this python has no array type for %u byte pointers, use a %u bit python to scan memory' % (word_size, word_size * 8))
+
+def read_memory_words(process, regions, chunk_size = 1024*1024):
+    '''Read "regions" a chunk at a time and generate a 
+    (region_start, region_end, addr, data, words) tuple for each chunk that
+    can be read, where "data" is the aligned memory at "addr" and "words" is
+    an array of the pointer sized words in it.'''
+    ptr_size = process.GetAddressByteSize()
+    typecode = get_word_array_typecode(ptr_size)
+    big_endian = process.GetByteOrder() == lldb.eByteOrderBig
+    swap = big_endian != (sys.byteorder == 'big')
+    chunk_size -= chunk_size % ptr_size
+    error = lldb.SBError()
+    for (region_start, region_end) in regions:
+        addr = region_start + (-region_start % ptr_size)
+        while addr + ptr_size <= region_end:
+            size = min(chunk_size, region_end - addr)
+            size -= size % ptr_size
+            data = process.ReadMemory (addr, size, error)
+            if error.Success() and data:
+                data = data[:len(data) - len(data) % ptr_size]
+                words = array.array(typecode)
+                words.fromstring(data)
+                if swap:
+                    words.byteswap()
+                yield (region_start, region_end, addr, data, words)
+            addr += size
+
+def scan_memory_for_pointers(process, regions, pointers, chunk_size = 1024*1024):
+    '''Scan "regions" for aligned pointer sized words that are equal to any of
+    the values in "pointers". The memory is read a chunk at a time into an 
+    array of words and intersected with the set of pointers, which checks
+    every word in C code, so only the chunks that contain a match need to be
+    searched for the offsets of the matches. Generates a 
+    (region_start, region_end, match_addr, pointer) tuple for each match.'''
+    ptr_size = process.GetAddressByteSize()
+    if process.GetByteOrder() == lldb.eByteOrderBig:
+        byte_order = '>'
+    else:
+        byte_order = '<'
+    pointer_format = byte_order + ('Q' if ptr_size == 8 else 'I')
+    pointers = set(pointers)
+    packed_pointers = dict()
+    for pointer in pointers:
+        packed_pointers[pointer] = struct.pack(pointer_format, pointer)
+    for (region_start, region_end, addr, data, words) in read_memory_words(process, regions, chunk_size):
+        matches = list()
+        for pointer in pointers.intersection(words):
+            packed_pointer = packed_pointers[pointer]
+            offset = data.find(packed_pointer)
+            while offset >= 0:
+                if offset % ptr_size == 0:
+                    matches.append((addr + offset, pointer))
+                offset = data.find(packed_pointer, offset + 1)
+        matches.sort()
+        for (match_addr, pointer) in matches:
+            yield (region_start, region_end, match_addr, pointer)
+
+def scan_memory_for_strings(process, regions, strings, chunk_size = 1024*1024):
+    '''Scan "regions" for all occurrences of each of the byte strings in
+    "strings". The memory is read a chunk at a time and each chunk is
+    searched together with the last bytes of the previous one, so strings
+    that span two chunks are found too. Generates a
+    (region_start, region_end, match_addr, string) tuple for each match.'''
+    max_len = max([len(bytes) for bytes in strings])
+    error = lldb.SBError()
+    for (region_start, region_end) in regions:
+        tail = ''
+        addr = region_start
+        while addr < region_end:
+            size = min(chunk_size, region_end - addr)
+            data = process.ReadMemory (addr, size, error)
+            if error.Success() and data:
+                data = tail + data
+                data_addr = addr - len(tail)
+                matches = list()
+                for bytes in strings:
+                    offset = data.find(bytes)
+                    while offset >= 0:
+                        # Matches that end in the tail were found in the previous chunk
+                        if offset + len(bytes) > len(tail):
+                            matches.append((data_addr + offset, bytes))
+                        offset = data.find(bytes, offset + 1)
+                matches.sort()
+                for (match_addr, bytes) in matches:
+                    yield (region_start, region_end, match_addr, bytes)
+                tail = data[max(0, len(data) - max_len + 1):]
+            else:
+                tail = ''
+            addr += size
+
+def evaluate_pointer_expressions(result, process, ptr_exprs):
+    '''Evaluate each pointer expression, falling back to parsing it as an
+    integer when there is no frame to evaluate it in, and return a dictionary
+    that maps each pointer value to its expression.'''
+    frame = process.GetSelectedThread().GetSelectedFrame()
+    pointers = dict()
+    for ptr_expr in ptr_exprs:
+        ptr_value = None
+        if frame:
+            expr_sbvalue = frame.EvaluateExpression (ptr_expr)
+            if expr_sbvalue.error.Success():
+                ptr_value = expr_sbvalue.unsigned
+        if ptr_value is None:
+            try:
+                ptr_value = int(ptr_expr, 0)
+            except ValueError:
+                result.AppendMessage('error: invalid pointer expression "%s"' % (ptr_expr))
+                continue
+        pointers[ptr_value] = ptr_expr
+    return pointers
+
+def get_scanned_block(target, addr, region_start, region_end):
+    '''Get the (block_addr, block_size, type_flags) to describe an address in
+    scanned memory with, matches in module sections are described relative 
+    to their section.'''
+    sb_addr = target.ResolveLoadAddress(addr)
+    section = sb_addr.section
+    if section:
+        return (section.GetLoadAddress(target), section.GetByteSize(), 32)
+    return (region_start, region_end - region_start, 128)
+
+class ReverseReferenceIndex:
+    '''An index of all pointer sized words in the writable memory of a 
+    stopped process that point into that memory. The pointer values and the
+    addresses that contain them are kept in two parallel arrays sorted by 
+    value, so finding the references to an address, or to anywhere in a 
+    range of addresses, is a binary search. The index is only valid until
+    the process resumes.'''
+    def __init__(self, process, regions, chunk_size = 1024*1024):
+        self.process_id = process.GetUniqueID()
+        self.stop_id = process.GetStopID()
+        regions = merge_overlapping_regions(regions)
+        self.regions = regions
+        self.region_starts = [region_start for (region_start, region_end) in regions]
+        ptr_size = process.GetAddressByteSize()
+        typecode = get_word_array_typecode(ptr_size)
+        # Each chunk is sorted on its own into a run of the two arrays, so
+        # only one chunk's worth of (value, ref) tuples is alive at a time.
+        # The words between the lowest and highest indexed addresses are
+        # sorted first, then the ones that point into the regions are found
+        # by a binary search for each region instead of checking every word.
+        values = array.array(typecode)
+        refs = array.array(typecode)
+        runs = list()
+        if regions:
+            min_addr = regions[0][0]
+            max_addr = max([region_end for (region_start, region_end) in regions])
+        for (region_start, region_end, addr, data, words) in read_memory_words(process, regions, chunk_size):
+            pairs = [(value, ref) for (value, ref) in itertools.izip(words, xrange(addr, addr + len(words) * ptr_size, ptr_size)) if min_addr <= value < max_addr]
+            pairs.sort()
+            run_start = len(values)
+            for (start_addr, end_addr) in regions:
+                lo = bisect.bisect_left(pairs, (start_addr, ))
+                hi = bisect.bisect_left(pairs, (end_addr, ), lo)
+                if lo < hi:
+                    (run_values, run_refs) = zip(*pairs[lo:hi])
+                    values.extend(run_values)
+                    refs.extend(run_refs)
+            if run_start < len(values):
+                runs.append((run_start, len(values)))
+            del pairs
+        if len(runs) <= 1:
+            self.values = values
+            self.refs = refs
+            return
+        # Merge the sorted runs a range of values at a time. Each range ends at
+        # the smallest of the values a fixed number of words into each run,
+        # so it holds at most about a chunk's worth of words, and the peak
+        # memory use stays at about twice the size of the final arrays.
+        words_per_run = max(chunk_size / ptr_size / len(runs), 1)
+        cursors = [run_start for (run_start, run_end) in runs]
+        self.values = array.array(typecode)
+        self.refs = array.array(typecode)
+        while True:
+            bound = None
+            for (run_idx, (run_start, run_end)) in enumerate(runs):
+                if cursors[run_idx] < run_end:
+                    value = values[min(cursors[run_idx] + words_per_run, run_end) - 1]
+                    if bound is None or value < bound:
+                        bound = value
+            if bound is None:
+                break
+            batch = list()
+            for (run_idx, (run_start, run_end)) in enumerate(runs):
+                lo = cursors[run_idx]
+                hi = bisect.bisect_right(values, bound, lo, run_end)
+                batch.extend(itertools.izip(values[lo:hi], refs[lo:hi]))
+                cursors[run_idx] = hi
+            batch.sort()
+            (batch_values, batch_refs) = zip(*batch)
+            self.values.extend(batch_values)
+            self.refs.extend(batch_refs)
+
+    def __len__(self):
+        return len(self.values)
+
+    def is_valid(self, process):
+        return self.process_id == process.GetUniqueID() and self.stop_id == process.GetStopID()
+
+    def get_region(self, addr):
+        '''Get the (region_start, region_end) of the indexed region that contains "addr"'''
+        idx = bisect.bisect_right(self.region_starts, addr) - 1
+        if idx >= 0 and addr < self.regions[idx][1]:
+            return self.regions[idx]
+        return None
+
+    def find_refs(self, start_addr, end_addr):
+        '''Get a list of the (value, ref_addr) tuples for all pointers whose
+        values are in [start_addr, end_addr)'''
+        lo = bisect.bisect_left(self.values, start_addr)
+        hi = bisect.bisect_left(self.values, end_addr, lo)
+        return [(self.values[i], self.refs[i]) for i in range(lo, hi)]
+
+    def find_chains(self, addr, is_root, max_depth, max_offset, max_chains):
+        '''Find chains of references that keep "addr" alive, starting from a
+        root address that "is_root" returns True for. The first hop needs to
+        point at "addr" exactly, each hop after that can point up to
+        "max_offset" bytes before the address of the previous reference
+        since it is a reference to the object that contains it. Returns a
+        list of chains, each a list of addresses from the root to "addr".'''
+        chains = list()
+        pointee = { addr : None } # Maps each reference to what it points to
+        queue = collections.deque([(addr, 0)])
+        while queue and len(chains) < max_chains:
+            (curr_addr, depth) = queue.popleft()
+            if depth == 0:
+                refs = self.find_refs(curr_addr, curr_addr + 1)
+            else:
+                refs = self.find_refs(max(curr_addr - max_offset, 0), curr_addr + 1)
+            for (value, ref_addr) in refs:
+                if ref_addr in pointee:
+                    continue
+                pointee[ref_addr] = curr_addr
+                if is_root(ref_addr):
+                    chain = [ref_addr]
+                    while pointee[chain[-1]] is not None:
+                        chain.append(pointee[chain[-1]])
+                    chains.append(chain)
+                    if len(chains) == max_chains:
+                        break
+                elif depth + 1 < max_depth:
+                    queue.append((ref_addr, depth + 1))
+        return chains
+
+g_reverse_reference_index = None
+
+def get_reverse_reference_index(debugger, result, options, process):
+    '''Get the reverse reference index for the current stop of "process",
+    building it if there is none or the process has resumed since it was
+    built.'''
+    global g_reverse_reference_index
+    if g_reverse_reference_index and g_reverse_reference_index.is_valid(process):
+        return g_reverse_reference_index
+    g_reverse_reference_index = None
+    regions = get_scan_regions(debugger, process, options)
+    g_reverse_reference_index = ReverseReferenceIndex(process, regions)
+    if options.verbose:
+        result.AppendMessage('indexed %u references in %u writable memory regions' % (len(g_reverse_reference_index), len(regions)))
+    return g_reverse_reference_index
+
+def get_thread_stack_ranges(process, index):
+    '''Get the [start, end) ranges of the stacks of all threads: from the
+    lowest stack pointer minus the red zone to the end of the indexed region
+    that contains it.'''
+    stack_ranges = list()
+    for thread in process:
+        if thread.GetNumFrames() == 0:
+            continue
+        sp = thread.frame[0].sp
+        region = index.get_region(sp)
+        if region:
+            stack_ranges.append((sp - process.target.GetStackRedZoneSize(), region[1]))
+    return stack_ranges
+
+def display_scanned_ptr_refs(debugger, result, options, process, ptr_exprs):
+    '''Find all references to the pointer expressions in "ptr_exprs" with a 
+    single scan of the writable memory of the process, this works for any
+    process or core file since no code needs to run in the inferior. If
+    "options.index" is set, the references are looked up in the reverse 
+    reference index for the current stop instead.'''
+    pointers = evaluate_pointer_expressions(result, process, ptr_exprs)
+    if not pointers:
+        return
+    try:
+        if options.index:
+            index = get_reverse_reference_index(debugger, result, options, process)
+            matches = list()
+            for pointer in pointers:
+                for (value, ref_addr) in index.find_refs(pointer, pointer + 1):
+                    (region_start, region_end) = index.get_region(ref_addr)
+                    matches.append((region_start, region_end, ref_addr, pointer))
+        else:
+            regions = get_scan_regions(debugger, process, options)
+            if options.verbose:
+                result.AppendMessage('scanning %u writable memory regions' % (len(regions)))
+            matches = list(scan_memory_for_pointers(process, regions, pointers.keys()))
+    except (IOError, ValueError, struct.error) as e:
+        result.AppendMessage('error: %s' % (e))
+        return
+    display_scanned_matches(result, options, process, matches, pointers, 'pointer %s')
+
+def display_scanned_matches(result, options, process, matches, descriptions, no_match_format):
+    '''Display the (region_start, region_end, match_addr, key) tuples in
+    "matches" up to --max-matches for each key, "descriptions" maps each
+    key to the description of what was searched for.'''
+    target = process.target
+    match_counts = dict()
+    for (region_start, region_end, match_addr, key) in matches:
+        match_count = match_counts.get(key, 0)
+        if match_count == options.max_matches:
+            result.AppendMessage('warning: the max number of matches (%u) was reached for %s, use the --max-matches option to get more results' % (options.max_matches, descriptions[key]))
+        if match_count >= options.max_matches:
+            match_counts[key] = match_count + 1
+            continue
+        (block_addr, block_size, type_flags) = get_scanned_block(target, match_addr, region_start, region_end)
+        if display_match_entry (result, options, process, target, None, block_addr, block_size, match_addr - block_addr, type_flags):
+            match_counts[key] = match_count + 1
+    for (key, description) in descriptions.items():
+        if key not in match_counts:
+            result.AppendMessage('no matches found for %s' % (no_match_format % (description)))
+
+def display_scanned_cstr_refs(debugger, result, options, process, cstrs):
+    '''Find all copies of the C strings in "cstrs" with a single scan of the
+    writable memory of the process, this works for any process or core file
+    since no code needs to run in the inferior.'''
+    strings = dict()
+    for cstr in cstrs:
+        if cstr:
+            strings[cstr] = cstr
+        else:
+            result.AppendMessage('error: can\'t search for an empty C string')
+    if not strings:
+        return
+    try:
+        regions = get_scan_regions(debugger, process, options)
+        if options.verbose:
+            result.AppendMessage('scanning %u writable memory regions' % (len(regions)))
+        matches = list(scan_memory_for_strings(process, regions, strings.keys()))
+    except (IOError, ValueError, struct.error) as e:
+        result.AppendMessage('error: %s' % (e))
+        return
+    display_scanned_matches(result, options, process, matches, strings, '"%s"')
+
+def get_ptr_chain_options ():
+    usage = "usage: %prog [options] <EXPR> [EXPR ...]"
+    description='''Finds chains of pointers that keep the memory at each
+address alive, starting from a global variable or a thread stack. The chains
+are found using the reverse reference index of the writable memory of the
+process, which is built once for each stop and also used by "ptr_refs
+--index". Each pointer in a chain can point up to --max-offset bytes before
+the pointer that follows it, since it points to the object that contains it.'''
+    parser = optparse.OptionParser(description=description, prog='ptr_chain',usage=usage)
+    parser.add_option('-v', '--verbose', action='store_true', dest='verbose', help='display verbose debug info', default=False)
+    parser.add_option('-d', '--depth', type='int', dest='max_depth', help='the maximum number of pointers in a chain (default=4)', default=4)
+    parser.add_option('--max-offset', type='int', dest='max_offset', help='the maximum offset of a pointer within the object that is pointed to by the next pointer in a chain (default=256)', default=256)
+    parser.add_option('-M', '--max-matches', type='int', dest='max_matches', help='the maximum number of chains to print for each address', default=8)
+    parser.add_option('--core', type='string', dest='core_file', help='index the writable segments of this ELF core file, which should be the core file of the current process', default=None)
+    return parser
+
+def ptr_chain(debugger, command, result, dict):
+    command_args = shlex.split(command)
+    parser = get_ptr_chain_options()
+    try:
+        (options, args) = parser.parse_args(command_args)
+    except:
+        return
+
+    process = lldb.debugger.GetSelectedTarget().GetProcess()
+    if not process:
+        result.AppendMessage('error: invalid process')
+        return
+    if not args:
+        result.AppendMessage('error: no pointer arguments were given')
+        return
+    target = process.target
+    pointers = evaluate_pointer_expressions(result, process, args)
+    try:
+        index = get_reverse_reference_index(debugger, result, options, process)
+    except (IOError, ValueError, struct.error) as e:
+        result.AppendMessage('error: %s' % (e))
+        return
+    stack_ranges = get_thread_stack_ranges(process, index)
+    def is_root(addr):
+        for (stack_start, stack_end) in stack_ranges:
+            if stack_start <= addr < stack_end:
+                return True
+        return bool(target.ResolveLoadAddress(addr).section)
+    for (pointer, ptr_expr) in pointers.items():
+        chains = index.find_chains(pointer, is_root, options.max_depth, options.max_offset, options.max_matches)
+        if not chains:
+            result.AppendMessage('no chains found for pointer %s' % (ptr_expr))
+        for (chain_idx, chain) in enumerate(chains):
+            result.AppendMessage('chain[%u] for %s:' % (chain_idx, ptr_expr))
+            for addr in chain[:-1]:
+                type_flags = None
+                for (stack_start, stack_end) in stack_ranges:
+                    if stack_start <= addr < stack_end:
+                        (block_addr, block_size, type_flags) = (stack_start, stack_end - stack_start, 8)
+                if type_flags is None:
+                    (region_start, region_end) = index.get_region(addr)
+                    (block_addr, block_size, type_flags) = get_scanned_block(target, addr, region_start, region_end)
+                result.AppendMessage('    %#16.16x: %s' % (addr, type_flags_to_description(type_flags, block_addr, block_size, addr - block_addr)))
+            result.AppendMessage('    %#16.16x: %s' % (chain[-1], ptr_expr))
+
 def get_ptr_refs_options ():
     usage = "usage: %prog [options] <EXPR> [EXPR ...]"
     description='''Searches all allocations on the heap for pointer values on 
@@ -587,6 +1156,9 @@ objects the pointers are contained in using dynamic type information in the
 program.'''
     parser = optparse.OptionParser(description=description, prog='ptr_refs',usage=usage)
     add_common_options(parser)
+    parser.add_option('--scan', action='store_true', dest='scan', help='scan the writable memory of the process in python instead of running an expression that iterates the darwin malloc zones, this is the default for non-darwin targets', default=False)
+    parser.add_option('--core', type='string', dest='core_file', help='scan the writable segments of this ELF core file, which should be the core file of the current process (implies --scan)', default=None)
+    parser.add_option('--index', action='store_true', dest='index', help='look up the references in an index of the writable memory that is built once for each stop, which makes repeated queries fast (implies --scan)', default=False)
     return parser
     
 def ptr_refs(debugger, command, result, dict):
@@ -597,19 +1169,28 @@ def ptr_refs(debugger, command, result, dict):
     except:
         return
 
-    process = lldb.debugger.GetSelectedTarget().GetProcess()
+    target = lldb.debugger.GetSelectedTarget()
+    process = target.GetProcess()
     if not process:
         result.AppendMessage('error: invalid process')
         return
-    frame = process.GetSelectedThread().GetSelectedFrame()
-    if not frame:
-        result.AppendMessage('error: invalid frame')
-        return
 
     options.type = 'pointer'
     if options.format == None: 
         options.format = "A" # 'A' is "address" format
 
+    if options.scan or options.core_file or options.index or (target.triple or '').find('-apple-') < 0:
+        if args:
+            display_scanned_ptr_refs (debugger, result, options, process, args)
+        else:
+            result.AppendMessage('error: no pointer arguments were given')
+        return
+
+    frame = process.GetSelectedThread().GetSelectedFrame()
+    if not frame:
+        result.AppendMessage('error: invalid frame')
+        return
+
     if args:
         # When we initialize the expression, we must define any types that
         # we will need when looking at every allocation. We must also define
@@ -675,9 +1256,12 @@ def get_cstr_refs_options():
 darwin user space programs. Any matches that were found will dump the malloc
 blocks that contain the C strings and might be able to print what kind of
 objects the pointers are contained in using dynamic type information in the
-program.'''
+program. With --scan or --core, or for non-darwin targets, the writable memory
+of the process or core file is scanned for the strings instead.'''
     parser = optparse.OptionParser(description=description, prog='cstr_refs',usage=usage)
     add_common_options(parser)
+    parser.add_option('--scan', action='store_true', dest='scan', help='scan the writable memory of the process in python instead of running an expression that iterates the darwin malloc zones, this is the default for non-darwin targets', default=False)
+    parser.add_option('--core', type='string', dest='core_file', help='scan the writable segments of this ELF core file, which should be the core file of the current process (implies --scan)', default=None)
     return parser
 
 def cstr_refs(debugger, command, result, dict):
@@ -688,20 +1272,28 @@ def cstr_refs(debugger, command, result, dict):
     except:
         return
 
-    process = lldb.debugger.GetSelectedTarget().GetProcess()
+    target = lldb.debugger.GetSelectedTarget()
+    process = target.GetProcess()
     if not process:
         result.AppendMessage('error: invalid process')
         return
-    frame = process.GetSelectedThread().GetSelectedFrame()
-    if not frame:
-        result.AppendMessage('error: invalid frame')
-        return
-
 
     options.type = 'cstr'
     if options.format == None: 
         options.format = "Y" # 'Y' is "bytes with ASCII" format
 
+    if options.scan or options.core_file or (target.triple or '').find('-apple-') < 0:
+        if args:
+            display_scanned_cstr_refs (debugger, result, options, process, args)
+        else:
+            result.AppendMessage('error: command takes one or more C string arguments')
+        return
+
+    frame = process.GetSelectedThread().GetSelectedFrame()
+    if not frame:
+        result.AppendMessage('error: invalid frame')
+        return
+
     if args:
         # When we initialize the expression, we must define any types that
         # we will need when looking at every allocation. We must also define
@@ -1118,17 +1710,19 @@ if __name__ == '__main__':
 # if clients in LLDB type "help malloc_info", they will see the exact same
 # output as typing "malloc_info --help".
 ptr_refs.__doc__ = get_ptr_refs_options().format_help()
+ptr_chain.__doc__ = get_ptr_chain_options().format_help()
 cstr_refs.__doc__ = get_cstr_refs_options().format_help()
 malloc_info.__doc__ = get_malloc_info_options().format_help()
 objc_refs.__doc__ = get_objc_refs_options().format_help()
 lldb.debugger.HandleCommand('command script add -f %s.ptr_refs ptr_refs' % __name__)
+lldb.debugger.HandleCommand('command script add -f %s.ptr_chain ptr_chain' % __name__)
 lldb.debugger.HandleCommand('command script add -f %s.cstr_refs cstr_refs' % __name__)
 lldb.debugger.HandleCommand('command script add -f %s.malloc_info malloc_info' % __name__)
 # lldb.debugger.HandleCommand('command script add -f %s.heap heap' % package_name)
 # lldb.debugger.HandleCommand('command script add -f %s.section_ptr_refs section_ptr_refs' % package_name)
 # lldb.debugger.HandleCommand('command script add -f %s.stack_ptr_refs stack_ptr_refs' % package_name)
 lldb.debugger.HandleCommand('command script add -f %s.objc_refs objc_refs' % __name__)
-print '"malloc_info", "ptr_refs", "cstr_refs", and "objc_refs" commands have been installed, use the "--help" options on these commands for detailed help.'
+print '"malloc_info", "ptr_refs", "ptr_chain", "cstr_refs", and "objc_refs" commands have been installed, use the "--help" options on these commands for detailed help.'
 
 
 
@@ -26,10 +26,13 @@
 #   PYTHONPATH=/path/to/LLDB.framework/Resources/Python ./crashlog.py ~/Library/Logs/DiagnosticReports/a.crash
 #----------------------------------------------------------------------
 
+import collections
 import commands
 import cmd
 import datetime
 import glob
+import json
+import multiprocessing
 import optparse
 import os
 import platform
@@ -38,6 +41,7 @@ import pprint # pp = pprint.PrettyPrinter(indent=4); pp.pprint(command_args)
 import re
 import shlex
 import string
+import StringIO
 import sys
 import time
 import uuid
@@ -90,13 +94,15 @@ class CrashLog(symbolication.Symbolicator):
     image_regex_uuid = re.compile('(0x[0-9a-fA-F]+)[- ]+(0x[0-9a-fA-F]+) +[+]?([^ ]+) +([^<]+)<([-0-9a-fA-F]+)> (.*)');
     image_regex_no_uuid = re.compile('(0x[0-9a-fA-F]+)[- ]+(0x[0-9a-fA-F]+) +[+]?([^ ]+) +([^/]+)/(.*)');
     empty_line_regex = re.compile('^$')
+    register_regex = re.compile('([a-zA-Z0-9]+): (0[Xx][0-9a-fA-F]+)')
+    version_regex = re.compile('(.+)\((.+)\)')
         
     class Thread:
         """Class that represents a thread in a darwin crash log"""
         def __init__(self, index):
             self.index = index
             self.frames = list()
-            self.idents = list()
+            self.idents = collections.OrderedDict() # used as an ordered set
             self.registers = dict()
             self.reason = None
             self.queue = None
@@ -113,8 +119,7 @@ class CrashLog(symbolication.Symbolicator):
                     print "%s    %-5s = %#16.16x" % (prefix, reg, self.registers[reg])
         
         def add_ident(self, ident):
-            if not ident in self.idents:
-                self.idents.append(ident)
+            self.idents[ident] = None
             
         def did_crash(self):
             return self.reason != None
@@ -207,6 +212,77 @@ class CrashLog(symbolication.Symbolicator):
         
     
         
+    # Handlers for the "<key>:" lines at the top of a crash log, each returns the
+    # new parse mode or None to stay in PARSE_MODE_NORMAL
+    def parse_process_line(self, line):
+        (self.process_name, pid_with_brackets) = line[8:].strip().split(' [')
+        self.process_id = pid_with_brackets.strip('[]')
+
+    def parse_path_line(self, line):
+        self.process_path = line[5:].strip()
+
+    def parse_identifier_line(self, line):
+        self.process_identifier = line[11:].strip()
+
+    def parse_version_line(self, line):
+        version_string = line[8:].strip()
+        matched_pair = self.version_regex.search(version_string)
+        if matched_pair:
+            self.process_version = matched_pair.group(1)
+            self.process_compatability_version = matched_pair.group(2)
+        else:
+            self.process = version_string
+            self.process_compatability_version = version_string
+
+    def parse_parent_process_line(self, line):
+        parent_process_match = self.parent_process_regex.search(line)
+        if parent_process_match:
+            self.parent_process_name = parent_process_match.group(1)
+            self.parent_process_id = parent_process_match.group(2)
+
+    def parse_exception_type_line(self, line):
+        self.thread_exception = line[15:].strip()
+
+    def parse_exception_codes_line(self, line):
+        self.thread_exception_data = line[16:].strip()
+
+    def parse_crashed_thread_line(self, line):
+        self.crashed_thread_idx = int(line[15:].strip().split()[0])
+
+    def parse_report_version_line(self, line):
+        self.version = int(line[15:].strip())
+
+    def parse_system_profile_line(self, line):
+        return PARSE_MODE_SYSTEM
+
+    def parse_binary_images_line(self, line):
+        return PARSE_MODE_IMAGES
+
+    def parse_ignored_line(self, line):
+        pass
+
+    # Maps the text up to and including the first ':' of a line to its handler
+    # and whether the line should also be kept in self.info_lines
+    normal_line_handlers = {
+        'Process:'                              : (parse_process_line, True),
+        'Path:'                                 : (parse_path_line, True),
+        'Identifier:'                           : (parse_identifier_line, True),
+        'Version:'                              : (parse_version_line, True),
+        'Parent Process:'                       : (parse_parent_process_line, True),
+        'Exception Type:'                       : (parse_exception_type_line, False),
+        'Exception Codes:'                      : (parse_exception_codes_line, False),
+        'Crashed Thread:'                       : (parse_crashed_thread_line, False),
+        'Report Version:'                       : (parse_report_version_line, False),
+        'System Profile:'                       : (parse_system_profile_line, False),
+        'Binary Images:'                        : (parse_binary_images_line, False),
+        'Interval Since Last Report:'           : (parse_ignored_line, False),
+        'Crashes Since Last Report:'            : (parse_ignored_line, False),
+        'Per-App Interval Since Last Report:'   : (parse_ignored_line, False),
+        'Per-App Crashes Since Last Report:'    : (parse_ignored_line, False),
+        'Sleep/Wake UUID:'                      : (parse_ignored_line, False),
+        'Anonymous UUID:'                       : (parse_ignored_line, False)
+    }
+
     def __init__(self, path):
         """CrashLog constructor that take a path to a darwin crash log file"""
         symbolication.Symbolicator.__init__(self);
@@ -214,10 +290,12 @@ class CrashLog(symbolication.Symbolicator):
         self.info_lines = list()
         self.system_profile = list()
         self.threads = list()
-        self.idents = list() # A list of the required identifiers for doing all stack backtraces
+        self.idents = collections.OrderedDict() # An ordered set of the required identifiers for doing all stack backtraces
         self.crashed_thread_idx = -1
         self.version = -1
         self.error = None
+        self.thread_exception = None
+        self.thread_exception_data = None
         # With possible initial component of ~ or ~user replaced by that user's home directory.
         try:
             f = open(self.path)
@@ -225,13 +303,12 @@ class CrashLog(symbolication.Symbolicator):
             self.error = 'error: cannot open "%s"' % self.path
             return
 
-        self.file_lines = f.read().splitlines()
         parse_mode = PARSE_MODE_NORMAL
         thread = None
-        for line in self.file_lines:
-            # print line
-            line_len = len(line)
-            if line_len == 0:
+        # Read the crash log one line at a time instead of loading it all at once
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line:
                 if thread:
                     if parse_mode == PARSE_MODE_THREAD:
                         if thread.index == self.crashed_thread_idx:
@@ -248,81 +325,14 @@ class CrashLog(symbolication.Symbolicator):
                     if len(self.info_lines) > 0 and len(self.info_lines[-1]):
                         self.info_lines.append(line)
                 parse_mode = PARSE_MODE_NORMAL
-                # print 'PARSE_MODE_NORMAL'
-            elif parse_mode == PARSE_MODE_NORMAL:
-                if line.startswith ('Process:'):
-                    (self.process_name, pid_with_brackets) = line[8:].strip().split(' [')
-                    self.process_id = pid_with_brackets.strip('[]')
-                elif line.startswith ('Path:'):
-                    self.process_path = line[5:].strip()
-                elif line.startswith ('Identifier:'):
-                    self.process_identifier = line[11:].strip()
-                elif line.startswith ('Version:'):
-                    version_string = line[8:].strip()
-                    matched_pair = re.search("(.+)\((.+)\)", version_string)
-                    if matched_pair:
-                        self.process_version = matched_pair.group(1)
-                        self.process_compatability_version = matched_pair.group(2)
-                    else:
-                        self.process = version_string
-                        self.process_compatability_version = version_string
-                elif self.parent_process_regex.search(line):
-                    parent_process_match = self.parent_process_regex.search(line)
-                    self.parent_process_name = parent_process_match.group(1)
-                    self.parent_process_id = parent_process_match.group(2)
-                elif line.startswith ('Exception Type:'):
-                    self.thread_exception = line[15:].strip()
-                    continue
-                elif line.startswith ('Exception Codes:'):
-                    self.thread_exception_data = line[16:].strip()
-                    continue
-                elif line.startswith ('Crashed Thread:'):
-                    self.crashed_thread_idx = int(line[15:].strip().split()[0])
-                    continue
-                elif line.startswith ('Report Version:'):
-                    self.version = int(line[15:].strip())
-                    continue
-                elif line.startswith ('System Profile:'):
-                    parse_mode = PARSE_MODE_SYSTEM
-                    continue
-                elif (line.startswith ('Interval Since Last Report:') or
-                      line.startswith ('Crashes Since Last Report:') or
-                      line.startswith ('Per-App Interval Since Last Report:') or
-                      line.startswith ('Per-App Crashes Since Last Report:') or
-                      line.startswith ('Sleep/Wake UUID:') or
-                      line.startswith ('Anonymous UUID:')):
-                    # ignore these
-                    continue  
-                elif line.startswith ('Thread'):
-                    thread_state_match = self.thread_state_regex.search (line)
-                    if thread_state_match:
-                        thread_state_match = self.thread_regex.search (line)
-                        thread_idx = int(thread_state_match.group(1))
-                        parse_mode = PARSE_MODE_THREGS
-                        thread = self.threads[thread_idx]
-                    else:
-                        thread_match = self.thread_regex.search (line)
-                        if thread_match:
-                            # print 'PARSE_MODE_THREAD'
-                            parse_mode = PARSE_MODE_THREAD
-                            thread_idx = int(thread_match.group(1))
-                            thread = CrashLog.Thread(thread_idx)
-                    continue
-                elif line.startswith ('Binary Images:'):
-                    parse_mode = PARSE_MODE_IMAGES
-                    continue
-                self.info_lines.append(line.strip())
             elif parse_mode == PARSE_MODE_THREAD:
-                if line.startswith ('Thread'):
-                    continue
-                frame_match = self.frame_regex.search(line)
+                frame_match = self.frame_regex.match(line)
                 if frame_match:
                     ident = frame_match.group(2)
                     thread.add_ident(ident)
-                    if not ident in self.idents:
-                        self.idents.append(ident)
+                    self.idents[ident] = None
                     thread.frames.append (CrashLog.Frame(int(frame_match.group(1)), int(frame_match.group(3), 0), frame_match.group(4)))
-                else:
+                elif not line.startswith ('Thread'):
                     print 'error: frame regex failed for line: "%s"' % line
             elif parse_mode == PARSE_MODE_IMAGES:
                 image_match = self.image_regex_uuid.search (line)
@@ -333,7 +343,7 @@ class CrashLog(symbolication.Symbolicator):
                                                   image_match.group(4).strip(), 
                                                   uuid.UUID(image_match.group(5)), 
                                                   image_match.group(6))
-                    self.images.append (image)
+                    self.add_image (image)
                 else:
                     image_match = self.image_regex_no_uuid.search (line)
                     if image_match:
@@ -343,22 +353,41 @@ class CrashLog(symbolication.Symbolicator):
                                                       image_match.group(4).strip(), 
                                                       None,
                                                       image_match.group(5))
-                        self.images.append (image)
+                        self.add_image (image)
                     else:
                         print "error: image regex failed for: %s" % line
-
             elif parse_mode == PARSE_MODE_THREGS:
-                stripped_line = line.strip()
                 # "r12: 0x00007fff6b5939c8  r13: 0x0000000007000006  r14: 0x0000000000002a03  r15: 0x0000000000000c00"
-                reg_values = re.findall ('([a-zA-Z0-9]+: 0[Xx][0-9a-fA-F]+) *', stripped_line);
-                for reg_value in reg_values:
-                    #print 'reg_value = "%s"' % reg_value
-                    (reg, value) = reg_value.split(': ')
-                    #print 'reg = "%s"' % reg
-                    #print 'value = "%s"' % value
-                    thread.registers[reg.strip()] = int(value, 0)
+                for (reg, value) in self.register_regex.findall(line):
+                    thread.registers[reg] = int(value, 0)
             elif parse_mode == PARSE_MODE_SYSTEM:
                 self.system_profile.append(line)
+            elif line.startswith ('Thread'):
+                thread_state_match = self.thread_state_regex.match (line)
+                if thread_state_match:
+                    thread_idx = int(thread_state_match.group(1))
+                    parse_mode = PARSE_MODE_THREGS
+                    thread = self.threads[thread_idx]
+                else:
+                    thread_match = self.thread_regex.match (line)
+                    if thread_match:
+                        parse_mode = PARSE_MODE_THREAD
+                        thread_idx = int(thread_match.group(1))
+                        thread = CrashLog.Thread(thread_idx)
+            else:
+                # PARSE_MODE_NORMAL
+                handler = None
+                colon_idx = line.find(':')
+                if colon_idx >= 0:
+                    handler = self.normal_line_handlers.get(line[:colon_idx+1])
+                if handler:
+                    (handler_function, keep_line) = handler
+                    new_parse_mode = handler_function(self, line)
+                    if new_parse_mode != None:
+                        parse_mode = new_parse_mode
+                    if not keep_line:
+                        continue
+                self.info_lines.append(line.strip())
         f.close()
     
     def dump(self):
@@ -371,9 +400,9 @@ class CrashLog(symbolication.Symbolicator):
             image.dump('  ')
     
     def find_image_with_identifier(self, identifier):
-        for image in self.images:
-            if image.identifier == identifier:
-                return image
+        images = self.find_images_with_identifier(identifier)
+        if images:
+            return images[0]
         return None
     
     def create_target(self):
@@ -610,28 +639,9 @@ def Symbolicate(debugger, command, result, dict):
     except:
         result.PutCString ("error: python exception %s" % sys.exc_info()[0])
 
-def SymbolicateCrashLog(crash_log, options):
-    if crash_log.error:
-        print crash_log.error
-        return
-    if options.debug:
-        crash_log.dump()
-    if not crash_log.images:
-        print 'error: no images in crash log'
-        return
-
-    if options.dump_image_list:
-        print "Binary Images:"
-        for image in crash_log.images:
-            if options.verbose:
-                print image.debug_dump()
-            else:
-                print image
-
-    target = crash_log.create_target ()
-    if not target:
-        return
-    exe_module = target.GetModuleAtIndex(0)
+def LoadCrashLogImages(crash_log, target, options):
+    '''Add the images of "crash_log" that are needed to symbolicate it to "target" and
+    slide them to where they were loaded in the crashed process, returns the loaded images'''
     images_to_load = list()
     loaded_images = list()
     if options.load_all_images:
@@ -669,6 +679,30 @@ def SymbolicateCrashLog(crash_log, options):
             else:
                 #print 'loaded %s' % image
                 loaded_images.append(image)
+    return loaded_images
+
+def SymbolicateCrashLog(crash_log, options):
+    if crash_log.error:
+        print crash_log.error
+        return
+    if options.debug:
+        crash_log.dump()
+    if not crash_log.images:
+        print 'error: no images in crash log'
+        return
+
+    if options.dump_image_list:
+        print "Binary Images:"
+        for image in crash_log.images:
+            if options.verbose:
+                print image.debug_dump()
+            else:
+                print image
+
+    target = crash_log.create_target ()
+    if not target:
+        return None
+    loaded_images = LoadCrashLogImages(crash_log, target, options)
 
     for thread in crash_log.threads:
         this_thread_crashed = thread.did_crash()
@@ -719,6 +753,224 @@ def SymbolicateCrashLog(crash_log, options):
                 print frame
         print                
 
+def GetCrashLogMainImageUUID(crash_log):
+    '''Returns the UUID string of the main executable of "crash_log", or None'''
+    process_path = getattr(crash_log, 'process_path', None)
+    main_image = None
+    for image in crash_log.images:
+        if image.path == process_path:
+            main_image = image
+            break
+    if main_image == None and crash_log.images:
+        # The main executable is normally listed first
+        main_image = crash_log.images[0]
+    if main_image:
+        return main_image.get_normalized_uuid_string()
+    return None
+
+def GetCrashLogFileMainImageUUID(crash_log_path):
+    '''Returns the UUID string of the main executable of the crash log at "crash_log_path",
+    or None, by only reading its "Path:" line and its binary images instead of parsing all of it'''
+    process_path = None
+    image_uuids = list()
+    in_images = False
+    try:
+        f = open(os.path.expanduser(crash_log_path))
+    except IOError:
+        return None
+    for line in f:
+        line = line.rstrip('\r\n')
+        if in_images:
+            if not line:
+                break
+            image_match = CrashLog.image_regex_uuid.search(line)
+            if image_match:
+                (uuid_str, image_path) = (str(uuid.UUID(image_match.group(5))).upper(), image_match.group(6))
+            else:
+                image_match = CrashLog.image_regex_no_uuid.search(line)
+                if not image_match:
+                    continue
+                (uuid_str, image_path) = (None, image_match.group(5))
+            if image_path == process_path:
+                f.close()
+                return uuid_str
+            image_uuids.append(uuid_str)
+        elif line.startswith('Path:'):
+            process_path = line[5:].strip()
+        elif line.startswith('Binary Images:'):
+            in_images = True
+    f.close()
+    if image_uuids:
+        # The main executable is normally listed first
+        return image_uuids[0]
+    return None
+
+def GetSymbolicatedCrashLogDict(crash_log, options):
+    '''Symbolicate "crash_log" and return the result as a dictionary that can be saved as JSON'''
+    result = { 'path' : crash_log.path, 'error' : crash_log.error, 'threads' : list(), 'loaded_images' : list() }
+    if crash_log.error:
+        return result
+    result['process'] = getattr(crash_log, 'process_name', None)
+    result['uuid'] = GetCrashLogMainImageUUID(crash_log)
+    if not crash_log.images:
+        result['error'] = 'error: no images in crash log'
+        return result
+    target = crash_log.create_target ()
+    if not target:
+        result['error'] = 'error: unable to create a target for the crash log'
+        return result
+    result['loaded_images'] = LoadCrashLogImages(crash_log, target, options)
+    for thread in crash_log.threads:
+        if options.crashed_only and not thread.did_crash():
+            continue
+        thread_dict = { 'index' : thread.index, 'reason' : thread.reason, 'frames' : list() }
+        for frame_idx, frame in enumerate(thread.frames):
+            if frame_idx == 0:
+                pc = frame.pc & crash_log.addr_mask
+            else:
+                # Any frame above frame zero and we have to subtract one to get the previous line entry
+                pc = (frame.pc & crash_log.addr_mask) - 1
+            frame_dict = { 'index' : frame.index, 'pc' : frame.pc, 'description' : frame.description, 'symbolicated' : list() }
+            symbolicated_frame_addresses = crash_log.symbolicate (pc, options.verbose)
+            if symbolicated_frame_addresses:
+                for symbolicated_frame_address in symbolicated_frame_addresses:
+                    frame_dict['symbolicated'].append({ 'load_addr' : symbolicated_frame_address.load_addr,
+                                                        'symbolication' : symbolicated_frame_address.symbolication,
+                                                        'inlined' : symbolicated_frame_address.is_inlined() })
+            thread_dict['frames'].append(frame_dict)
+        result['threads'].append(thread_dict)
+    return result
+
+def SymbolicateCrashLogGroup(crash_log_paths, options, result_callback):
+    '''Symbolicate crash logs that all come from the same main executable, reusing a
+    single target and the modules that were located for the previous crash logs.
+    "result_callback" is called with the crash log path and either the captured
+    output or a dictionary (--json) as soon as each crash log is done.'''
+    target = None
+    addr_mask = None
+    for crash_log_path in crash_log_paths:
+        saved_stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            try:
+                crash_log = CrashLog(crash_log_path)
+                if target:
+                    # The modules of the previous crash log, including any that
+                    # were loaded lazily while symbolicating, were most likely
+                    # loaded at other addresses, so forget where they all were
+                    for module in target.modules:
+                        target.ClearModuleLoadAddress(module)
+                    crash_log.target = target
+                    crash_log.addr_mask = addr_mask
+                if options.json:
+                    result = GetSymbolicatedCrashLogDict(crash_log, options)
+                    result['loaded_images'] = [str(image.get_uuid()) for image in result['loaded_images']]
+                else:
+                    SymbolicateCrashLog(crash_log, options)
+                if crash_log.target:
+                    target = crash_log.target
+                    addr_mask = crash_log.addr_mask
+            except Exception as e:
+                print 'error: exception while symbolicating "%s": %s' % (crash_log_path, e)
+                if options.json:
+                    result = { 'path' : crash_log_path, 'error' : str(e) }
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = saved_stdout
+        if options.json:
+            if output:
+                result['output'] = output
+            result_callback(crash_log_path, result)
+        else:
+            result_callback(crash_log_path, output)
+
+def SymbolicateCrashLogGroupsWorker(group_queue, result_queue, options):
+    '''Worker process for SymbolicateCrashLogsInBatches()'''
+    lldb.debugger = lldb.SBDebugger.Create()
+    while True:
+        group = group_queue.get()
+        if group == None:
+            break
+        SymbolicateCrashLogGroup(group, options, lambda path, result: result_queue.put((path, result)))
+    # Hand the cache statistics back so the parent can report them, and the
+    # symbolicated addresses too if the parent is going to save them
+    cache = symbolication.g_symbolication_cache
+    if options.cache_file:
+        entries = cache.entries.items()
+    else:
+        entries = list()
+    result_queue.put((None, (entries, cache.hits, cache.misses)))
+    result_queue.put(None)
+
+def FindCrashLogFiles(args):
+    '''Expand the file globs and directories in "args" to a list of crash log files'''
+    crash_log_files = list()
+    for arg in args:
+        for resolved_path in glob.glob(os.path.expanduser(arg)):
+            if os.path.isdir(resolved_path):
+                for (dirpath, dirnames, filenames) in os.walk(resolved_path):
+                    dirnames.sort()
+                    for filename in sorted(filenames):
+                        if filename.endswith('.crash'):
+                            crash_log_files.append(os.path.join(dirpath, filename))
+            else:
+                crash_log_files.append(resolved_path)
+    return crash_log_files
+
+def SymbolicateCrashLogsInBatches(options, args):
+    '''Group crash logs by the UUID of their main executable and symbolicate each group
+    with a single target, using up to --jobs worker processes'''
+    groups = dict()
+    for crash_log_file in FindCrashLogFiles(args):
+        uuid_str = GetCrashLogFileMainImageUUID(crash_log_file)
+        if uuid_str:
+            groups.setdefault(uuid_str, list()).append(crash_log_file)
+        else:
+            # Crash logs we can't group get a target of their own
+            groups[crash_log_file] = [crash_log_file]
+    # Start the biggest groups first so they don't end up running alone at the end
+    sorted_groups = sorted(groups.values(), key=lambda group: (-len(group), group[0]))
+
+    def print_result(path, result):
+        if options.json:
+            print json.dumps(result)
+        else:
+            print '=== %s ===' % (path)
+            sys.stdout.write(result)
+        sys.stdout.flush()
+
+    if options.jobs <= 1:
+        for group in sorted_groups:
+            SymbolicateCrashLogGroup(group, options, print_result)
+        return
+
+    group_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    for group in sorted_groups:
+        group_queue.put(group)
+    num_workers = min(options.jobs, len(sorted_groups))
+    workers = list()
+    for i in range(num_workers):
+        group_queue.put(None)
+        worker = multiprocessing.Process(target=SymbolicateCrashLogGroupsWorker, args=(group_queue, result_queue, options))
+        worker.start()
+        workers.append(worker)
+    num_running = num_workers
+    while num_running > 0:
+        item = result_queue.get()
+        if item == None:
+            num_running -= 1
+        elif item[0] == None:
+            (entries, hits, misses) = item[1]
+            for (key, frames) in entries:
+                symbolication.g_symbolication_cache.insert(key, frames)
+            symbolication.g_symbolication_cache.hits += hits
+            symbolication.g_symbolication_cache.misses += misses
+        else:
+            print_result(item[0], item[1])
+    for worker in workers:
+        worker.join()
+
 def CreateSymbolicateCrashLogOptions(command_name, description, add_interactive_options):
     usage = "usage: %prog [options] <FILE> [FILE ...]"
     option_parser = optparse.OptionParser(description=description, prog='crashlog',usage=usage)
@@ -737,6 +989,11 @@ def CreateSymbolicateCrashLogOptions(command_name, description, add_interactive_
     option_parser.add_option('--source-all'    ,       action='store_true', dest='source_all', help='show source for all threads, not just the crashed thread', default=False)
     if add_interactive_options:
         option_parser.add_option('-i', '--interactive', action='store_true', help='parse all crash logs and enter interactive mode', default=False)
+        option_parser.add_option('--cache-file'    ,       type='string', metavar='PATH', dest='cache_file', help='load symbolicated addresses from PATH before symbolicating and save them back when done', default=None)
+        option_parser.add_option('--cache-stats'   ,       action='store_true', dest='cache_stats', help='show symbolication cache hit and miss statistics', default=False)
+        option_parser.add_option('--batch'         ,       action='store_true', dest='batch', help='symbolicate all crash log files and directories of crash logs, sharing one target between the crash logs of the same main executable', default=False)
+        option_parser.add_option('--jobs'          , '-j', type='int', dest='jobs', help='the number of worker processes to use in --batch mode (default is 1)', default=1)
+        option_parser.add_option('--json'          ,       action='store_true', dest='json', help='print one JSON object per crash log in --batch mode', default=False)
     return option_parser
     
 def SymbolicateCrashLogs(command_args):
@@ -764,13 +1021,25 @@ be disassembled and lookups can be performed using the addresses found in the cr
         time.sleep(options.debug_delay)
     error = lldb.SBError()
         
+    if options.cache_file:
+        err = symbolication.g_symbolication_cache.load(options.cache_file)
+        if err:
+            print err
     if args:
         if options.interactive:
             interactive_crashlogs(options, args)
+        elif options.batch:
+            SymbolicateCrashLogsInBatches(options, args)
         else:
             for crash_log_file in args:
                 crash_log = CrashLog(crash_log_file)
                 SymbolicateCrashLog (crash_log, options)
+    if options.cache_file:
+        err = symbolication.g_symbolication_cache.save(options.cache_file)
+        if err:
+            print err
+    if options.cache_stats:
+        print symbolication.g_symbolication_cache
 if __name__ == '__main__':
     # Create a new debugger instance
     lldb.debugger = lldb.SBDebugger.Create()
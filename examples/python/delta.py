@@ -17,6 +17,8 @@
 #----------------------------------------------------------------------
 
 import commands
+import heapq
+import json
 import optparse
 import os
 import shlex
@@ -52,16 +54,23 @@ def parse_time_log(debugger, command, result, dict):
     parse_time_log_args (command_args)
 
 def parse_time_log_args(command_args):
-    usage = "usage: parse_time_log [options] [<LOGFILEPATH>]"
+    usage = "usage: parse_time_log [options] [<LOGFILEPATH> ...]"
     description='''Parse a log file that contains timestamps and convert the timestamps to delta times between log lines.'''
     parser = optparse.OptionParser(description=description, prog='parse_time_log',usage=usage)
     parser.add_option('-v', '--verbose', action='store_true', dest='verbose', help='display verbose debug info', default=False)
+    parser.add_option('-m', '--merge', action='store_true', dest='merge', help='merge all log files into a single timeline and show which channels the time was spent in', default=False)
+    parser.add_option('-q', '--quiet', action='store_true', dest='quiet', help='don\'t print the merged log lines, only the summary', default=False)
+    parser.add_option('-t', '--trace', type='string', dest='trace_file', help='write the merged timeline to a Chrome trace event JSON file (implies --merge)', default=None)
+    parser.add_option('-g', '--gaps', type='int', dest='max_gaps', help='the number of largest gaps to show for each channel when merging', default=5)
     try:
         (options, args) = parser.parse_args(command_args)
     except:
         return
-    for log_file in args:
-        parse_log_file (log_file, options)
+    if options.merge or options.trace_file:
+        merge_log_files (args, options)
+    else:
+        for log_file in args:
+            parse_log_file (log_file, options)
 
 def parse_log_file(file, options):
     '''Parse a log file that was contains timestamps. These logs are typically
@@ -84,8 +93,8 @@ def parse_log_file(file, options):
     base_time = 0.0
     last_time = 0.0
     file = open(file)
-    lines = file.read().splitlines()
-    for line in lines:
+    for line in file:
+        line = line.rstrip('\r\n')
         match = timestamp_regex.match (line)
         if match:
             curr_time = float (match.group(2))
@@ -102,6 +111,142 @@ def parse_log_file(file, options):
                     
     
     
+def get_log_file_lines(file, channel_idx):
+    '''Generate a (time, channel_idx, line_idx, text) tuple for each line in a
+    log file that contains timestamps. Lines without a timestamp get the time
+    of the line before them.'''
+    timestamp_regex = re.compile('(\s*)([1-9][0-9]+\.[0-9]+)([^0-9].*)$')
+    curr_time = None
+    line_idx = 0
+    f = open(file)
+    for line in f:
+        line = line.rstrip('\r\n')
+        match = timestamp_regex.match (line)
+        if match:
+            curr_time = float (match.group(2))
+            text = match.group(3)
+        else:
+            text = line
+        if curr_time is not None:
+            yield (curr_time, channel_idx, line_idx, text)
+        line_idx += 1
+    f.close()
+
+class ChannelStats:
+    def __init__(self, name, max_gaps):
+        self.name = name
+        self.line_count = 0
+        self.total_gap_time = 0.0
+        self.max_gaps = max_gaps
+        self.largest_gaps = list() # A min heap of the largest (gap, time, text) tuples
+
+    def add_gap(self, gap, curr_time, text):
+        self.total_gap_time += gap
+        if self.max_gaps <= 0:
+            return
+        if len(self.largest_gaps) < self.max_gaps:
+            heapq.heappush(self.largest_gaps, (gap, curr_time, text))
+        elif gap > self.largest_gaps[0][0]:
+            heapq.heapreplace(self.largest_gaps, (gap, curr_time, text))
+
+class ChromeTraceFile:
+    '''Writes events to a JSON file in the Chrome trace event format one at
+    a time'''
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.file.write('[')
+        self.separator = '\n'
+
+    def write_event(self, event):
+        self.file.write(self.separator)
+        self.file.write(json.dumps(event))
+        self.separator = ',\n'
+
+    def write_log_line(self, entry, base_time, duration):
+        (curr_time, channel_idx, line_idx, text) = entry
+        self.write_event({ 'name' : text.strip()[:80], 'ph' : 'X', 'pid' : 1, 'tid' : channel_idx, 
+                           'ts' : (curr_time - base_time) * 1000000.0, 'dur' : duration * 1000000.0, 'args' : { 'line' : text } })
+
+    def close(self):
+        self.file.write('\n]\n')
+        self.file.close()
+
+def get_channel_name(file):
+    (channel_name, extension) = os.path.splitext(os.path.basename(file))
+    return channel_name
+
+def get_channel_names(files):
+    '''Get a unique channel name for each file, log files with the same name
+    in different directories are prefixed with their directory name, and
+    any names that are still the same get their index appended'''
+    base_names = [get_channel_name(file) for file in files]
+    names = list(base_names)
+    for (idx, file) in enumerate(files):
+        if base_names.count(base_names[idx]) > 1:
+            parent_dir = os.path.basename(os.path.dirname(os.path.abspath(file)))
+            names[idx] = os.path.join(parent_dir, base_names[idx])
+    same_names = [name for name in names if names.count(name) > 1]
+    for (idx, name) in enumerate(names):
+        if name in same_names:
+            names[idx] = '%s#%u' % (name, idx)
+    return names
+
+def merge_log_files(files, options):
+    '''Merge log files that contain timestamps into a single timeline. The
+    files are read one line at a time and merged with a heap, so any number
+    of logs of any size can be merged. The time between each line and the
+    line that follows it in the timeline is attributed to the channel of the
+    line, and a summary of where the time went is printed at the end. If
+    "options.trace_file" is set, the timeline is also written to it in the
+    Chrome trace event format that "chrome://tracing" can load.'''
+    channels = list()
+    for channel_name in get_channel_names(files):
+        channels.append(ChannelStats(channel_name, options.max_gaps))
+    trace_file = None
+    if options.trace_file:
+        trace_file = ChromeTraceFile(options.trace_file)
+        for (channel_idx, channel) in enumerate(channels):
+            trace_file.write_event({ 'name' : 'thread_name', 'ph' : 'M', 'pid' : 1, 'tid' : channel_idx, 'args' : { 'name' : channel.name } })
+
+    base_time = None
+    prev = None
+    timelines = [get_log_file_lines(file, channel_idx) for (channel_idx, file) in enumerate(files)]
+    for curr in heapq.merge(*timelines):
+        (curr_time, channel_idx, line_idx, text) = curr
+        if base_time is None:
+            base_time = curr_time
+        delta = 0.0
+        if prev:
+            (prev_time, prev_channel_idx, prev_line_idx, prev_text) = prev
+            delta = curr_time - prev_time
+            channels[prev_channel_idx].add_gap(delta, prev_time - base_time, prev_text)
+            if trace_file:
+                trace_file.write_log_line(prev, base_time, delta)
+        channels[channel_idx].line_count += 1
+        if not options.quiet:
+            print '%.6f %+.6f %-12s%s' % (curr_time - base_time, delta, channels[channel_idx].name, text)
+        prev = curr
+    if prev:
+        channels[prev[1]].add_gap(0.0, prev[0] - base_time, prev[3])
+        if trace_file:
+            trace_file.write_log_line(prev, base_time, 0.0)
+    if trace_file:
+        trace_file.close()
+
+    total_time = 0.0
+    for channel in channels:
+        total_time += channel.total_gap_time
+    print '#----------------------------------------------------------------------'
+    print '# Time attributed to each channel:'
+    print '#----------------------------------------------------------------------'
+    for channel in sorted(channels, key=lambda channel: channel.total_gap_time, reverse=True):
+        percent = 0.0
+        if total_time > 0.0:
+            percent = channel.total_gap_time * 100.0 / total_time
+        print '%-16s %.6f sec %6.2f%% %8u lines' % (channel.name, channel.total_gap_time, percent, channel.line_count)
+        for (gap, gap_time, text) in sorted(channel.largest_gaps, reverse=True):
+            print '    %+.6f at %.6f:%s' % (gap, gap_time, text)
+
 if __name__ == '__main__':
     import sys
     parse_time_log_args (sys.argv[1:])
@@ -1,9 +1,29 @@
 #! /usr/bin/env python
 
+import mmap
 import string
 import struct
 import sys
 
+# Compiling a format string is much more expensive than using it, so every
+# byte order + format combination is compiled once and shared by all extractors
+g_structs = dict()
+
+def get_struct(byte_order, fmt):
+    '''Get a cached struct.Struct for "fmt" in the byte order "byte_order"'''
+    key = byte_order + fmt
+    s = g_structs.get(key)
+    if s is None:
+        s = struct.Struct(key)
+        g_structs[key] = s
+    return s
+
+def swap_unpack_char():
+    '''Returns the unpack prefix that will swap the native byte order'''
+    if sys.byteorder == 'little':
+        return '>'
+    return '<'
+
 class FileExtract:
     '''Decode binary data from a file'''
     
@@ -63,7 +83,7 @@ class FileExtract:
         '''Extract a single int8_t from the binary file at the current file position, returns a single integer'''
         s = self.read_size(1)
         if s:
-            v, = struct.unpack(self.byte_order + 'b', s)
+            v, = get_struct(self.byte_order, 'b').unpack(s)
             return v
         else:
             return fail_value
@@ -72,7 +92,7 @@ class FileExtract:
         '''Extract a single uint8_t from the binary file at the current file position, returns a single integer'''
         s = self.read_size(1)
         if s:
-            v, = struct.unpack(self.byte_order + 'B', s)
+            v, = get_struct(self.byte_order, 'B').unpack(s)
             return v
         else:
             return fail_value
@@ -81,7 +101,7 @@ class FileExtract:
         '''Extract a single int16_t from the binary file at the current file position, returns a single integer'''
         s = self.read_size(2)
         if s:
-            v, = struct.unpack(self.byte_order + 'h', s)
+            v, = get_struct(self.byte_order, 'h').unpack(s)
             return v
         else:
             return fail_value
@@ -90,7 +110,7 @@ class FileExtract:
         '''Extract a single uint16_t from the binary file at the current file position, returns a single integer'''
         s = self.read_size(2)
         if s:
-            v, = struct.unpack(self.byte_order + 'H', s)
+            v, = get_struct(self.byte_order, 'H').unpack(s)
             return v
         else:
             return fail_value
@@ -99,7 +119,7 @@ class FileExtract:
         '''Extract a single int32_t from the binary file at the current file position, returns a single integer'''
         s = self.read_size(4)
         if s:
-            v, = struct.unpack(self.byte_order + 'i', s)
+            v, = get_struct(self.byte_order, 'i').unpack(s)
             return v
         else:
             return fail_value
@@ -108,7 +128,7 @@ class FileExtract:
         '''Extract a single uint32_t from the binary file at the current file position, returns a single integer'''
         s = self.read_size(4)
         if s:
-            v, = struct.unpack(self.byte_order + 'I', s)
+            v, = get_struct(self.byte_order, 'I').unpack(s)
             return v
         else:
             return fail_value
@@ -117,7 +137,7 @@ class FileExtract:
         '''Extract a single int64_t from the binary file at the current file position, returns a single integer'''
         s = self.read_size(8)
         if s:
-            v, = struct.unpack(self.byte_order + 'q', s)
+            v, = get_struct(self.byte_order, 'q').unpack(s)
             return v
         else:
             return fail_value
@@ -126,7 +146,7 @@ class FileExtract:
         '''Extract a single uint64_t from the binary file at the current file position, returns a single integer'''
         s = self.read_size(8)
         if s:
-            v, = struct.unpack(self.byte_order + 'Q', s)
+            v, = get_struct(self.byte_order, 'Q').unpack(s)
             return v
         else:
             return fail_value
@@ -135,7 +155,7 @@ class FileExtract:
         '''Extract a single fixed length C string from the binary file at the current file position, returns a single C string'''
         s = self.read_size(n)
         if s:
-            cstr, = struct.unpack(self.byte_order + ("%i" % n) + 's', s)
+            cstr, = get_struct(self.byte_order, '%is' % n).unpack(s)
             # Strip trialing NULLs
             cstr = string.strip(cstr, "\0")
             if isprint_only_with_space_padding:
@@ -160,7 +180,7 @@ class FileExtract:
         '''Extract "n" int8_t integers from the binary file at the current file position, returns a list of integers'''
         s = self.read_size(n)
         if s:
-            return struct.unpack(self.byte_order + ("%u" % n) + 'b', s)
+            return get_struct(self.byte_order, '%ub' % n).unpack(s)
         else:
             return (fail_value,) * n
 
@@ -168,7 +188,7 @@ class FileExtract:
         '''Extract "n" uint8_t integers from the binary file at the current file position, returns a list of integers'''
         s = self.read_size(n)
         if s:
-            return struct.unpack(self.byte_order + ("%u" % n) + 'B', s)
+            return get_struct(self.byte_order, '%uB' % n).unpack(s)
         else:
             return (fail_value,) * n
 
@@ -176,7 +196,7 @@ class FileExtract:
         '''Extract "n" int16_t integers from the binary file at the current file position, returns a list of integers'''
         s = self.read_size(2*n)
         if s:
-            return struct.unpack(self.byte_order + ("%u" % n) + 'h', s)
+            return get_struct(self.byte_order, '%uh' % n).unpack(s)
         else:
             return (fail_value,) * n
 
@@ -184,7 +204,7 @@ class FileExtract:
         '''Extract "n" uint16_t integers from the binary file at the current file position, returns a list of integers'''
         s = self.read_size(2*n)
         if s:
-            return struct.unpack(self.byte_order + ("%u" % n) + 'H', s)
+            return get_struct(self.byte_order, '%uH' % n).unpack(s)
         else:
             return (fail_value,) * n
 
@@ -192,7 +212,7 @@ class FileExtract:
         '''Extract "n" int32_t integers from the binary file at the current file position, returns a list of integers'''
         s = self.read_size(4*n)
         if s:
-            return struct.unpack(self.byte_order + ("%u" % n) + 'i', s)
+            return get_struct(self.byte_order, '%ui' % n).unpack(s)
         else:
             return (fail_value,) * n
 
@@ -200,7 +220,7 @@ class FileExtract:
         '''Extract "n" uint32_t integers from the binary file at the current file position, returns a list of integers'''
         s = self.read_size(4*n)
         if s:
-            return struct.unpack(self.byte_order + ("%u" % n) + 'I', s)
+            return get_struct(self.byte_order, '%uI' % n).unpack(s)
         else:
             return (fail_value,) * n
 
@@ -208,7 +228,7 @@ class FileExtract:
         '''Extract "n" int64_t integers from the binary file at the current file position, returns a list of integers'''
         s = self.read_size(8*n)
         if s:
-            return struct.unpack(self.byte_order + ("%u" % n) + 'q', s)
+            return get_struct(self.byte_order, '%uq' % n).unpack(s)
         else:
             return (fail_value,) * n
 
@@ -216,6 +236,89 @@ class FileExtract:
         '''Extract "n" uint64_t integers from the binary file at the current file position, returns a list of integers'''
         s = self.read_size(8*n)
         if s:
-            return struct.unpack(self.byte_order + ("%u" % n) + 'Q', s)
+            return get_struct(self.byte_order, '%uQ' % n).unpack(s)
         else:
             return (fail_value,) * n
+
+    def get_struct_array(self, fmt, count):
+        '''Extract "count" consecutive structures described by the struct module format "fmt" from the binary file at the current file position, returns a list of tuples'''
+        st = get_struct(self.byte_order, fmt)
+        s = self.read_size(st.size * count)
+        if s is None:
+            return list()
+        return [st.unpack_from(s, i * st.size) for i in range(count)]
+
+class BufferExtract(FileExtract):
+    '''Decode binary data from a string or any other buffer that supports slicing and find()'''
+
+    def __init__(self, buf, b = '='):
+        '''Initialize with a buffer and optional byte order'''
+        FileExtract.__init__(self, None, b)
+        self.buf = buf
+        self.buf_size = len(buf)
+        self.offset = 0
+
+    def seek(self, offset, whence = 0):
+        if whence == 1:
+            offset += self.offset
+        elif whence == 2:
+            offset += self.buf_size
+        if offset < 0:
+            raise ValueError
+        self.offset = offset
+
+    def tell(self):
+        return self.offset
+
+    def read_size (self, byte_size):
+        end_offset = self.offset + byte_size
+        if end_offset > self.buf_size:
+            self.offset = self.buf_size
+            return None
+        s = self.buf[self.offset:end_offset]
+        self.offset = end_offset
+        return s
+
+    def push_offset_and_seek(self, offset):
+        '''Push the current offset and seek to "offset"'''
+        self.offsets.append(self.offset)
+        self.offset = offset
+
+    def pop_offset_and_seek(self):
+        '''Pop a previously pushed offset, or do nothing if there were no previously pushed offsets'''
+        if len(self.offsets) > 0:
+            self.offset = self.offsets.pop()
+
+    def get_c_string(self):
+        '''Extract a single NULL terminated C string from the buffer at the current offset, returns a single C string'''
+        end_offset = self.buf.find('\0', self.offset)
+        if end_offset < 0:
+            end_offset = self.buf_size
+        cstr = self.buf[self.offset:end_offset]
+        self.offset = min(end_offset + 1, self.buf_size)
+        return cstr
+
+    def get_struct_array(self, fmt, count):
+        '''Extract "count" consecutive structures described by the struct module format "fmt" from the buffer at the current offset, returns a list of tuples'''
+        st = get_struct(self.byte_order, fmt)
+        end_offset = self.offset + st.size * count
+        if end_offset > self.buf_size:
+            self.offset = self.buf_size
+            return list()
+        offset = self.offset
+        self.offset = end_offset
+        return [st.unpack_from(self.buf, offset + i * st.size) for i in range(count)]
+
+class MappedFileExtract(BufferExtract):
+    '''Decode binary data from a file by memory mapping it, which avoids a read system call for every value that gets extracted'''
+
+    def __init__(self, f, b = '='):
+        '''Initialize with an open binary file and optional byte order'''
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, mmap.error):
+            # Empty files can't be mapped and some file objects have no descriptor
+            f.seek(0)
+            buf = f.read()
+        BufferExtract.__init__(self, buf, b)
+        self.file = f
@@ -14,16 +14,23 @@
 #   (lldb) command script import /path/to/gdbremote.py
 # Or it can be added to your ~/.lldbinit file so this module is always
 # available.
+#
+# A packet log can also be replayed to a debugger from the command line:
+#   % ./gdbremote.py --replay-port 1234 /tmp/gdb.log
+#   (lldb) process connect connect://localhost:1234
 #----------------------------------------------------------------------
 
 import commands
+import math
 import optparse
 import os
 import re
 import shlex
+import socket
 import string
 import sys
 import tempfile
+import time
 
 #----------------------------------------------------------------------
 # Global variables
@@ -229,6 +236,8 @@ def stop_gdb_log(debugger, command, result, dict):
     parser.add_option('-q', '--quiet', action='store_true', dest='quiet', help='display verbose debug info', default=False)
     parser.add_option('-C', '--color', action='store_true', dest='color', help='add terminal colors', default=False)
     parser.add_option('-c', '--sort-by-count', action='store_true', dest='sort_count', help='display verbose debug info', default=False)
+    parser.add_option('-S', '--summary-only', action='store_true', dest='summary_only', help='only print the packet timing summary, don\'t decode and print each packet', default=False)
+    parser.add_option('--chattiness', action='store_true', dest='chattiness', help='report the packets that could have been avoided or merged', default=False)
     parser.add_option('-s', '--symbolicate', action='store_true', dest='symbolicate', help='symbolicate addresses in log using current "lldb.target"', default=False)
     try:
         (options, args) = parser.parse_args(command_args)
@@ -251,6 +260,8 @@ def stop_gdb_log(debugger, command, result, dict):
             debugger.HandleCommand('log disable gdb-remote packets');
             result.PutCString ("GDB packet logging disabled. Logged packets are in '%s'" % g_log_file)
             parse_gdb_log_file (g_log_file, options)
+            if options.chattiness:
+                analyze_gdb_log_chattiness (g_log_file, options)
         else:
             result.PutCString (usage)
     else:
@@ -856,6 +867,69 @@ gdb_remote_commands = {
     'Z'                       : { 'cmd' : cmd_bp            , 'rsp' : rsp_ok_means_success    , 'name' : "set breakpoint or watchpoint" },
     'k'                       : { 'cmd' : cmd_kill          , 'rsp' : rsp_stop_reply          , 'name' : "kill process" },
 }
+class PacketTimes:
+    '''Keeps the round trip times of one kind of packet in a fixed size log
+    scale histogram so percentiles can be reported for logs of any size'''
+    buckets_per_power_of_two = 4
+    num_buckets = 128 # The last bucket starts at 2^31.75 micro seconds
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * PacketTimes.num_buckets
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        usec = seconds * 1000000.0
+        if usec < 1.0:
+            bucket = 0
+        else:
+            bucket = min(int(math.log(usec, 2) * PacketTimes.buckets_per_power_of_two) + 1, PacketTimes.num_buckets - 1)
+        self.buckets[bucket] += 1
+
+    def percentile(self, percent):
+        '''Return the upper bound in seconds of the bucket that contains the
+        given percentile, which is at most 19% above the actual value'''
+        rank = math.ceil(self.count * percent / 100.0)
+        count = 0
+        for bucket in range(PacketTimes.num_buckets):
+            count += self.buckets[bucket]
+            if count >= rank:
+                upper_bound = math.pow(2.0, float(bucket) / PacketTimes.buckets_per_power_of_two) / 1000000.0
+                return min(upper_bound, self.max)
+        return self.max
+
+g_tricky_commands = [ 'qRegisterInfo', 'qThreadStopInfo' ]
+g_packet_name_regex = re.compile('([A-Za-z_]+)')
+# Packets whose name is their first character, followed by hex arguments that
+# could otherwise be taken for part of the name, like "xffff0000,20"
+g_one_letter_packet_names = 'cCgGkmMpPsSTxXzZ'
+g_packet_names_regex = re.compile('(' + '|'.join(gdb_remote_commands.keys()) + ')(.*)')
+
+def get_packet_name(contents):
+    '''Get the name to use in the packet timing summary for the contents of a
+    command packet'''
+    m = g_packet_names_regex.match (contents)
+    if m:
+        return m.group(1)
+    if contents and contents[0] in g_one_letter_packet_names:
+        return contents[0]
+    if contents.startswith('H'):
+        # "Hg<thread-id>" and "Hc<thread-id>"
+        return contents[:2]
+    packet_match = g_packet_name_regex.match (contents)
+    if packet_match:
+        packet_name = packet_match.group(1)
+        for tricky_cmd in g_tricky_commands:
+            if packet_name.find (tricky_cmd) == 0:
+                packet_name = tricky_cmd
+        return packet_name
+    return contents
+
 def parse_gdb_log_file(file, options):
     '''Parse a GDB log file that was generated by enabling logging with:
     (lldb) log enable --threadsafe --timestamp --file <FILE> gdb-remote packets
@@ -864,82 +938,94 @@ def parse_gdb_log_file(file, options):
     show delta times between log lines and also keep track of how long it takes
     for GDB remote commands to make a send/receive round trip. This can be
     handy when trying to figure out why some operation in the debugger is taking
-    a long time during a preset set of debugger commands.'''
+    a long time during a preset set of debugger commands.
+    
+    The log file is read one line at a time so logs of any size can be
+    parsed. If "options.summary_only" is set, the packets are not decoded
+    and only the packet timing summary is printed.'''
 
-    tricky_commands = [ 'qRegisterInfo' ]
     timestamp_regex = re.compile('(\s*)([1-9][0-9]+\.[0-9]+)([^0-9].*)$')
-    packet_name_regex = re.compile('([A-Za-z_]+)[^a-z]')
     packet_transmit_name_regex = re.compile('(?P<direction>send|read) packet: (?P<packet>.*)')
     packet_contents_name_regex = re.compile('\$([^#]+)#[0-9a-fA-F]{2}')
-    packet_names_regex_str = '(' + '|'.join(gdb_remote_commands.keys()) + ')(.*)';
-    packet_names_regex = re.compile(packet_names_regex_str);
+    summary_only = options and getattr(options, 'summary_only', False)
     
     base_time = 0.0
     last_time = 0.0
     packet_send_time = 0.0
-    packet_total_times = {}
-    packet_count = {}
+    packet_times = {}
     file = open(file)
-    lines = file.read().splitlines()
     last_command = None
     last_command_args = None
     last_command_packet = None
-    for line in lines:
-        packet_name = None
-        m = packet_transmit_name_regex.search(line)
+    last_packet_name = None
+    for line in file:
+        line = line.rstrip('\r\n')
         is_command = False
-        if m:
-            direction = m.group('direction')
-            is_command = direction == 'send'
-            packet = m.group('packet')
-            sys.stdout.write(options.colors.green())
-            if options.quiet:
-                if is_command:
-                    print '-->', packet
+        is_response = False
+        if summary_only:
+            # Only the direction, packet name and timestamp are needed, so
+            # avoid the regular expressions when we can
+            idx = line.find(' packet: $')
+            if idx >= 4:
+                direction = line[idx-4:idx]
+                if direction == 'send':
+                    is_command = True
+                    contents = line[idx+10:]
+                    checksum_idx = contents.rfind('#')
+                    if checksum_idx >= 0:
+                        contents = contents[:checksum_idx]
+                    last_packet_name = get_packet_name(contents)
+                elif direction == 'read':
+                    is_response = True
+            if not is_command and not is_response:
+                continue
+        else:
+            m = packet_transmit_name_regex.search(line)
+            if m:
+                direction = m.group('direction')
+                is_command = direction == 'send'
+                packet = m.group('packet')
+                sys.stdout.write(options.colors.green())
+                if options.quiet:
+                    if is_command:
+                        print '-->', packet
+                    else:
+                        print '<--', packet
                 else:
-                    print '<--', packet
-            else:
-                print '#  ', line
-            sys.stdout.write(options.colors.reset())
+                    print '#  ', line
+                sys.stdout.write(options.colors.reset())
+                    
+                #print 'direction = "%s", packet = "%s"' % (direction, packet)
                 
-            #print 'direction = "%s", packet = "%s"' % (direction, packet)
-            
-            if packet[0] == '+':
-                print 'ACK'
-            elif packet[0] == '-':
-                print 'NACK'
-            elif packet[0] == '$':
-                m = packet_contents_name_regex.match(packet)
-                if m:
-                    contents = m.group(1)
-                    if is_command:
-                        m = packet_names_regex.match (contents)
-                        if m:
-                            last_command = m.group(1)
-                            packet_name = last_command
-                            last_command_args = m.group(2)
-                            last_command_packet = contents
-                            gdb_remote_commands[last_command]['cmd'](options, last_command, last_command_args)
-                        else:
-                            packet_match = packet_name_regex.match (line[idx+14:])
-                            if packet_match:
-                                packet_name = packet_match.group(1)
-                                for tricky_cmd in tricky_commands:
-                                    if packet_name.find (tricky_cmd) == 0:
-                                        packet_name = tricky_cmd
+                if packet[0] == '+':
+                    print 'ACK'
+                elif packet[0] == '-':
+                    print 'NACK'
+                elif packet[0] == '$':
+                    is_response = not is_command
+                    m = packet_contents_name_regex.match(packet)
+                    if m:
+                        contents = m.group(1)
+                        if is_command:
+                            last_packet_name = get_packet_name(contents)
+                            m = g_packet_names_regex.match (contents)
+                            if m:
+                                last_command = m.group(1)
+                                last_command_args = m.group(2)
+                                last_command_packet = contents
+                                gdb_remote_commands[last_command]['cmd'](options, last_command, last_command_args)
                             else:
-                                packet_name = contents
-                            last_command = None
-                            last_command_args = None
-                            last_command_packet = None
-                    elif last_command:
-                        gdb_remote_commands[last_command]['rsp'](options, last_command, last_command_args, contents)
+                                last_command = None
+                                last_command_args = None
+                                last_command_packet = None
+                        elif last_command:
+                            gdb_remote_commands[last_command]['rsp'](options, last_command, last_command_args, contents)
+                    else:
+                        print 'error: invalid packet: "', packet, '"'
                 else:
-                    print 'error: invalid packet: "', packet, '"'
+                    print '???'
             else:
-                print '???'
-        else:
-            print '## ', line
+                print '## ', line
         match = timestamp_regex.match (line)
         if match:
             curr_time = float (match.group(2))
@@ -951,53 +1037,307 @@ def parse_gdb_log_file(file, options):
             
             if is_command:
                 packet_send_time = curr_time
-            elif line.find('read packet: $') >= 0 and packet_name:
-                if packet_name in packet_total_times:
-                    packet_total_times[packet_name] += delta
-                    packet_count[packet_name] += 1
+            elif is_response and last_packet_name:
+                if last_packet_name in packet_times:
+                    times = packet_times[last_packet_name]
                 else:
-                    packet_total_times[packet_name] = delta
-                    packet_count[packet_name] = 1
-                packet_name = None
+                    times = PacketTimes()
+                    packet_times[last_packet_name] = times
+                times.add(curr_time - packet_send_time)
+                last_packet_name = None
 
-            if not options or not options.quiet:
+            if not summary_only and (not options or not options.quiet):
                 print '%s%.6f %+.6f%s' % (match.group(1), curr_time - base_time, delta, match.group(3))
             last_time = curr_time
         # else:
         #     print line
-    if packet_total_times:
+    file.close()
+    if packet_times:
         total_packet_time = 0.0
         total_packet_count = 0
-        for key, vvv in packet_total_times.items():
-            # print '  key = (%s) "%s"' % (type(key), key)
-            # print 'value = (%s) %s' % (type(vvv), vvv)
-            # if type(vvv) == 'float':
-            total_packet_time += vvv
-        for key, vvv in packet_count.items():
-            total_packet_count += vvv
+        for times in packet_times.values():
+            total_packet_time += times.total
+            total_packet_count += times.count
 
         print '#---------------------------------------------------'
         print '# Packet timing summary:'
         print '# Totals: time - %6f count %6d' % (total_packet_time, total_packet_count)
         print '#---------------------------------------------------'
-        print '# Packet                   Time (sec) Percent Count '
-        print '#------------------------- ---------- ------- ------'
+        print '# Packet                   Time (sec) Percent Count  p50 (sec) p90 (sec) p99 (sec) max (sec)'
+        print '#------------------------- ---------- ------- ------ --------- --------- --------- ---------'
         if options and options.sort_count:
-            res = sorted(packet_count, key=packet_count.__getitem__, reverse=True)
+            res = sorted(packet_times, key=lambda name: packet_times[name].count, reverse=True)
         else:
-            res = sorted(packet_total_times, key=packet_total_times.__getitem__, reverse=True)
+            res = sorted(packet_times, key=lambda name: packet_times[name].total, reverse=True)
 
         if last_time > 0.0:
             for item in res:
-                packet_total_time = packet_total_times[item]
-                packet_percent = (packet_total_time / total_packet_time)*100.0
-                if packet_percent >= 10.0:
-                    print "  %24s %.6f   %.2f%% %6d" % (item, packet_total_time, packet_percent, packet_count[item])
+                times = packet_times[item]
+                if total_packet_time > 0.0:
+                    packet_percent = (times.total / total_packet_time)*100.0
                 else:
-                    print "  %24s %.6f   %.2f%%  %6d" % (item, packet_total_time, packet_percent, packet_count[item])
+                    packet_percent = 0.0
+                print "  %24s %.6f %6.2f%% %6d  %.6f  %.6f  %.6f  %.6f" % (item, times.total, packet_percent, times.count, times.percentile(50), times.percentile(90), times.percentile(99), times.max)
                     
     
     
+def get_gdb_log_packets(file):
+    '''Generate a (time, is_command, contents) tuple for each "$" packet that
+    was sent or read in a GDB log file. "time" is None if the log file has
+    no timestamps.'''
+    timestamp_regex = re.compile('\s*([1-9][0-9]+\.[0-9]+)[^0-9]')
+    packet_transmit_name_regex = re.compile('(?P<direction>send|read) packet: \$(?P<contents>[^#]*)#[0-9a-fA-F]{2}')
+    file = open(file)
+    for line in file:
+        m = packet_transmit_name_regex.search(line)
+        if not m:
+            continue
+        curr_time = None
+        match = timestamp_regex.match(line)
+        if match:
+            curr_time = float(match.group(1))
+        yield (curr_time, m.group('direction') == 'send', m.group('contents'))
+    file.close()
+
+def get_gdb_log_exchanges(file):
+    '''Read the command packets and the response packets that followed each
+    of them from a GDB log file. Returns a dictionary that maps the contents
+    of each command packet to a list with one entry for each time it was sent.
+    Each entry is a list of (delay, contents) tuples for the responses, where
+    "delay" is how many seconds after the previous packet each response was 
+    read.'''
+    exchanges = {}
+    responses = None
+    last_time = None
+    for (curr_time, is_command, contents) in get_gdb_log_packets(file):
+        if is_command:
+            responses = list()
+            exchanges.setdefault(contents, list()).append(responses)
+        elif responses is not None:
+            delay = 0.0
+            if curr_time is not None and last_time is not None:
+                delay = curr_time - last_time
+            responses.append((delay, contents))
+        last_time = curr_time
+    return exchanges
+
+class GDBRemoteReplayServer:
+    '''A GDB remote server that replays the responses that were recorded in a
+    GDB log file. Each command that is received gets the responses that were
+    read for the same command in the log. Commands that were sent more than
+    once get the recorded responses in order, and the last one is repeated
+    if lldb sends a command more times than it was recorded. Commands that
+    were never recorded get an empty "unsupported" response.'''
+    def __init__(self, exchanges, time_scale = 1.0, verbose = False):
+        self.exchanges = exchanges
+        self.exchange_indexes = dict()
+        self.time_scale = time_scale
+        self.verbose = verbose
+        self.no_ack_mode = False
+        self.connection = None
+        self.buffer = ''
+
+    def send_packet(self, contents):
+        checksum = 0
+        for ch in contents:
+            checksum += ord(ch)
+        packet = '$%s#%2.2x' % (contents, checksum & 0xff)
+        if self.verbose:
+            print '<--', packet
+        self.connection.sendall(packet)
+
+    def get_responses(self, contents):
+        if contents in self.exchanges:
+            exchanges = self.exchanges[contents]
+            index = self.exchange_indexes.get(contents, 0)
+            self.exchange_indexes[contents] = index + 1
+            return exchanges[min(index, len(exchanges) - 1)]
+        return [(0.0, '')]
+
+    def handle_command(self, contents):
+        if self.verbose:
+            print '-->', contents
+        if not self.no_ack_mode:
+            self.connection.sendall('+')
+        for (delay, response) in self.get_responses(contents):
+            if self.time_scale > 0.0 and delay > 0.0:
+                time.sleep(delay * self.time_scale)
+            self.send_packet(response)
+            if contents == 'QStartNoAckMode' and response == 'OK':
+                self.no_ack_mode = True
+
+    def handle_received_data(self):
+        while self.buffer:
+            if self.buffer[0] != '$':
+                # Skip ACKs, NACKs and interrupts
+                self.buffer = self.buffer[1:]
+                continue
+            checksum_idx = self.buffer.find('#')
+            if checksum_idx < 0 or len(self.buffer) < checksum_idx + 3:
+                return # Wait for the rest of the packet
+            contents = self.buffer[1:checksum_idx]
+            self.buffer = self.buffer[checksum_idx+3:]
+            self.handle_command(contents)
+
+    def serve(self, port):
+        listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listen_socket.bind(('127.0.0.1', port))
+        listen_socket.listen(1)
+        print 'Replaying on port %u, connect with "process connect connect://localhost:%u"' % (listen_socket.getsockname()[1], listen_socket.getsockname()[1])
+        sys.stdout.flush()
+        (self.connection, address) = listen_socket.accept()
+        listen_socket.close()
+        try:
+            while True:
+                data = self.connection.recv(4096)
+                if not data:
+                    break
+                self.buffer += data
+                self.handle_received_data()
+        except socket.error:
+            pass
+        self.connection.close()
+        self.connection = None
+
+# Packets that resume the process, every one of them starts a new stop
+g_resume_packet_names = [ 'vCont', 'vAttach', 'vRun', 'c', 'C', 's', 'S' ]
+# Packets that modify memory or registers, previous reads can't be reused after them
+g_write_packet_names = [ 'M', 'X', '_M', '_m', 'P', 'G' ]
+# Packets that only read state that doesn't change while the process is stopped
+g_read_packet_names = [ 'm', 'x', 'p', 'g', 'qMemoryRegionInfo', 'qRegisterInfo', 'qHostInfo', 'qProcessInfo', 
+                        'qShlibInfoAddr', 'qC', 'qfThreadInfo', 'qsThreadInfo', 'qThreadStopInfo', 'qThreadExtraInfo' ]
+# Packets that ask about the threads in the process
+g_thread_info_packet_names = [ 'qC', 'qfThreadInfo', 'qsThreadInfo', 'qThreadStopInfo', 'qThreadExtraInfo' ]
+# Memory reads that start at most this many bytes after the end of the previous one can be merged
+g_mergeable_memory_read_gap = 256
+# More thread info packets than this during a single stop is a thread info storm
+g_max_thread_info_packets_per_stop = 2
+
+class ChattinessStats:
+    def __init__(self, description):
+        self.description = description
+        self.count = 0
+        self.time = 0.0
+        self.packet_counts = dict()
+
+def analyze_gdb_log_chattiness(file, options):
+    '''Find the GDB remote packets in a GDB log file that could have been
+    avoided: reads that were repeated with nothing but other reads in between,
+    memory reads that are adjacent to the previous one and could have been
+    merged, "p" register reads that one "g" packet per thread could replace
+    and the extra thread info packets in stops that sent lots of them. Print
+    how many round trips and how much time could be saved.'''
+    redundant = ChattinessStats('repeated identical reads')
+    mergeable = ChattinessStats('adjacent memory reads')
+    register_reads = ChattinessStats('"p" reads a "g" could replace')
+    thread_info = ChattinessStats('thread info storms')
+    all_stats = [ redundant, mergeable, register_reads, thread_info ]
+    num_resumes = 0
+    num_storms = 0
+    num_commands = 0
+    total_time = 0.0
+    
+    # State for the current stop
+    reads = set()
+    memory_read_end = None
+    registers_read = dict()
+    thread_info_count = 0
+    current_thread = None
+
+    # The avoidable command that is waiting for its response
+    pending_stats = None
+    pending_name = None
+    send_time = None
+    for (curr_time, is_command, contents) in get_gdb_log_packets(file):
+        if not is_command:
+            if send_time is not None and curr_time is not None:
+                rtt = curr_time - send_time
+                total_time += rtt
+                if pending_stats:
+                    pending_stats.time += rtt
+            send_time = None
+            pending_stats = None
+            continue
+        num_commands += 1
+        send_time = curr_time
+        pending_stats = None
+        packet_name = get_packet_name(contents)
+        if packet_name in g_resume_packet_names and contents != 'vCont?':
+            num_resumes += 1
+            if thread_info_count > g_max_thread_info_packets_per_stop:
+                num_storms += 1
+            reads = set()
+            memory_read_end = None
+            registers_read = dict()
+            thread_info_count = 0
+            continue
+        if packet_name in g_write_packet_names:
+            reads = set()
+            memory_read_end = None
+            registers_read = dict()
+            continue
+        if contents.startswith('Hg'):
+            current_thread = contents[2:]
+        if packet_name not in g_read_packet_names:
+            memory_read_end = None
+            continue
+        if contents in reads:
+            pending_stats = redundant
+        else:
+            reads.add(contents)
+            if packet_name in ('m', 'x'):
+                try:
+                    (addr, size) = contents[1:].split(',')
+                    addr = int(addr, 16)
+                    size = int(size, 16)
+                except ValueError:
+                    addr = None
+                if addr is not None:
+                    if memory_read_end is not None and memory_read_end <= addr and addr <= memory_read_end + g_mergeable_memory_read_gap:
+                        pending_stats = mergeable
+                    memory_read_end = addr + size
+            elif packet_name == 'p':
+                match = g_thread_suffix_regex.search(contents)
+                if match:
+                    thread = match.group(1)
+                else:
+                    thread = current_thread
+                if thread in registers_read:
+                    pending_stats = register_reads
+                registers_read[thread] = True
+            if packet_name in g_thread_info_packet_names:
+                thread_info_count += 1
+                if thread_info_count > g_max_thread_info_packets_per_stop:
+                    pending_stats = thread_info
+        if packet_name not in ('m', 'x'):
+            memory_read_end = None
+        if pending_stats:
+            pending_stats.count += 1
+            pending_stats.packet_counts[packet_name] = pending_stats.packet_counts.get(packet_name, 0) + 1
+    if thread_info_count > g_max_thread_info_packets_per_stop:
+        num_storms += 1
+
+    total_count = 0
+    total_saved_time = 0.0
+    print '#---------------------------------------------------'
+    print '# Packet chattiness report:'
+    print '# %u commands, %u resumes, %.6f seconds of round trips' % (num_commands, num_resumes, total_time)
+    print '#---------------------------------------------------'
+    print '# Avoidable packets                Count Time (sec) Packets'
+    print '#------------------------------- ------ ---------- -------'
+    for stats in all_stats:
+        packets = ', '.join(['%s x %u' % (name, count) for (name, count) in sorted(stats.packet_counts.items(), key=lambda item: item[1], reverse=True)])
+        print '  %-30s %6u %.6f   %s' % (stats.description, stats.count, stats.time, packets)
+        total_count += stats.count
+        total_saved_time += stats.time
+    print '#---------------------------------------------------'
+    print '# %u stops had more than %u thread info packets' % (num_storms, g_max_thread_info_packets_per_stop)
+    if total_time > 0.0:
+        print '# %u round trips and %.6f seconds (%.2f%%) could be saved' % (total_count, total_saved_time, total_saved_time * 100.0 / total_time)
+    else:
+        print '# %u round trips could be saved' % (total_count)
+
 if __name__ == '__main__':
     usage = "usage: gdbremote [options]"
     description='''The command disassembles a GDB remote packet log.'''
@@ -1006,7 +1346,11 @@ if __name__ == '__main__':
     parser.add_option('-q', '--quiet', action='store_true', dest='quiet', help='display verbose debug info', default=False)
     parser.add_option('-C', '--color', action='store_true', dest='color', help='add terminal colors', default=False)
     parser.add_option('-c', '--sort-by-count', action='store_true', dest='sort_count', help='display verbose debug info', default=False)
+    parser.add_option('-S', '--summary-only', action='store_true', dest='summary_only', help='only print the packet timing summary, don\'t decode and print each packet', default=False)
+    parser.add_option('--chattiness', action='store_true', dest='chattiness', help='report the packets that could have been avoided or merged', default=False)
     parser.add_option('--crashlog', type='string', dest='crashlog', help='symbolicate using a darwin crash log file', default=False)
+    parser.add_option('--replay-port', type='int', dest='replay_port', help='replay the responses in the GDB log file to a debugger that connects to this port, 0 picks any free port', default=None)
+    parser.add_option('--time-scale', type='float', dest='time_scale', help='multiply the recorded delays by this amount when replaying, 0 replays without any delays', default=1.0)
     try:
         (options, args) = parser.parse_args(sys.argv[1:])
     except:
@@ -1022,6 +1366,14 @@ if __name__ == '__main__':
         options.symbolicator = lldb.macosx.crashlog.CrashLog(options.crashlog)
         print '%s' % (options.symbolicator)
 
+    if options.replay_port is not None:
+        if len(args) != 1:
+            print 'error: --replay-port requires exactly one GDB log file'
+            sys.exit(1)
+        server = GDBRemoteReplayServer(get_gdb_log_exchanges(args[0]), options.time_scale, options.verbose)
+        server.serve(options.replay_port)
+        sys.exit(0)
+
     # This script is being run from the command line, create a debugger in case we are
     # going to use any debugger functions in our function.
     for file in args:
@@ -1029,6 +1381,8 @@ if __name__ == '__main__':
         print "# GDB remote log file: '%s'" % file
         print '#----------------------------------------------------------------------'
         parse_gdb_log_file (file, options)
+        if options.chattiness:
+            analyze_gdb_log_chattiness (file, options)
     if options.symbolicator:
         print '%s' % (options.symbolicator)
         
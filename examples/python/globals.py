@@ -10,12 +10,19 @@
 
 import lldb
 import commands
+import json
+import multiprocessing
 import optparse
 import os
 import shlex
 import sys
 
 def get_globals(raw_path, options):
+    '''Find all global variables in the executable module of the object file
+    at "raw_path" and return a list of dictionaries, one per global, that
+    only contain strings and numbers so they can be sent back from a worker
+    process.'''
+    globals_list = list()
     error = lldb.SBError()
     # Resolve the path if needed
     path = os.path.expanduser(raw_path)
@@ -25,30 +32,64 @@ def get_globals(raw_path, options):
         # Get the executable module
         module = target.module[target.executable.basename]
         if module:
-            # Keep track of which variables we have already looked up
-            global_names = list()
-            # Iterate through all symbols in the symbol table and watch for any DATA symbols
+            # Collect the unique names of all DATA symbols first, a name can
+            # appear many times in the symbol table (static variables in 
+            # different compile units) and each name needs only one lookup
+            global_names = set()
             for symbol in module.symbols:
                 if symbol.type == lldb.eSymbolTypeData:
-                    # The symbol is a DATA symbol, lets try and find all global variables 
-                    # that match this name and print them
-                    global_name = symbol.name
-                    # Make sure we don't lookup the same variable twice
-                    if global_name not in global_names:
-                        global_names.append(global_name)
-                        # Find all global variables by name
-                        global_variable_list = module.FindGlobalVariables (target, global_name, lldb.UINT32_MAX)
-                        if global_variable_list:
-                            # Print results for anything that matched
-                            for global_variable in global_variable_list:
-                                print 'name = %s' % global_variable.name    # returns the global variable name as a string
-                                print 'value = %s' % global_variable.value  # Returns the variable value as a string
-                                print 'type = %s' % global_variable.type    # Returns an lldb.SBType object
-                                print 'addr = %s' % global_variable.addr    # Returns an lldb.SBAddress (section offset address) for this global
-                                print 'file_addr = 0x%x' % global_variable.addr.file_addr    # Returns the file virtual address for this global
-                                print 'location = %s' % global_variable.location    # returns the global variable value as a string
-                                print 'size = %s' % global_variable.size    # Returns the size in bytes of this global variable
-                                print
+                    global_names.add(symbol.name)
+            # Keep track of which variables we have already found by name and
+            # address, one lookup by name returns the variables with that 
+            # name from every compile unit
+            found_globals = set()
+            for global_name in sorted(global_names):
+                # Find all global variables by name
+                global_variable_list = module.FindGlobalVariables (target, global_name, lldb.UINT32_MAX)
+                for global_variable in global_variable_list:
+                    file_addr = global_variable.addr.file_addr # Returns the file virtual address for this global
+                    key = (global_variable.name, file_addr)
+                    if key in found_globals:
+                        continue
+                    found_globals.add(key)
+                    globals_list.append({ 'path' : path,
+                                          'name' : global_variable.name,             # returns the global variable name as a string
+                                          'value' : global_variable.value,           # Returns the variable value as a string
+                                          'type' : global_variable.type.name,        # The name of the lldb.SBType of this global
+                                          'type_description' : str(global_variable.type),
+                                          'addr' : str(global_variable.addr),        # The lldb.SBAddress (section offset address) for this global
+                                          'file_addr' : file_addr,
+                                          'location' : global_variable.location,     # returns the global variable location as a string
+                                          'size' : global_variable.size })           # Returns the size in bytes of this global variable
+        lldb.debugger.DeleteTarget(target)
+    return globals_list
+
+def init_globals_worker():
+    '''Give each worker process its own debugger'''
+    lldb.debugger = lldb.SBDebugger.Create()
+
+def get_globals_worker(args):
+    '''Find the globals for one path in a worker process'''
+    (path, options) = args
+    return get_globals(path, options)
+
+def print_globals(globals_list, options):
+    for global_variable in globals_list:
+        if options.json:
+            print json.dumps({ 'name' : global_variable['name'],
+                               'type' : global_variable['type'],
+                               'file_addr' : global_variable['file_addr'],
+                               'size' : global_variable['size'],
+                               'path' : global_variable['path'] })
+        else:
+            print 'name = %s' % global_variable['name']
+            print 'value = %s' % global_variable['value']
+            print 'type = %s' % global_variable['type_description']
+            print 'addr = %s' % global_variable['addr']
+            print 'file_addr = 0x%x' % global_variable['file_addr']
+            print 'location = %s' % global_variable['location']
+            print 'size = %s' % global_variable['size']
+            print
 
 def globals(command_args):
     '''Extract all globals from any arguments which must be paths to object files.'''
@@ -58,15 +99,25 @@ def globals(command_args):
     parser.add_option('-v', '--verbose', action='store_true', dest='verbose', help='display verbose debug info', default=False)
     parser.add_option('-a', '--arch', type='string', metavar='arch', dest='arch', help='Specify an architecture (or triple) to use when extracting from a file.')
     parser.add_option('-p', '--platform', type='string', metavar='platform', dest='platform', help='Specify the platform to use when creating the debug target. Valid values include "localhost", "darwin-kernel", "ios-simulator", "remote-freebsd", "remote-macosx", "remote-ios", "remote-linux".')
+    parser.add_option('-j', '--jobs', type='int', dest='jobs', help='find the globals of N paths at a time in worker processes', default=1)
+    parser.add_option('--json', action='store_true', dest='json', help='print one JSON object per global with its name, type, file_addr, size and path', default=False)
     try:
         (options, args) = parser.parse_args(command_args)
     except:
         return
     
-    for path in args:
-        get_globals (path, options)
+    if options.jobs > 1 and len(args) > 1:
+        pool = multiprocessing.Pool(options.jobs, init_globals_worker)
+        # imap() hands back the results in the order of the paths as soon as
+        # they are ready, so output is the same as a serial run
+        for globals_list in pool.imap(get_globals_worker, [(path, options) for path in args]):
+            print_globals(globals_list, options)
+        pool.close()
+        pool.join()
+    else:
+        for path in args:
+            print_globals(get_globals (path, options), options)
     
 if __name__ == '__main__':
     lldb.debugger = lldb.SBDebugger.Create()
     globals (sys.argv[1:])
-
@@ -1,8 +1,11 @@
 #!/usr/bin/python
 
+import array
+import bisect
 import cmd
 import dict_utils
 import file_extract
+import multiprocessing
 import optparse
 import re
 import struct
@@ -361,6 +364,50 @@ def swap_unpack_char():
         return '<'
     return '>'    
 
+def uint64_array(values):
+    '''Returns a compact array for 64 bit values when the host has a 64 bit
+    array typecode, and a list otherwise. Python 2 has no 'Q' array typecode,
+    but 'L' is 64 bits wide on LP64 hosts.'''
+    if array.array('L').itemsize == 8:
+        return array.array('L', values)
+    return list(values)
+
+def get_regex_literal_prefixes(pattern, max_prefixes = 8):
+    '''Returns the list of literal strings that any match of the anchored regular
+    expression "pattern" must start with, or None if the pattern isn't anchored
+    or the prefixes can't be figured out.'''
+    if not pattern.startswith('^') or '|' in pattern:
+        return None
+    prefixes = ['']
+    i = 1
+    while i < len(pattern):
+        c = pattern[i]
+        if not (c.isalnum() or c == '_'):
+            break
+        quantifier = pattern[i+1] if i + 1 < len(pattern) else ''
+        if quantifier == '?':
+            # An optional character doubles the number of prefixes
+            if len(prefixes) * 2 > max_prefixes:
+                break
+            prefixes = prefixes + [prefix + c for prefix in prefixes]
+            i += 2
+        elif quantifier in ('*', '{'):
+            break
+        elif quantifier == '+':
+            prefixes = [prefix + c for prefix in prefixes]
+            break
+        else:
+            prefixes = [prefix + c for prefix in prefixes]
+            i += 1
+    # Drop prefixes that are covered by shorter ones
+    prefixes.sort()
+    result = list()
+    for prefix in prefixes:
+        if not result or not prefix.startswith(result[-1]):
+            result.append(prefix)
+    return result
+
+
 
 def dump_hex_bytes(addr, s, bytes_per_line=16):
     i = 0
@@ -518,8 +565,8 @@ class Mach:
     def parse(self, path):
         self.path = path;
         try:
-            f = open(self.path)
-            file_extractor = file_extract.FileExtract(f, '=')
+            f = open(self.path, 'rb')
+            file_extractor = file_extract.MappedFileExtract(f, '=')
             self.unpack(file_extractor)
             #f.close()
         except IOError as (errno, strerror):
@@ -554,6 +601,9 @@ class Mach:
     def dump_symbol_names_matching_regex(self, regex, file=None):
         self.content.dump_symbol_names_matching_regex(regex, file)
     
+    def get_summaries(self):
+        return self.content.get_summaries()
+
     def description(self):
         return self.content.description()
     
@@ -593,7 +643,7 @@ class Mach:
             s += ')'
             return s
 
-        def unpack(self, data, magic = None):
+        def unpack(self, data, magic = None, unpack_slices = True):
             self.file_off = data.tell()
             if magic is None:
                 self.magic = Mach.Magic()
@@ -607,6 +657,8 @@ class Mach:
             for i in range(self.nfat_arch):
                 self.archs.append(Mach.Universal.ArchInfo())
                 self.archs[i].unpack(data)
+            if not unpack_slices:
+                return
             for i in range(self.nfat_arch):
                 self.archs[i].mach = Mach.Skinny(self.path)
                 data.seek (self.archs[i].offset, 0)
@@ -619,19 +671,23 @@ class Mach:
             return False
         
         def dump(self, options):
+            self.dump_fat_header(options)
+            for i in range(self.nfat_arch):
+                self.archs[i].mach.dump(options)
+
+        def dump_fat_header(self, options):
             if options.dump_header:
                 print
                 print "Universal Mach File: magic = %s, nfat_arch = %u" % (self.magic, self.nfat_arch)
                 print
-            if self.nfat_arch > 0:
-                if options.dump_header:
+                if self.nfat_arch > 0:
                     self.archs[0].dump_header(True, options)
                     for i in range(self.nfat_arch):
                         self.archs[i].dump_flat(options)
-                if options.dump_header:
                     print
-                for i in range(self.nfat_arch):
-                    self.archs[i].mach.dump(options)
+
+        def get_summaries(self):
+            return [self.archs[i].mach.get_summary() for i in range(self.nfat_arch)]
 
         def dump_header(self, dump_description = True, options = None):
             if dump_description:
@@ -1032,7 +1088,7 @@ class Mach:
                             outfile = open(options.outfile, 'w')
                             if options.extract_modules:
                                 #print "Extracting modules from mach file..."
-                                data = file_extract.FileExtract(StringIO.StringIO(sect_bytes), self.data.byte_order)
+                                data = file_extract.BufferExtract(sect_bytes, self.data.byte_order)
                                 version = data.get_uint32()
                                 num_modules = data.get_uint32()
                                 #print "version = %u, num_modules = %u" % (version, num_modules)
@@ -1081,22 +1137,19 @@ class Mach:
                 lc_symtab = self.get_first_load_command (LC_SYMTAB)
                 if lc_symtab:
                     symtab_offset = self.file_off
+                    strtab_offset = self.file_off
                     if self.data.is_in_memory():
                         linkedit_segment = self.get_segment('__LINKEDIT')
                         if linkedit_segment:
                             linkedit_vmaddr = linkedit_segment.vmaddr
                             linkedit_fileoff = linkedit_segment.fileoff
                             symtab_offset = linkedit_vmaddr + lc_symtab.symoff - linkedit_fileoff
-                            symtab_offset = linkedit_vmaddr + lc_symtab.stroff - linkedit_fileoff
+                            strtab_offset = linkedit_vmaddr + lc_symtab.stroff - linkedit_fileoff
                     else:
                         symtab_offset += lc_symtab.symoff
-                
-                    self.data.seek (symtab_offset)
-                    is_64 = self.is_64_bit()
-                    for i in range(lc_symtab.nsyms):
-                        nlist = Mach.NList()
-                        nlist.unpack (self, self.data, lc_symtab)
-                        self.symbols.append(nlist)
+                        strtab_offset += lc_symtab.stroff
+                    self.symbols = Mach.Symtab()
+                    self.symbols.unpack (self, self.data, lc_symtab, symtab_offset, strtab_offset)
                 else:
                     print "no LC_SYMTAB"                
             
@@ -1109,11 +1162,49 @@ class Mach:
         
         def dump_symbol_names_matching_regex(self, regex, file=None):
             self.get_symtab()
-            for symbol in self.symbols:
-                if symbol.name and regex.search (symbol.name):
-                    print symbol.name
-                    if file:
-                        file.write('%s\n' % (symbol.name))
+            if not self.symbols:
+                return
+            for name in self.symbols.get_names_matching_regex(regex):
+                print name
+                if file:
+                    file.write('%s\n' % (name))
+
+        def get_summary(self):
+            '''Returns a dictionary that describes this mach-o file using only builtin
+            types, so it can be pickled and sent back from a worker process'''
+            self.get_symtab()
+            if self.symbols:
+                symtab_stats = self.symbols.get_stats()
+            else:
+                symtab_stats = Mach.Symtab().get_stats()
+            return { 'path'          : self.path,
+                     'file_off'      : self.file_off,
+                     'arch'          : str(self.arch),
+                     'filetype'      : self.filetype.get_enum_name(),
+                     'ncmds'         : self.ncmds,
+                     'sizeofcmds'    : self.sizeofcmds,
+                     'flags'         : str(self.flags),
+                     'uuid'          : str(self.uuid) if self.uuid else None,
+                     'load_commands' : [str(lc) for lc in self.commands],
+                     'sections'      : [str(section) for section in self.sections[1:]],
+                     'symtab'        : symtab_stats }
+
+        def get_summaries(self):
+            return [self.get_summary()]
+
+        def find_symbol_by_name(self, name):
+            '''Returns the first Mach.NList whose name is "name", or None'''
+            self.get_symtab()
+            if not self.symbols:
+                return None
+            return self.symbols.find_symbol_by_name(name)
+
+        def find_symbol_containing_address(self, addr):
+            '''Returns the section symbol (Mach.NList) with the largest address that is less than or equal to "addr", or None'''
+            self.get_symtab()
+            if not self.symbols:
+                return None
+            return self.symbols.find_symbol_containing_address(addr)
         
         def is_64_bit(self):
             return self.magic.is_64_bit()
@@ -1592,6 +1683,145 @@ class Mach:
             return '%#8.8x %#2.2x (%-20s) %#2.2x %#4.4x %16.16x%s' % (self.name_offset, self.type.value, self.type, self.sect_idx, self.desc, self.value, name_display)
 
 
+    class Symtab:
+        '''A symbol table that keeps the nlist entries in parallel arrays and the string table
+        as a single buffer. Mach.NList objects are only created for the symbols that are
+        asked for, and the name and address indexes are only built on first use.'''
+
+        def __init__(self):
+            self.n_strx = array.array('I')
+            self.n_type = array.array('B')
+            self.n_sect = array.array('B')
+            self.n_desc = array.array('H')
+            self.n_value = list()
+            self.strtab = ''
+            self.name_to_index = None
+            self.sorted_names = None
+            self.sorted_name_indexes = None
+            self.sorted_addrs = None
+            self.sorted_addr_indexes = None
+
+        def unpack(self, mach_file, data, symtab_lc, symtab_offset, strtab_offset):
+            data.seek (symtab_offset)
+            if mach_file.is_64_bit():
+                nlist_format = 'IBBHQ'
+            else:
+                nlist_format = 'IBBHI'
+            entries = data.get_struct_array(nlist_format, symtab_lc.nsyms)
+            if entries:
+                n_strx, n_type, n_sect, n_desc, n_value = zip(*entries)
+                self.n_strx.extend(n_strx)
+                self.n_type.extend(n_type)
+                self.n_sect.extend(n_sect)
+                self.n_desc.extend(n_desc)
+                self.n_value = uint64_array(n_value)
+            data.push_offset_and_seek (strtab_offset)
+            strtab = data.read_size (symtab_lc.strsize)
+            data.pop_offset_and_seek()
+            if strtab:
+                self.strtab = strtab
+
+        def __len__(self):
+            return len(self.n_strx)
+
+        def __getitem__(self, index):
+            if index < 0:
+                index += len(self)
+            if index < 0 or index >= len(self):
+                raise IndexError('symbol index out of range')
+            nlist = Mach.NList()
+            nlist.index = index
+            nlist.name_offset = self.n_strx[index]
+            nlist.type.value = self.n_type[index]
+            nlist.sect_idx = self.n_sect[index]
+            nlist.desc = self.n_desc[index]
+            nlist.value = self.n_value[index]
+            nlist.name = self.get_name(index)
+            return nlist
+
+        def __iter__(self):
+            for index in range(len(self)):
+                yield self[index]
+
+        def get_name(self, index):
+            strx = self.n_strx[index]
+            end = self.strtab.find('\0', strx)
+            if end < 0:
+                end = len(self.strtab)
+            return self.strtab[strx:end]
+
+        def build_name_indexes(self):
+            if self.name_to_index is None:
+                self.name_to_index = dict()
+                names = list()
+                for index in range(len(self)):
+                    name = self.get_name(index)
+                    if name:
+                        names.append((name, index))
+                        # Keep the first symbol when a name is used more than once
+                        self.name_to_index.setdefault(name, index)
+                names.sort()
+                self.sorted_names = [name for (name, index) in names]
+                self.sorted_name_indexes = array.array('I', [index for (name, index) in names])
+
+        def build_address_index(self):
+            if self.sorted_addrs is None:
+                addrs = list()
+                for index in range(len(self)):
+                    n_type = self.n_type[index]
+                    if (n_type & N_STAB) == 0 and (n_type & N_TYPE) == N_SECT:
+                        addrs.append((self.n_value[index], index))
+                addrs.sort()
+                self.sorted_addrs = uint64_array([addr for (addr, index) in addrs])
+                self.sorted_addr_indexes = array.array('I', [index for (addr, index) in addrs])
+
+        def get_stats(self):
+            stats = { 'nsyms' : len(self), 'strsize' : len(self.strtab), 'nstab' : 0, 'nundef' : 0, 'next' : 0 }
+            for n_type in self.n_type:
+                if n_type & N_STAB:
+                    stats['nstab'] += 1
+                else:
+                    if (n_type & N_TYPE) == N_UNDF:
+                        stats['nundef'] += 1
+                    if n_type & N_EXT:
+                        stats['next'] += 1
+            return stats
+
+        def find_symbol_by_name(self, name):
+            self.build_name_indexes()
+            index = self.name_to_index.get(name)
+            if index is None:
+                return None
+            return self[index]
+
+        def find_symbol_containing_address(self, addr):
+            self.build_address_index()
+            i = bisect.bisect_right(self.sorted_addrs, addr)
+            if i == 0:
+                return None
+            return self[self.sorted_addr_indexes[i-1]]
+
+        def get_names_matching_regex(self, regex):
+            '''Returns the names of all symbols that match "regex", in symbol table order'''
+            self.build_name_indexes()
+            prefixes = None
+            if not (regex.flags & re.IGNORECASE):
+                prefixes = get_regex_literal_prefixes(regex.pattern)
+            if prefixes is None:
+                # No usable prefix, every name has to be tried
+                prefixes = ['']
+            indexes = list()
+            num_names = len(self.sorted_names)
+            for prefix in prefixes:
+                # All names that start with "prefix" are adjacent in the sorted names
+                i = bisect.bisect_left(self.sorted_names, prefix)
+                while i < num_names and self.sorted_names[i].startswith(prefix):
+                    if regex.search(self.sorted_names[i]):
+                        indexes.append(self.sorted_name_indexes[i])
+                    i += 1
+            indexes.sort()
+            return [self.get_name(index) for index in indexes]
+
     class Interactive(cmd.Cmd):
         '''Interactive command interpreter to mach-o files.'''
         
@@ -1635,6 +1865,88 @@ class Mach:
             self.mach.dump_symtab(True, self.options)
             return False
 
+def dump_summary(summary):
+    symtab = summary['symtab']
+    print '%#8.8x: %s (%s) %s ncmds = %u, nsects = %u, nsyms = %u (%u stabs, %u undefined, %u external), uuid = %s' % (
+        summary['file_off'], summary['path'], summary['arch'], summary['filetype'], summary['ncmds'],
+        len(summary['sections']), symtab['nsyms'], symtab['nstab'], symtab['nundef'], symtab['next'], summary['uuid'])
+
+def dump_mach_file_slice(args):
+    '''Parse and dump the skinny mach-o file at "file_off" within "path". This runs
+    in a worker process, so the dump output is captured and returned as a string
+    along with the summary of the file.'''
+    (path, file_off, options) = args
+    saved_stdout = sys.stdout
+    sys.stdout = StringIO.StringIO()
+    summary = None
+    try:
+        try:
+            f = open(path, 'rb')
+            data = file_extract.MappedFileExtract(f, '=')
+            data.seek(file_off)
+            magic = Mach.Magic()
+            magic.unpack(data)
+            mach = Mach.Skinny(path)
+            mach.unpack(data, magic)
+            mach.dump(options)
+            summary = mach.get_summary()
+        except IOError as (errno, strerror):
+            print "I/O error({0}): {1}".format(errno, strerror)
+        output = sys.stdout.getvalue()
+    finally:
+        sys.stdout = saved_stdout
+    return (summary, output)
+
+def dump_mach_files_in_parallel(mach_files, options):
+    '''Parse skinny files and each slice of universal files in a pool of worker
+    processes, and print the results in the same order as a serial run would'''
+    # Only the universal headers are parsed here, they tell us where each slice is
+    fat_headers = list()
+    jobs = list()
+    for path in mach_files:
+        try:
+            f = open(path, 'rb')
+            data = file_extract.MappedFileExtract(f, '=')
+        except IOError as (errno, strerror):
+            print "I/O error({0}): {1}".format(errno, strerror)
+            continue
+        magic = Mach.Magic()
+        magic.unpack(data)
+        if magic.is_universal_mach_file():
+            universal = Mach.Universal(path)
+            universal.unpack(data, magic, unpack_slices = False)
+            fat_headers.append(universal)
+            for arch in universal.archs:
+                jobs.append((path, arch.offset, options))
+        elif magic.is_skinny_mach_file():
+            fat_headers.append(None)
+            jobs.append((path, 0, options))
+        else:
+            print "error: '%s' is not a mach-o file" % (path)
+        f.close()
+
+    pool = multiprocessing.Pool(options.jobs)
+    # imap() hands back the results in the order of the jobs as soon as they
+    # are ready, so output starts streaming before every file is parsed
+    results = pool.imap(dump_mach_file_slice, jobs)
+    for universal in fat_headers:
+        if universal:
+            universal.dump_fat_header(options)
+            num_slices = universal.nfat_arch
+        else:
+            num_slices = 1
+        summaries = list()
+        for i in range(num_slices):
+            (summary, output) = results.next()
+            sys.stdout.write(output)
+            if summary:
+                summaries.append(summary)
+        if options.stats:
+            for summary in summaries:
+                dump_summary(summary)
+    pool.close()
+    pool.join()
+
 if __name__ == '__main__':
     parser = optparse.OptionParser(description='A script that parses skinny and universal mach-o files.')
     parser.add_option('--arch', '-a', type='string', metavar='arch', dest='archs', action='append', help='specify one or more architectures by name')
@@ -1650,6 +1962,8 @@ if __name__ == '__main__':
     parser.add_option('-c', '--compare', action='store_true', dest='compare', help='compare two mach files', default=False)
     parser.add_option('-M', '--extract-modules', action='store_true', dest='extract_modules', help='Extract modules from file', default=False)
     parser.add_option('-C', '--count', type='int', dest='max_count', help='Sets the max byte count when dumping section data', default=-1)
+    parser.add_option('-j', '--jobs', type='int', dest='jobs', help='parse files and universal file slices in N worker processes', default=1)
+    parser.add_option('--stats', action='store_true', dest='stats', help='print a one line summary of each mach-o file', default=False)
     
     (options, mach_files) = parser.parse_args()
     if options.extract_modules:
@@ -1670,18 +1984,24 @@ if __name__ == '__main__':
         else:
             print 'error: --compare takes two mach files as arguments'
     else:
-        if not (options.dump_header or options.dump_load_commands or options.dump_symtab or options.dump_sections or options.find_mangled or options.section_names):
+        if not (options.dump_header or options.dump_load_commands or options.dump_symtab or options.dump_sections or options.find_mangled or options.section_names or options.stats):
             options.dump_header = True
             options.dump_load_commands = True
         if options.verbose:
             print 'options', options
             print 'mach_files', mach_files
-        for path in mach_files:
-            mach = Mach()
-            mach.parse(path)
-            if options.interactive:
-                interpreter = Mach.Interactive(mach, options)
-                interpreter.cmdloop()
-            else:
-                mach.dump(options)            
+        if options.jobs > 1 and not options.interactive:
+            dump_mach_files_in_parallel(mach_files, options)
+        else:
+            for path in mach_files:
+                mach = Mach()
+                mach.parse(path)
+                if options.interactive:
+                    interpreter = Mach.Interactive(mach, options)
+                    interpreter.cmdloop()
+                else:
+                    mach.dump(options)
+                    if options.stats:
+                        for summary in mach.get_summaries():
+                            dump_summary(summary)            
 
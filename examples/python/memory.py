@@ -46,6 +46,7 @@ except ImportError:
         print "error: couldn't locate the 'lldb' module, please set PYTHONPATH correctly"
         sys.exit(1)
 
+import collections
 import commands
 import optparse
 import shlex
@@ -79,14 +80,254 @@ def append_data_callback(option, opt_str, value, parser):
         int64 = int(value, 0)
         parser.values.data += struct.pack('1q',int64)
 
+class MemoryPattern:
+    '''A sequence of bytes to search for. Bytes whose mask isn't 0xff only
+    need to match in the bits that are set in the mask.'''
+    def __init__(self, name, bytes, mask = None):
+        self.name = name
+        self.bytes = bytes
+        self.mask = mask
+        # The longest run of bytes that must match exactly is used to find
+        # candidate matches, the rest of the pattern is checked afterwards
+        self.key = bytes
+        self.key_offset = 0
+        if mask:
+            self.key = ''
+            run_start = 0
+            for i in range(len(bytes) + 1):
+                if i == len(bytes) or mask[i] != '\xff':
+                    if i - run_start > len(self.key):
+                        self.key = bytes[run_start:i]
+                        self.key_offset = run_start
+                    run_start = i + 1
+
+    def __len__(self):
+        return len(self.bytes)
+
+    def matches(self, data, offset):
+        '''Check if this pattern matches "data" at "offset", the key must have already matched'''
+        if not self.mask:
+            return True
+        for i in range(len(self.bytes)):
+            mask = ord(self.mask[i])
+            if mask and (ord(data[offset + i]) & mask) != (ord(self.bytes[i]) & mask):
+                return False
+        return True
+
+def parse_hex_pattern(hex_string):
+    '''Parse hex bytes like "48 8b ?? 2?" where "?" matches any nibble into a MemoryPattern'''
+    hex_chars = hex_string.replace(' ', '')
+    if len(hex_chars) == 0 or len(hex_chars) % 2:
+        raise ValueError('hex patterns must have an even number of hex digits')
+    bytes = ''
+    mask = ''
+    for i in range(0, len(hex_chars), 2):
+        byte = 0
+        byte_mask = 0
+        for nibble in hex_chars[i:i+2]:
+            byte <<= 4
+            byte_mask <<= 4
+            if nibble != '?':
+                byte |= int(nibble, 16)
+                byte_mask |= 0xf
+        bytes += chr(byte)
+        mask += chr(byte_mask)
+    if '\xff' not in mask:
+        raise ValueError('hex patterns must have at least one byte without wildcards')
+    return MemoryPattern(hex_string, bytes, mask)
+
+def append_pattern_callback(option, opt_str, value, parser):
+    if opt_str in ('-c', '--cstring'):
+        if not value:
+            raise optparse.OptionValueError('%s needs a non-empty string' % (opt_str))
+        parser.values.patterns.append(MemoryPattern('"%s"' % value, value))
+    else:
+        try:
+            parser.values.patterns.append(parse_hex_pattern(value))
+        except ValueError as e:
+            raise optparse.OptionValueError('invalid hex pattern "%s": %s' % (value, e))
+
+class AhoCorasick:
+    '''Finds all occurrences of many strings in one pass over the data'''
+    def __init__(self, keys):
+        # Build the trie, each state is a dictionary of its transitions
+        self.goto = [dict()]
+        self.output = [list()]
+        for (key_idx, key) in enumerate(keys):
+            state = 0
+            for ch in key:
+                if ch not in self.goto[state]:
+                    self.goto.append(dict())
+                    self.output.append(list())
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.output[state].append(key_idx)
+        # Compute the failure links breadth first and fold the outputs of
+        # each failure state into the states that fail to it
+        self.fail = [0] * len(self.goto)
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for (ch, next_state) in self.goto[state].items():
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state and ch not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                if state and ch in self.goto[fail_state]:
+                    self.fail[next_state] = self.goto[fail_state][ch]
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def search(self, data):
+        '''Generate a (end_offset, key_idx) tuple for each key found in "data", 
+        where "end_offset" is the offset of the byte after the key'''
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        offset = 0
+        for ch in data:
+            offset += 1
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                for key_idx in output[state]:
+                    yield (offset, key_idx)
+
+class MemorySearcher:
+    '''Searches for many patterns in memory that is read a chunk at a time.
+    Each chunk is searched together with the last bytes of the previous one,
+    so matches that span two chunks are found without ever having more than
+    one chunk in memory.
+
+    The keys of the patterns are found with string.find() when there are
+    only a few of them and with a regular expression when there are more,
+    which both look at the data in C code. Only very large sets of keys go
+    through the AhoCorasick automaton one byte at a time in python.'''
+    # The most keys to look for with one string.find() pass over the data each
+    max_find_keys = 4
+    # The most keys to look for with a regular expression
+    max_regex_keys = 256
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.keys = [pattern.key for pattern in patterns]
+        if not patterns or '' in self.keys:
+            raise ValueError('patterns must not be empty')
+        self.max_len = max([len(pattern) for pattern in patterns])
+        self.key_regex = None
+        self.automaton = None
+        if len(self.keys) > self.max_regex_keys:
+            self.automaton = AhoCorasick(self.keys)
+        elif len(self.keys) > self.max_find_keys:
+            # The regular expression only finds where the next key starts,
+            # all the keys that start there are then checked directly
+            self.key_regex = re.compile('|'.join([re.escape(key) for key in self.keys]))
+            self.keys_by_first_byte = dict()
+            for (key_idx, key) in enumerate(self.keys):
+                self.keys_by_first_byte.setdefault(key[0], list()).append((key_idx, key))
+
+    def find_keys(self, data):
+        '''Generate an (end_offset, key_idx) tuple for each occurrence of each
+        key in "data", including the ones that overlap'''
+        if self.automaton:
+            for match in self.automaton.search(data):
+                yield match
+        elif self.key_regex:
+            match = self.key_regex.search(data)
+            while match:
+                match_index = match.start()
+                for (key_idx, key) in self.keys_by_first_byte[data[match_index]]:
+                    if data.startswith(key, match_index):
+                        yield (match_index + len(key), key_idx)
+                match = self.key_regex.search(data, match_index + 1)
+        else:
+            matches = list()
+            for (key_idx, key) in enumerate(self.keys):
+                match_index = string.find(data, key)
+                while match_index != -1:
+                    matches.append((match_index + len(key), key_idx))
+                    match_index = string.find(data, key, match_index + 1)
+            matches.sort()
+            for match in matches:
+                yield match
+
+    def search(self, data, data_addr, tail_len):
+        '''Generate an (address, pattern) tuple for each pattern that ends in
+        data[tail_len:], the first "tail_len" bytes of "data" are from the
+        previous chunk and matches that end in them have already been found.'''
+        for (key_end, pattern_idx) in self.find_keys(data):
+            pattern = self.patterns[pattern_idx]
+            offset = key_end - len(pattern.key) - pattern.key_offset
+            pattern_end = offset + len(pattern)
+            if offset < 0 or pattern_end <= tail_len or pattern_end > len(data):
+                continue
+            if pattern.matches(data, offset):
+                yield (data_addr + offset, pattern)
+
+    def search_memory(self, process, start_addr, end_addr, chunk_size):
+        '''Generate an (address, pattern) tuple for each match in [start_addr, end_addr)
+        and an (error, None) tuple for each chunk that can't be read.'''
+        tail = ''
+        addr = start_addr
+        while addr < end_addr:
+            size = min(chunk_size, end_addr - addr)
+            error = lldb.SBError()
+            bytes = process.ReadMemory (addr, size, error)
+            if error.Success():
+                data = tail + bytes
+                for match in self.search(data, addr - len(tail), len(tail)):
+                    yield match
+                tail = data[max(0, len(data) - self.max_len + 1):] if self.max_len > 1 else ''
+            else:
+                yield (error, None)
+                tail = ''
+            addr += size
+
+g_memory_region_regex = re.compile('response: start:([0-9a-fA-F]+);size:([0-9a-fA-F]+);(permissions:([-rwx]*);)?')
+
+def get_memory_regions(debugger, target):
+    '''Generate a (start_addr, end_addr) tuple for each readable memory region
+    in the process. Regions come from the "qMemoryRegionInfo" GDB remote 
+    packet, if the process doesn't support it the loaded sections of all 
+    modules are used instead.'''
+    interpreter = debugger.GetCommandInterpreter()
+    addr = 0
+    while True:
+        result = lldb.SBCommandReturnObject()
+        interpreter.HandleCommand('process plugin packet send qMemoryRegionInfo:%x' % addr, result)
+        match = g_memory_region_regex.search(result.GetOutput() or '')
+        if not match:
+            break
+        start_addr = int(match.group(1), 16)
+        end_addr = start_addr + int(match.group(2), 16)
+        if end_addr <= addr:
+            break
+        if match.group(4) and 'r' in match.group(4):
+            yield (start_addr, end_addr)
+        addr = end_addr
+    if addr > 0:
+        return
+    for module in target.modules:
+        for section in module.sections:
+            start_addr = section.GetLoadAddress(target)
+            if start_addr != lldb.LLDB_INVALID_ADDRESS and section.GetByteSize() > 0:
+                yield (start_addr, start_addr + section.GetByteSize())
+
 def create_memfind_options():
     usage = "usage: %prog [options] STARTADDR [ENDADDR]"
     description='''This command can find data in a specified address range. 
 Options are used to specify the data that is to be looked for and the options
-can be specified multiple times to look for longer streams of data.
+can be specified multiple times to look for longer streams of data. The 
+--hex and --cstring options can be specified multiple times to look for many
+patterns at once. Memory is read in chunks so large ranges can be searched.
 '''
     parser = optparse.OptionParser(description=description, prog='memfind',usage=usage)
     parser.add_option('-s', '--size', type='int', metavar='BYTESIZE', dest='size', help='Specify the byte size to search.', default=0)
+    parser.add_option('-a', '--all-regions', action='store_true', dest='all_regions', help='Search all readable memory regions in the process instead of an address range.', default=False)
+    parser.add_option('--chunk-size', type='int', metavar='BYTESIZE', dest='chunk_size', help='Specify how many bytes of memory to read at a time.', default=1024*1024)
+    parser.add_option('-x', '--hex', action="callback", callback=append_pattern_callback, type='string', metavar='HEX', dest='patterns', help='Specify hex bytes to search for, "?" matches any nibble (e.g. "48 8b ?? 2?").', default=[])
+    parser.add_option('-c', '--cstring', action="callback", callback=append_pattern_callback, type='string', metavar='STR', dest='patterns', help='Specify a string to search for.', default=[])
     parser.add_option('--int8', action="callback", callback=append_data_callback, type='string', metavar='INT', dest='data', help='Specify a 8 bit signed integer value to search for in memory.', default='')
     parser.add_option('--int16', action="callback", callback=append_data_callback, type='string', metavar='INT', dest='data', help='Specify a 16 bit signed integer value to search for in memory.', default='')
     parser.add_option('--int32', action="callback", callback=append_data_callback, type='string', metavar='INT', dest='data', help='Specify a 32 bit signed integer value to search for in memory.', default='')
@@ -121,11 +362,16 @@ def print_error(str, show_usage, result):
 def memfind (target, options, args, result):
     num_args = len(args)
     start_addr = 0
-    if num_args == 1:
-        if options.size > 0:
+    if options.all_regions:
+        if num_args != 0 or options.size != 0:
+            print_error ("error: --all-regions can't be specified with an address range", True, result)
+            return
+    elif num_args == 1:
+        if options.size <= 0:
             print_error ("error: --size must be specified if there is no ENDADDR argument", True, result)
             return
         start_addr = int(args[0], 0)
+        end_addr = start_addr + options.size
     elif num_args == 2:
         if options.size != 0:
             print_error ("error: --size can't be specified with an ENDADDR argument", True, result)
@@ -140,9 +386,15 @@ def memfind (target, options, args, result):
         print_error ("error: memfind takes 1 or 2 arguments", True, result)
         return
     
-    if not options.data:
+    patterns = list(options.patterns)
+    if options.data:
+        patterns.append(MemoryPattern(' '.join(['%2.2x' % ord(byte) for byte in options.data]), options.data))
+    if not patterns:
         print >>result, 'error: no data specified to search for'
         return
+    if options.chunk_size <= 0:
+        print >>result, 'error: --chunk-size must be greater than zero'
+        return
         
     if not target:
         print >>result, 'error: invalid target'
@@ -152,26 +404,30 @@ def memfind (target, options, args, result):
         print >>result, 'error: invalid process'
         return
     
-    error = lldb.SBError()
-    bytes = process.ReadMemory (start_addr, options.size, error)
-    if error.Success():
-        num_matches = 0
+    if options.all_regions:
+        ranges = get_memory_regions(target.GetDebugger(), target)
+    else:
+        ranges = [(start_addr, end_addr)]
+    searcher = MemorySearcher(patterns)
+    num_matches = 0
+    for (start_addr, end_addr) in ranges:
         print >>result, "Searching memory range [%#x - %#x) for" % (start_addr, end_addr),
-        for byte in options.data:
-            print >>result, '%2.2x' % ord(byte),
-        print >>result
-        
-        match_index = string.find(bytes, options.data)
-        while match_index != -1:
-            num_matches = num_matches + 1
-            print >>result, '%#x: %#x + %u' % (start_addr + match_index, start_addr, match_index)
-            match_index = string.find(bytes, options.data, match_index + 1)
+        print >>result, ', '.join([pattern.name for pattern in patterns])
+        for (match_addr, pattern) in searcher.search_memory(process, start_addr, end_addr, options.chunk_size):
+            if pattern is None:
+                # Unreadable memory is expected when walking all regions
+                if not options.all_regions:
+                    print >>result, 'error: %s' % (match_addr.GetCString())
+            elif len(patterns) == 1:
+                num_matches = num_matches + 1
+                print >>result, '%#x: %#x + %u' % (match_addr, start_addr, match_addr - start_addr)
+            else:
+                num_matches = num_matches + 1
+                print >>result, '%#x: %#x + %u %s' % (match_addr, start_addr, match_addr - start_addr, pattern.name)
             
-        if num_matches == 0:
-            print >>result, "error: no matches found"
-    else:
-        print >>result, 'error: %s' % (error.GetCString())
-        
+    if num_matches == 0:
+        print >>result, "error: no matches found"
+
 
 if __name__ == '__main__':
     print 'error: this script is designed to be used within the embedded script interpreter in LLDB'
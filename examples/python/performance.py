@@ -9,6 +9,7 @@
 #----------------------------------------------------------------------
 
 import commands
+import json
 import optparse
 import os
 import platform
@@ -54,12 +55,14 @@ except ImportError:
 
 
 class Timer:    
+    '''Measures the wall clock time of a "with" block, which includes the
+    time spent waiting for the inferior and any debug servers.'''
     def __enter__(self):
-        self.start = time.clock()
+        self.start = time.time()
         return self
 
     def __exit__(self, *args):
-        self.end = time.clock()
+        self.end = time.time()
         self.interval = self.end - self.start
 
 class Action(object):
@@ -245,15 +248,48 @@ class Measurement:
         assert False, "performance.Measurement.Measure() must be subclassed"
         
 class MemoryMeasurement(Measurement):
-    '''A class that can measure memory statistics for a process.'''
+    '''A class that can measure memory statistics for a process. The stats
+    come from /proc/<pid>/status where it exists and from "top" on Darwin,
+    the resource usage of the current process is added when "pid" is the
+    pid of this process. All values are in bytes except for the counts of
+    page faults.'''
     def __init__(self, pid):
         Measurement.__init__(self)
         self.pid = pid
+        self.proc_status_path = "/proc/%u/status" % (self.pid)
+        self.proc_stats = { 'VmRSS' : 'rsize', 'VmHWM' : 'rsize_peak', 'VmSize' : 'vsize', 'VmData' : 'data', 'RssAnon' : 'rprvt', 'RssFile' : 'rshrd' }
         self.stats = ["rprvt","rshrd","rsize","vsize","vprvt","kprvt","kshrd","faults","cow","pageins"]
         self.command = "top -l 1 -pid %u -stats %s" % (self.pid, ",".join(self.stats))
         self.value = dict()
     
     def Measure(self):
+        if os.path.exists(self.proc_status_path):
+            self.MeasureProcStatus()
+        elif platform.system() == 'Darwin':
+            self.MeasureTop()
+        if self.pid == os.getpid():
+            self.MeasureResourceUsage()
+
+    def MeasureProcStatus(self):
+        f = open(self.proc_status_path)
+        for line in f:
+            (key, colon, value) = line.partition(':')
+            if key in self.proc_stats:
+                # The values are in kB, like "VmRSS:	  123456 kB"
+                self.value[self.proc_stats[key]] = int(value.split()[0]) * 1024
+        f.close()
+
+    def MeasureResourceUsage(self):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # ru_maxrss is in bytes on Darwin and in kilobytes everywhere else
+        if platform.system() == 'Darwin':
+            self.value['maxrss'] = usage.ru_maxrss
+        else:
+            self.value['maxrss'] = usage.ru_maxrss * 1024
+        self.value['minflt'] = usage.ru_minflt
+        self.value['majflt'] = usage.ru_majflt
+
+    def MeasureTop(self):
         output = commands.getoutput(self.command).split("\n")[-1]
         values = re.split('[-+\s]+', output)
         for (idx, stat) in enumerate(values):
@@ -267,6 +303,7 @@ class MemoryMeasurement(Measurement):
                     stat = stat[:-1]
                 elif stat[-1] == 'G':
                     multiplier = 1024*1024*1024
+                    stat = stat[:-1]
                 elif stat[-1] == 'T':
                     multiplier = 1024*1024*1024*1024
                     stat = stat[:-1]
@@ -323,13 +360,243 @@ class TesterTestCase(TestCase):
         print('Total time = %.03f sec.' % total_time.interval)
         
 
+class Scenario:
+    '''A declarative description of a debug session to time: the program to
+    launch, the breakpoints to set before launching, how many times to step
+    over once the process stops and which expressions to evaluate. Scenarios
+    can be loaded from a JSON file that contains a list of objects with the 
+    same keys as the arguments to the constructor.'''
+    def __init__(self, name, args, breakpoints = list(), steps = 0, expressions = list()):
+        self.name = name
+        self.args = args
+        self.breakpoints = breakpoints # Function names or "file:line" strings
+        self.steps = steps
+        self.expressions = expressions
+
+    @classmethod
+    def from_dict(cls, scenario_dict):
+        return cls(scenario_dict['name'], 
+                   scenario_dict['args'], 
+                   scenario_dict.get('breakpoints', list()), 
+                   scenario_dict.get('steps', 0), 
+                   scenario_dict.get('expressions', list()))
+
+def get_median(values):
+    sorted_values = sorted(values)
+    count = len(sorted_values)
+    if count % 2:
+        return sorted_values[count / 2]
+    return (sorted_values[count / 2 - 1] + sorted_values[count / 2]) / 2.0
+
+class ScenarioTestCase(TestCase):
+    '''Runs a Scenario a number of times after some warm-up runs whose times
+    are thrown away, and times each phase of each run separately.'''
+    phases = ['target', 'breakpoints', 'launch', 'step', 'expression', 'kill']
+
+    def __init__(self, scenario, iterations = 5, warmup = 1):
+        TestCase.__init__(self)
+        # Each phase is timed by waiting for it to complete
+        self.debugger.SetAsync(False)
+        self.scenario = scenario
+        self.iterations = iterations
+        self.warmup = warmup
+        self.phase_times = dict()
+        for phase in self.phases:
+            self.phase_times[phase] = list()
+        self.inferior_memory = None
+        self.debugger_memory = None
+        self.errors = list()
+
+    def Error(self, message):
+        if message not in self.errors:
+            # Report errors on stderr so they never end up in the JSON results printed with "-j -"
+            sys.stderr.write("error: %s: %s\n" % (self.scenario.name, message))
+            self.errors.append(message)
+
+    def RunOnce (self, record):
+        '''Run the scenario once, the phase times are only kept if "record" is True.'''
+        times = dict()
+        with Timer() as timer:
+            self.target = self.debugger.CreateTarget(self.scenario.args[0])
+        times['target'] = timer.interval
+        if not self.target:
+            self.Error("failed to create target with '%s'" % (self.scenario.args[0]))
+            return False
+        with Timer() as timer:
+            for breakpoint in self.scenario.breakpoints:
+                (file, colon, line) = breakpoint.rpartition(':')
+                if file and line.isdigit():
+                    bp = self.target.BreakpointCreateByLocation(file, int(line))
+                else:
+                    bp = self.target.BreakpointCreateByName(breakpoint)
+                if bp.GetNumLocations() == 0:
+                    self.Error("breakpoint '%s' has no locations" % (breakpoint))
+        times['breakpoints'] = timer.interval
+        self.launch_info = lldb.SBLaunchInfo(self.scenario.args[1:])
+        error = lldb.SBError()
+        with Timer() as timer:
+            self.process = self.target.Launch (self.launch_info, error)
+        times['launch'] = timer.interval
+        if not error.Success() or not self.process:
+            self.Error("failed to launch: %s" % (error.GetCString()))
+            self.debugger.DeleteTarget(self.target)
+            return False
+        stopped = self.process.GetState() == lldb.eStateStopped
+        if stopped:
+            self.thread = self.process.GetSelectedThread()
+        elif self.scenario.steps or self.scenario.expressions:
+            self.Error("the process didn't stop at a breakpoint, skipping steps and expressions")
+        with Timer() as timer:
+            if stopped:
+                for i in range(self.scenario.steps):
+                    self.thread.StepOver()
+                    if self.process.GetState() != lldb.eStateStopped:
+                        self.Error("the process didn't stop after step %u" % (i))
+                        stopped = False
+                        break
+        times['step'] = timer.interval
+        with Timer() as timer:
+            if stopped:
+                frame = self.thread.GetSelectedFrame()
+                for expression in self.scenario.expressions:
+                    value = frame.EvaluateExpression(expression)
+                    if not value.GetError().Success():
+                        self.Error("expression '%s' failed: %s" % (expression, value.GetError().GetCString()))
+        times['expression'] = timer.interval
+        if record and self.process.IsValid() and self.process.GetState() == lldb.eStateStopped:
+            self.inferior_memory = MemoryMeasurement(self.process.GetProcessID())
+            self.inferior_memory.Measure()
+        with Timer() as timer:
+            self.process.Kill()
+        times['kill'] = timer.interval
+        self.debugger.DeleteTarget(self.target)
+        self.target = None
+        self.process = None
+        self.thread = None
+        if record:
+            for phase in self.phases:
+                self.phase_times[phase].append(times[phase])
+        return True
+
+    def Run (self, args = None):
+        for i in range(self.warmup):
+            if self.verbose:
+                sys.stderr.write("%s: warm-up run %u\n" % (self.scenario.name, i))
+            if not self.RunOnce(False):
+                return False
+        for i in range(self.iterations):
+            if self.verbose:
+                sys.stderr.write("%s: run %u\n" % (self.scenario.name, i))
+            if not self.RunOnce(True):
+                return False
+        self.debugger_memory = MemoryMeasurement(os.getpid())
+        self.debugger_memory.Measure()
+        return True
+
+    def GetResults (self):
+        '''Get a dictionary of the results that can be saved as JSON'''
+        phases = dict()
+        for phase in self.phases:
+            times = self.phase_times[phase]
+            if times:
+                phases[phase] = { 'times' : times, 
+                                  'min' : min(times), 
+                                  'median' : get_median(times), 
+                                  'mean' : sum(times) / len(times), 
+                                  'max' : max(times) }
+        results = { 'name' : self.scenario.name,
+                    'args' : self.scenario.args,
+                    'breakpoints' : self.scenario.breakpoints,
+                    'steps' : self.scenario.steps,
+                    'expressions' : self.scenario.expressions,
+                    'iterations' : len(self.phase_times['target']),
+                    'warmup' : self.warmup,
+                    'phases' : phases,
+                    'errors' : self.errors }
+        if self.inferior_memory:
+            results['inferior_memory'] = self.inferior_memory.value
+        if self.debugger_memory:
+            results['debugger_memory'] = self.debugger_memory.value
+        return results
+
+def dump_scenario_results(results, baseline_results = None):
+    '''Print the median time of each phase, and the change from the same
+    scenario in the baseline results if there are any.'''
+    baseline_phases = dict()
+    if baseline_results:
+        for baseline in baseline_results['scenarios']:
+            if baseline['name'] == results['name']:
+                baseline_phases = baseline['phases']
+    print "%s (%u iterations):" % (results['name'], results['iterations'])
+    for phase in ScenarioTestCase.phases:
+        if phase in results['phases']:
+            median = results['phases'][phase]['median']
+            s = "    %-12s median = %.06f sec, min = %.06f sec, max = %.06f sec" % (phase, median, results['phases'][phase]['min'], results['phases'][phase]['max'])
+            if phase in baseline_phases:
+                baseline_median = baseline_phases[phase]['median']
+                if baseline_median > 0.0:
+                    s += " (%+.1f%%)" % ((median - baseline_median) * 100.0 / baseline_median)
+            print s
+    for key in ['inferior_memory', 'debugger_memory']:
+        if key in results:
+            print "    %s:" % (key)
+            for (stat, value) in sorted(results[key].items()):
+                print "    %16s = %u" % (stat, value)
+
+def run_scenarios(command_args):
+    usage = "usage: %prog [options] [-- EXE [ARGS ...]]"
+    description='''Time the phases of debug sessions: creating the target, setting
+breakpoints, launching until the first stop, stepping, evaluating expressions
+and killing the process. Scenarios are read from JSON files given with --file
+or built from the options and the program arguments. Each scenario is run
+--warmup times without recording anything and then --iterations times. The
+results can be saved as JSON with --json and compared with the results of an
+earlier run with --compare.'''
+    parser = optparse.OptionParser(description=description, prog='performance.py', usage=usage)
+    parser.add_option('-v', '--verbose', action='store_true', dest='verbose', help='display verbose debug info', default=False)
+    parser.add_option('-f', '--file', action='append', type='string', metavar='PATH', dest='scenario_files', help='a JSON file with a list of scenarios to run', default=[])
+    parser.add_option('-N', '--name', type='string', dest='name', help='the name of the scenario built from the options', default='default')
+    parser.add_option('-b', '--breakpoint', action='append', type='string', metavar='NAME', dest='breakpoints', help='a function name or "file:line" to set a breakpoint at', default=[])
+    parser.add_option('-s', '--steps', type='int', dest='steps', help='the number of times to step over after the first stop', default=0)
+    parser.add_option('-e', '--expression', action='append', type='string', metavar='EXPR', dest='expressions', help='an expression to evaluate after stepping', default=[])
+    parser.add_option('-w', '--warmup', type='int', dest='warmup', help='the number of runs of each scenario before the timed runs (default=1)', default=1)
+    parser.add_option('-n', '--iterations', type='int', dest='iterations', help='the number of timed runs of each scenario (default=5)', default=5)
+    parser.add_option('-j', '--json', type='string', metavar='PATH', dest='json_path', help='save the results as JSON to PATH, or to stdout if PATH is "-"', default=None)
+    parser.add_option('-c', '--compare', type='string', metavar='PATH', dest='baseline_path', help='show the change in the median time of each phase from the JSON results in PATH', default=None)
+    (options, args) = parser.parse_args(command_args)
+
+    scenarios = list()
+    for scenario_file in options.scenario_files:
+        f = open(scenario_file)
+        for scenario_dict in json.load(f):
+            scenarios.append(Scenario.from_dict(scenario_dict))
+        f.close()
+    if args:
+        scenarios.append(Scenario(options.name, args, options.breakpoints, options.steps, options.expressions))
+    if not scenarios:
+        parser.error("no scenarios were specified")
+    baseline_results = None
+    if options.baseline_path:
+        f = open(options.baseline_path)
+        baseline_results = json.load(f)
+        f.close()
+    all_results = { 'scenarios' : list() }
+    for scenario in scenarios:
+        test = ScenarioTestCase(scenario, options.iterations, options.warmup)
+        test.verbose = options.verbose
+        test.Run()
+        results = test.GetResults()
+        all_results['scenarios'].append(results)
+        if options.json_path != '-':
+            dump_scenario_results(results, baseline_results)
+    if options.json_path == '-':
+        print json.dumps(all_results, indent=2)
+    elif options.json_path:
+        f = open(options.json_path, 'w')
+        json.dump(all_results, f, indent=2)
+        f.close()
+
 if __name__ == '__main__':
     lldb.SBDebugger.Initialize()
-    test = TesterTestCase()
-    test.Run (sys.argv[1:])
-    mem = MemoryMeasurement(os.getpid())
-    mem.Measure()
-    print str(mem)
+    run_scenarios (sys.argv[1:])
     lldb.SBDebugger.Terminate()
-    # print "sleeeping for 100 seconds"
-    # time.sleep(100)
@@ -27,9 +27,12 @@
 #----------------------------------------------------------------------
 
 import lldb
+import bisect
+import collections
 import commands
 import optparse
 import os
+import pickle
 import plistlib
 import re
 import shlex
@@ -372,6 +375,88 @@ class Image:
             print 'error: unable to locate main executable (%s) "%s"' % (self.arch, self.path)
         return None
     
+class SymbolicationCache:
+    """An LRU cache of symbolicated addresses.
+
+    Entries are keyed by (module UUID, file address, verbose) and contain the
+    chain of concrete and inlined frames for the address as plain tuples of
+    (load address delta, symbolication string, is inlined). Nothing in an entry
+    depends on the target or on the address the module was loaded at, so the
+    same cache can be shared by all crash logs of a build and saved to disk.
+    Verbose entries do embed the full path of the module file as it was found
+    on this machine, so a saved cache only reproduces verbose output where the
+    modules are found at the same paths."""
+
+    def __init__(self, max_entries = 100000):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        lookups = self.hits + self.misses
+        if lookups:
+            hit_rate = 100.0 * self.hits / lookups
+        else:
+            hit_rate = 0.0
+        return "symbolication cache: %u entries, %u hits, %u misses (%.1f%% hit rate)" % (len(self.entries), self.hits, self.misses, hit_rate)
+
+    def lookup(self, key):
+        frames = self.entries.pop(key, None)
+        if frames is None:
+            self.misses += 1
+            return None
+        # Re-insert to mark the entry as the most recently used one
+        self.entries[key] = frames
+        self.hits += 1
+        return frames
+
+    def insert(self, key, frames):
+        self.entries.pop(key, None)
+        self.entries[key] = frames
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last = False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path):
+        """Add the entries saved in "path" to this cache, returns an error string or None"""
+        try:
+            f = open(path, 'rb')
+            try:
+                entries = pickle.load(f)
+            finally:
+                f.close()
+        except IOError:
+            return None # No cache was saved yet
+        except Exception as e:
+            return 'error: unable to load symbolication cache "%s": %s' % (path, e)
+        for (key, frames) in entries:
+            self.insert(key, frames)
+        return None
+
+    def save(self, path):
+        """Save the entries in this cache to "path", returns an error string or None"""
+        try:
+            f = open(path, 'wb')
+            try:
+                # Save the entries from least to most recently used so load() restores the LRU order
+                pickle.dump(self.entries.items(), f, pickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+        except Exception as e:
+            return 'error: unable to save symbolication cache "%s": %s' % (path, e)
+        return None
+
+# Symbolicators share this cache unless they are given their own
+g_symbolication_cache = SymbolicationCache()
+
 class Symbolicator:
 
     def __init__(self):
@@ -379,6 +464,8 @@ class Symbolicator:
         self.target = None
         self.images = list() # a list of images to be used when symbolicating
         self.addr_mask = 0xffffffffffffffff
+        self.symbolication_cache = g_symbolication_cache
+        self.clear_image_indexes()
     
     def __str__(self):
         s = "Symbolicator:\n"
@@ -392,18 +479,62 @@ class Symbolicator:
             s += '    %s\n' % (image)
         return s
     
+    def add_image(self, image):
+        self.images.append(image)
+        self.clear_image_indexes()
+
+    def clear_image_indexes(self):
+        """Throw away the image lookup indexes, they get rebuilt on the next lookup"""
+        self.indexed_image_count = -1
+        self.identifier_to_images = None
+        self.section_starts = None   # sorted section start addresses
+        self.section_ends = None     # end address for each entry in self.section_starts
+        self.section_max_ends = None # largest end address of all sections up to and including each entry
+        self.section_images = None   # index into self.images for each entry in self.section_starts
+
+    def build_image_indexes(self):
+        # Images can also be appended to self.images directly, so rebuild
+        # the indexes any time the number of images changes
+        if self.indexed_image_count == len(self.images):
+            return
+        self.identifier_to_images = dict()
+        ranges = list()
+        for (image_idx, image) in enumerate(self.images):
+            self.identifier_to_images.setdefault(image.identifier, list()).append(image)
+            for section_info in image.section_infos:
+                if section_info.start_addr != None and section_info.end_addr != None:
+                    ranges.append((section_info.start_addr, section_info.end_addr, image_idx))
+        ranges.sort()
+        self.section_starts = [start_addr for (start_addr, end_addr, image_idx) in ranges]
+        self.section_ends = [end_addr for (start_addr, end_addr, image_idx) in ranges]
+        self.section_images = [image_idx for (start_addr, end_addr, image_idx) in ranges]
+        self.section_max_ends = list()
+        max_end_addr = 0
+        for end_addr in self.section_ends:
+            max_end_addr = max(max_end_addr, end_addr)
+            self.section_max_ends.append(max_end_addr)
+        self.indexed_image_count = len(self.images)
+
     def find_images_with_identifier(self, identifier):
-        images = list()
-        for image in self.images:
-            if image.identifier == identifier:
-                images.append(image)
-        return images
+        self.build_image_indexes()
+        return list(self.identifier_to_images.get(identifier, ()))
         
     def find_image_containing_load_addr(self, load_addr):
-        for image in self.images:
-            if image.get_section_containing_load_addr (load_addr):
-                return image
-        return None
+        self.build_image_indexes()
+        # Start at the last section that starts at or before "load_addr" and walk
+        # backwards while an earlier section could still extend past "load_addr".
+        # Sections normally don't overlap so this is usually a single step, but if
+        # they do, the image that was added first wins, just like a linear search.
+        image_idx = None
+        i = bisect.bisect_right(self.section_starts, load_addr) - 1
+        while i >= 0 and self.section_max_ends[i] > load_addr:
+            if load_addr < self.section_ends[i]:
+                if image_idx == None or self.section_images[i] < image_idx:
+                    image_idx = self.section_images[i]
+            i -= 1
+        if image_idx == None:
+            return None
+        return self.images[image_idx]
     
     def create_target(self):
         if self.target:
@@ -422,6 +553,17 @@ class Symbolicator:
                     return self.target
         return None
     
+    def get_symbolication_cache_key(self, address, verbose):
+        """Returns the (module UUID, file address, verbose) symbolication cache key for "address", or None"""
+        so_addr = address.resolve_addr()
+        if so_addr:
+            module = so_addr.GetModule()
+            if module:
+                uuid_str = module.GetUUIDString()
+                if uuid_str:
+                    return (uuid_str, so_addr.GetFileAddress(), verbose)
+        return None
+
     def symbolicate(self, load_addr, verbose = False):
         if not self.target:
             self.create_target()
@@ -440,6 +582,20 @@ class Symbolicator:
                 if image:
                     image.add_module (self.target)
             symbolicated_address = Address(self.target, load_addr)
+            cache_key = None
+            if self.symbolication_cache != None:
+                cache_key = self.get_symbolication_cache_key(symbolicated_address, verbose)
+                if cache_key:
+                    cached_frames = self.symbolication_cache.lookup(cache_key)
+                    if cached_frames:
+                        symbolicated_addresses = list()
+                        for (load_addr_delta, symbolication, inlined) in cached_frames:
+                            # The symbol contexts are only resolved if someone asks for them
+                            cached_address = Address(self.target, load_addr + load_addr_delta)
+                            cached_address.symbolication = symbolication
+                            cached_address.inlined = inlined
+                            symbolicated_addresses.append(cached_address)
+                        return symbolicated_addresses
             if symbolicated_address.symbolicate (verbose):
                 if symbolicated_address.so_addr:
                     symbolicated_addresses = list()
@@ -462,6 +618,9 @@ class Symbolicator:
                         symbolicated_addresses.append (symbolicated_address)
         
                     if symbolicated_addresses:
+                        if cache_key:
+                            cached_frames = [(a.load_addr - load_addr, a.symbolication, a.inlined) for a in symbolicated_addresses]
+                            self.symbolication_cache.insert(cache_key, tuple(cached_frames))
                         return symbolicated_addresses
         else:
             print 'error: no target in Symbolicator'
@@ -562,7 +721,7 @@ def Symbolicate(command_args):
                     sys.exit(1)
         if options.slide != None:
             image.slide = options.slide
-        symbolicator.images.append(image)
+        symbolicator.add_image(image)
     
     target = symbolicator.create_target()
     if options.verbose:
@@ -87,6 +87,8 @@ be verified in all specified modules.
     parser.add_option('-v', '--verbose', action='store_true', dest='verbose', help='Enable verbose logging and information.', default=False)
     parser.add_option('-s', '--skip-type-regex', action="callback", callback=regex_option_callback, type='string', metavar='REGEX', dest='skip_type_regexes', help='Regular expressions that, if they match the current member typename, will cause the type to no be recursively displayed.', default=[])
     parser.add_option('--std', action="callback", callback=regex_option_callback, metavar='REGEX', dest='skip_type_regexes', help="Don't' recurse into types in the std namespace.", default=[])
+    parser.add_option('-r', '--report', action='store_true', dest='report', help='Compute the padding of every type once and print the types that waste the most bytes first, with a field order that needs less padding.', default=False)
+    parser.add_option('-n', '--num-types', type='int', metavar='N', dest='num_types', help='The number of types to print with --report, 0 prints all types with padding (default=25).', default=25)
     return parser
 
 def verify_type (target, options, type):
@@ -165,6 +167,129 @@ def verify_type_recursive (target, options, type, member_name, depth, base_offse
     
     return (prev_end_offset, padding)
     
+def get_max_alignment(byte_size, ptr_size):
+    '''Get the largest power of two, up to twice the pointer size, that 
+    divides "byte_size". The alignment of a type always divides its size so
+    this is never less than the real alignment.'''
+    alignment = 1
+    if byte_size > 0:
+        while alignment < 2 * ptr_size and byte_size % (alignment * 2) == 0:
+            alignment *= 2
+    return alignment
+
+class TypeLayout:
+    '''The padding of a struct or class type. It is computed once for each
+    canonical type name by get_type_layout() and reused for every type that
+    contains it.'''
+    def __init__(self, typename, byte_size):
+        self.typename = typename
+        self.byte_size = byte_size
+        self.alignment = 1
+        self.padding = 0                # Holes between the members and at the end of this type
+        self.total_padding = 0          # Includes the padding inside of base classes and members
+        self.suggested_fields = None    # Field names in an order that needs less padding
+        self.suggested_byte_size = byte_size
+
+def get_type_layout(target, options, type, layouts):
+    '''Get the TypeLayout for a struct or class type, "layouts" is a dictionary
+    of canonical type names to the layouts that have already been computed.'''
+    canonical_type = type.GetCanonicalType()
+    typename = canonical_type.GetName()
+    if typename in layouts:
+        return layouts[typename]
+    ptr_size = target.GetAddressByteSize()
+    layout = TypeLayout(typename, canonical_type.GetByteSize())
+    for type_regex in options.skip_type_regexes:
+        if type_regex.match (typename):
+            layout.alignment = get_max_alignment(layout.byte_size, ptr_size)
+            layouts[typename] = layout
+            return layout
+    base_members = set()
+    for base in canonical_type.bases + canonical_type.vbases:
+        base_members.add((base.GetName(), base.GetOffsetInBits()))
+    members = canonical_type.members
+    alignment = 1
+    prev_end_offset = 0
+    if canonical_type.IsPolymorphicClass() and (not members or members[0].GetOffsetInBytes() == ptr_size):
+        alignment = ptr_size
+        prev_end_offset = ptr_size
+    fixed_end_offset = prev_end_offset
+    fields = list()
+    has_bitfields = False
+    for member in members:
+        member_type = member.GetType().GetCanonicalType()
+        member_offset = member.GetOffsetInBytes()
+        member_byte_size = member_type.GetByteSize()
+        if member.IsBitfield():
+            has_bitfields = True
+            member_alignment = 1
+            member_end_offset = (member.GetOffsetInBits() + member.GetBitfieldSizeInBits() + 7) / 8
+        else:
+            member_end_offset = member_offset + member_byte_size
+            member_type_class = member_type.GetTypeClass()
+            if member_type_class == lldb.eTypeClassStruct or member_type_class == lldb.eTypeClassClass:
+                member_layout = get_type_layout(target, options, member_type, layouts)
+                layout.total_padding += member_layout.total_padding
+                member_alignment = member_layout.alignment
+            else:
+                member_alignment = get_max_alignment(member_byte_size, ptr_size)
+        if prev_end_offset < member_offset:
+            layout.padding += member_offset - prev_end_offset
+        prev_end_offset = max(prev_end_offset, member_end_offset)
+        alignment = max(alignment, member_alignment)
+        if (member.GetName(), member.GetOffsetInBits()) in base_members:
+            # Base classes always come first, only the fields can be moved
+            fixed_end_offset = max(fixed_end_offset, member_end_offset)
+        else:
+            fields.append((member_alignment, member_byte_size, member.GetName()))
+    if prev_end_offset < layout.byte_size:
+        layout.padding += layout.byte_size - prev_end_offset
+    layout.total_padding += layout.padding
+    layout.alignment = min(alignment, get_max_alignment(layout.byte_size, ptr_size))
+    if fields and not has_bitfields:
+        # Placing the fields with the largest alignment first leaves no holes
+        # between them since the size of a type is a multiple of its alignment
+        fields.sort(key=lambda field: (-field[0], -field[1]))
+        offset = fixed_end_offset
+        for (field_alignment, field_byte_size, field_name) in fields:
+            offset = (offset + field_alignment - 1) / field_alignment * field_alignment + field_byte_size
+        suggested_byte_size = (offset + layout.alignment - 1) / layout.alignment * layout.alignment
+        if suggested_byte_size < layout.byte_size:
+            layout.suggested_byte_size = suggested_byte_size
+            layout.suggested_fields = [field_name for (field_alignment, field_byte_size, field_name) in fields]
+    layouts[typename] = layout
+    return layout
+
+def report_type_padding(target, options, modules):
+    '''Compute the layout of every struct and class type in "modules" once and
+    print the types with the most pad bytes per instance first, larger types
+    first when they waste the same number of bytes, along with a field order
+    that needs less padding when there is one.'''
+    layouts = dict()
+    for module in modules:
+        if options.typenames:
+            types = list()
+            for typename in options.typenames:
+                types.extend(module.FindTypes(typename))
+        else:
+            types = module.GetTypes(lldb.eTypeClassClass | lldb.eTypeClassStruct)
+        print 'Found %u types in "%s"' % (len(types), module.file)
+        for type in types:
+            if type.IsTypeComplete():
+                get_type_layout(target, options, type, layouts)
+    ranked_layouts = [layout for layout in layouts.values() if layout.total_padding > 0 and layout.byte_size > 0]
+    ranked_layouts.sort(key=lambda layout: (layout.total_padding, layout.byte_size), reverse=True)
+    print '%u unique types, %u with padding, %u pad bytes, %u bytes saved by reordering fields' % (len(layouts), len(ranked_layouts), sum([layout.total_padding for layout in ranked_layouts]), sum([layout.byte_size - layout.suggested_byte_size for layout in ranked_layouts]))
+    if options.num_types > 0:
+        ranked_layouts = ranked_layouts[:options.num_types]
+    print
+    print ' Pad  Size  Pad %  Reordered Type'
+    print '---- ----- ------ ---------- ----------------------------------------'
+    for layout in ranked_layouts:
+        print '%4u %5u %5.1f%% %10u %s' % (layout.total_padding, layout.byte_size, (float(layout.total_padding) / float(layout.byte_size)) * 100.0, layout.suggested_byte_size, layout.typename)
+        if layout.suggested_fields:
+            print '                              fields: %s' % (', '.join(layout.suggested_fields))
+
 def check_padding_command (debugger, command, result, dict):
     # Use the Shell Lexer to properly parse up command options just like a 
     # shell would
@@ -177,7 +302,7 @@ def check_padding_command (debugger, command, result, dict):
         # (courtesy of OptParse dealing with argument errors by throwing SystemExit)
         result.SetStatus (lldb.eReturnStatusFailed)
         return "option parsing failed" # returning a string is the same as returning an error whose description is the string
-    verify_types(options, debugger.GetSelectedTarget(), command_args)
+    verify_types(debugger.GetSelectedTarget(), options)
     
     
 def verify_types (target, options):
@@ -194,11 +319,13 @@ def verify_types (target, options):
             modules.append(module)
     else:
         for module_name in options.modules:
-            module = lldb.target.module[module_name]
+            module = target.module[module_name]
             if module:
                 modules.append(module)
     
-    if modules:
+    if modules and options.report:
+        report_type_padding(target, options, modules)
+    elif modules:
         for module in modules:
             print 'module: %s' % (module.file)
             if options.typenames:
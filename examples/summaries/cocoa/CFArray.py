@@ -179,6 +179,7 @@ class NSArray_SynthProvider:
 			statistics.metric_hit('unknown_class',str(self.valobj.GetName()) + " seen as " + name_string)
 		return wrapper;
 
+@lldb.formatters.metrics.timed
 def CFArray_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = NSArray_SynthProvider(valobj,dict);
@@ -112,6 +112,7 @@ def GetSummary_Impl(valobj):
 	statistics.metric_hit('unknown_class',valobj.GetName() + " seen as " + actual_name)
 	return wrapper;
 
+@lldb.formatters.metrics.timed
 def CFBag_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
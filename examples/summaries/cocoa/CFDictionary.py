@@ -188,6 +188,7 @@ def GetSummary_Impl(valobj):
 		statistics.metric_hit('unknown_class',valobj.GetName() + " seen as " + name_string)
 	return wrapper;
 
+@lldb.formatters.metrics.timed
 def CFDictionary_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
@@ -206,6 +207,7 @@ def CFDictionary_SummaryProvider (valobj,dict):
 		return str(summary) + (" key/value pairs" if summary != 1 else " key/value pair")
 	return 'Summary Unavailable'
 
+@lldb.formatters.metrics.timed
 def CFDictionary_SummaryProvider2 (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
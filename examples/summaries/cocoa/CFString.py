@@ -9,8 +9,10 @@ License. See LICENSE.TXT for details.
 # the real code is part of the LLDB core
 import lldb
 import lldb.runtime.objc.objc_runtime
+import lldb.formatters.metrics
 import lldb.formatters.Logger
 
+@lldb.formatters.metrics.timed
 def CFString_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = CFStringSynthProvider(valobj,dict);
@@ -28,6 +30,7 @@ def CFString_SummaryProvider (valobj,dict):
 		return '@'+summary
 	return ''
 
+@lldb.formatters.metrics.timed
 def CFAttributedString_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	offset = valobj.GetTarget().GetProcess().GetAddressByteSize()
@@ -107,6 +107,7 @@ def GetSummary_Impl(valobj):
 		statistics.metric_hit('unknown_class',valobj.GetName() + " seen as " + name_string)
 	return wrapper;
 
+@lldb.formatters.metrics.timed
 def NSBundle_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
@@ -110,6 +110,7 @@ def GetSummary_Impl(valobj):
 		statistics.metric_hit('unknown_class',valobj.GetName() + " seen as " + name_string)
 	return wrapper;
 
+@lldb.formatters.metrics.timed
 def NSData_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	logger >> "NSData_SummaryProvider"
@@ -133,6 +134,7 @@ def NSData_SummaryProvider (valobj,dict):
 		return summary
 	return 'Summary Unavailable'
 
+@lldb.formatters.metrics.timed
 def NSData_SummaryProvider2 (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	logger >> "NSData_SummaryProvider2"
@@ -221,6 +221,7 @@ def GetSummary_Impl(valobj):
 	return wrapper;
 
 
+@lldb.formatters.metrics.timed
 def NSDate_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
@@ -236,6 +237,7 @@ def NSDate_SummaryProvider (valobj,dict):
 		return str(summary)
 	return 'Summary Unavailable'
 
+@lldb.formatters.metrics.timed
 def NSTimeZone_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
@@ -253,6 +255,7 @@ def NSTimeZone_SummaryProvider (valobj,dict):
 	return 'Summary Unavailable'
 
 
+@lldb.formatters.metrics.timed
 def CFAbsoluteTime_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	try:
@@ -125,6 +125,7 @@ def GetSummary_Impl(valobj):
 	return wrapper;
 
 
+@lldb.formatters.metrics.timed
 def NSIndexSet_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
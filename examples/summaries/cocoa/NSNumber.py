@@ -209,6 +209,7 @@ def GetSummary_Impl(valobj):
 	return wrapper;
 
 
+@lldb.formatters.metrics.timed
 def NSNumber_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
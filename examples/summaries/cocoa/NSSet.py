@@ -213,6 +213,7 @@ def GetSummary_Impl(valobj):
 	return wrapper;
 
 
+@lldb.formatters.metrics.timed
 def NSSet_SummaryProvider (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
@@ -230,6 +231,7 @@ def NSSet_SummaryProvider (valobj,dict):
 		return summary
 	return 'Summary Unavailable'
 
+@lldb.formatters.metrics.timed
 def NSSet_SummaryProvider2 (valobj,dict):
 	logger = lldb.formatters.Logger.Logger()
 	provider = GetSummary_Impl(valobj);
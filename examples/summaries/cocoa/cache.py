@@ -11,8 +11,9 @@ class Cache:
 	def __init__(self):
 		self.data = {}
 		self.statistics = lldb.formatters.metrics.Metrics()
-		self.statistics.add_metric('hit')
-		self.statistics.add_metric('miss')
+		# get_value() runs on every lookup, so only count hits and misses
+		self.statistics.add_metric('hit',sample_size=0,top_k=0)
+		self.statistics.add_metric('miss',sample_size=0,top_k=0)
 
 	def look_for_key(self,key):
 		if key in self.data:
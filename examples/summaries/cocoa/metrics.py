@@ -8,6 +8,22 @@ License. See LICENSE.TXT for details.
 import lldb
 import time, datetime
 import inspect
+import functools
+import optparse
+import random
+import shlex
+import sys
+
+# Each Counter keeps at most this many triggers as a uniform random sample
+# and tracks the approximate frequency of at most this many distinct triggers
+default_sample_size = 8
+default_top_k = 8
+
+# All Metrics objects that were ever created, for the formatter-stats command
+all_metrics = []
+
+# TimingHistogram objects for each formatter function decorated with @timed
+formatter_timings = {}
 
 class TimeMetrics:
 	@staticmethod
@@ -28,19 +44,111 @@ class TimeMetrics:
 		print "It took " + str(self.exit_time - self.enter_time) + " time units to run through " + self.function + self.label
 		return False
 
+class TimingHistogram:
+	"""Fixed size histogram of run times, with one bucket per power of two microseconds"""
+	num_buckets = 32
+
+	def __init__(self,name):
+		self.name = name
+		self.reset()
+
+	def reset(self):
+		self.count = 0
+		self.total = 0.0
+		self.min = None
+		self.max = None
+		self.buckets = [0] * TimingHistogram.num_buckets
+
+	def add(self,seconds):
+		self.count = self.count + 1
+		self.total = self.total + seconds
+		if self.min is None or seconds < self.min:
+			self.min = seconds
+		if self.max is None or seconds > self.max:
+			self.max = seconds
+		bucket = min(int(seconds * 1000000.0).bit_length(), TimingHistogram.num_buckets - 1)
+		self.buckets[bucket] = self.buckets[bucket] + 1
+
+	def mean(self):
+		if self.count == 0:
+			return 0.0
+		return self.total / self.count
+
+	def percentile(self,percent):
+		"""Return the upper bound in seconds of the bucket holding the given percentile"""
+		if self.count == 0:
+			return 0.0
+		rank = self.count * percent / 100.0
+		seen = 0
+		for bucket in range(TimingHistogram.num_buckets):
+			seen = seen + self.buckets[bucket]
+			if seen >= rank:
+				return min((1 << bucket) / 1000000.0, self.max)
+		return self.max
+
+	def __str__(self):
+		return "%-40s %8u calls %10.6fs total %10.6fs mean %10.6fs p50 %10.6fs p90 %10.6fs p99 %10.6fs max" % (
+			self.name, self.count, self.total, self.mean(), self.percentile(50), self.percentile(90), self.percentile(99), self.max or 0.0)
+
+def timed(function):
+	"""Decorator that records the run time of every call to a formatter function"""
+	histogram = formatter_timings.setdefault(function.__name__, TimingHistogram(function.__name__))
+	@functools.wraps(function)
+	def timed_function(*args):
+		start_time = time.time()
+		try:
+			return function(*args)
+		finally:
+			histogram.add(time.time() - start_time)
+	return timed_function
+
 class Counter:
-	def __init__(self):
+	"""Counts how many times a metric was hit in constant memory
+
+	Besides the total count, a Counter can keep a reservoir sample of the
+	values that triggered it and a space-saving sketch of the most frequent
+	ones. Pass 0 for sample_size or top_k to turn either one off."""
+	def __init__(self,sample_size=None,top_k=None):
 		self.count = 0
-		self.list = []
+		self.sample_size = default_sample_size if sample_size is None else sample_size
+		self.top_k = default_top_k if top_k is None else top_k
+		self.sample = []
+		self.top = {}
 	def update(self,name):
 		self.count = self.count + 1
+		if self.sample_size <= 0 and self.top_k <= 0:
+			return
 		# avoid getting the full dump of this ValueObject just to save its metrics
 		if isinstance(name,lldb.SBValue):
-			self.list.append(name.GetName())
+			name = name.GetName()
 		else:
-			self.list.append(str(name))
+			name = str(name)
+		if len(self.sample) < self.sample_size:
+			self.sample.append(name)
+		elif self.sample_size > 0:
+			index = random.randint(0, self.count - 1)
+			if index < self.sample_size:
+				self.sample[index] = name
+		if name in self.top:
+			self.top[name] = self.top[name] + 1
+		elif len(self.top) < self.top_k:
+			self.top[name] = 1
+		elif self.top_k > 0:
+			# evict the least frequent entry and let the new one inherit its
+			# count, which makes the counts in self.top upper bounds
+			min_name = min(self.top, key=self.top.get)
+			self.top[name] = self.top.pop(min_name) + 1
+	def most_common(self):
+		return sorted(self.top.items(), key=lambda item: item[1], reverse=True)
+	def reset(self):
+		self.count = 0
+		self.sample = []
+		self.top = {}
 	def __str__(self):
-		return str(self.count) + " times, for items [" + str(self.list) + "]"
+		string = str(self.count) + " times, for items " + str(self.sample)
+		if self.top:
+			string = string + ", most frequent " + str(self.most_common())
+		return string
 
 class MetricsPrinter_Verbose:
 	def __init__(self,metrics):
@@ -61,11 +169,16 @@ class MetricsPrinter_Compact:
 		return string
 
 class Metrics:
-	def __init__(self):
+	def __init__(self,name=None):
 		self.metrics = {}
+		if name is None:
+			# default to the name of the formatter module that creates us
+			name = sys._getframe(1).f_globals.get('__name__')
+		self.name = name
+		all_metrics.append(self)
 
-	def add_metric(self,name):
-		self.metrics[name] = Counter()
+	def add_metric(self,name,sample_size=None,top_k=None):
+		self.metrics[name] = Counter(sample_size,top_k)
 
 	def metric_hit(self,metric,trigger):
 		self.metrics[metric].update(trigger)
@@ -92,3 +205,44 @@ class Metrics:
 		if total_count > 0:
 			return metric_count / float(total_count)
 		return 0
+
+	def reset(self):
+		for value in self.metrics.values():
+			value.reset()
+
+def create_formatter_stats_options():
+	usage = "usage: %prog [options]"
+	description = "Show how often the data formatters hit each of their metrics and how long each formatter took to run."
+	parser = optparse.OptionParser(description=description, prog='formatter-stats',usage=usage)
+	parser.add_option('-v', '--verbose', action='store_true', dest='verbose', help='show the sampled and most frequent triggers of each metric', default=False)
+	parser.add_option('-r', '--reset', action='store_true', dest='reset', help='reset all metrics and timings after showing them', default=False)
+	return parser
+
+def formatter_stats(debugger, command, result, dict):
+	command_args = shlex.split(command)
+	parser = create_formatter_stats_options()
+	try:
+		(options, args) = parser.parse_args(command_args)
+	except:
+		return
+	for metrics in all_metrics:
+		if not metrics.metrics:
+			continue
+		print >>result, "metrics for " + str(metrics.name) + ":"
+		if options.verbose:
+			result.write(str(metrics.verbose))
+		else:
+			result.write(str(metrics.compact))
+	timings = [histogram for histogram in formatter_timings.values() if histogram.count > 0]
+	if timings:
+		print >>result, "formatter timings:"
+		for histogram in sorted(timings, key=lambda histogram: histogram.total, reverse=True):
+			print >>result, histogram
+	if options.reset:
+		for metrics in all_metrics:
+			metrics.reset()
+		for histogram in formatter_timings.values():
+			histogram.reset()
+
+def __lldb_init_module(debugger,dict):
+	debugger.HandleCommand('command script add -f lldb.formatters.metrics.formatter_stats formatter-stats')
@@ -1,5 +1,7 @@
 import lldb
 import lldb.formatters.Logger
+import array
+import struct
 
 # libcxx STL formatters for LLDB
 # These formatters are based upon the implementation of libc++ that
@@ -210,6 +212,18 @@ class stdlist_SynthProvider:
 		logger = lldb.formatters.Logger.Logger()
 		self.valobj = valobj
 		self.count = None
+		self.reset_node_index()
+
+	def reset_node_index(self):
+		logger = lldb.formatters.Logger.Logger()
+		# walking a list one SBValue at a time is expensive, so we keep a cursor
+		# on the last node we visited plus the address of every _list_index_stride-th
+		# node - any child is then at most _list_index_stride steps away from a known node
+		self.cursor_index = None
+		self.cursor_address = None
+		self.checkpoints = []
+		self.memory_chunks = {}
+		self.value_offset = None
 
 	def next_node(self,node):
 		logger = lldb.formatters.Logger.Logger()
@@ -219,6 +233,35 @@ class stdlist_SynthProvider:
 		logger = lldb.formatters.Logger.Logger()
 		return node.GetValueAsUnsigned()
 
+	# nodes that were allocated one after the other tend to be close in memory
+	# so we read whole chunks of memory and decode the __next_ pointers out of them
+	# instead of paying for one round trip per node
+	def read_pointer(self,address):
+		global _list_read_chunk_size
+		logger = lldb.formatters.Logger.Logger()
+		chunk_address = address - (address % _list_read_chunk_size)
+		chunk = self.memory_chunks.get(chunk_address)
+		if chunk is None:
+			error = lldb.SBError()
+			chunk = self.process.ReadMemory(chunk_address,_list_read_chunk_size,error)
+			if error.Fail() or chunk is None or len(chunk) != _list_read_chunk_size:
+				# the chunk might straddle unmapped memory - just read the pointer itself
+				error = lldb.SBError()
+				data = self.process.ReadMemory(address,self.pointer_size,error)
+				if error.Fail() or data is None or len(data) != self.pointer_size:
+					logger >> "Unable to read memory at " + hex(address)
+					return None
+				return struct.unpack(self.pointer_format,data)[0]
+			if len(self.memory_chunks) >= _list_max_cached_chunks:
+				self.memory_chunks.clear()
+			self.memory_chunks[chunk_address] = chunk
+		offset = address - chunk_address
+		return struct.unpack(self.pointer_format,chunk[offset:offset+self.pointer_size])[0]
+
+	def next_address(self,address):
+		logger = lldb.formatters.Logger.Logger()
+		return self.read_pointer(address + self.next_offset)
+
 	# Floyd's cyle-finding algorithm
 	# try to detect if this list has a loop
 	def has_loop(self):
@@ -227,17 +270,16 @@ class stdlist_SynthProvider:
 		if _list_uses_loop_detector == False:
 			logger >> "Asked not to use loop detection"
 			return False
-		slow = stdlist_entry(self.head)
-		fast1 = stdlist_entry(self.head)
-		fast2 = stdlist_entry(self.head)
-		while slow.next.value != self.node_address:
-			slow_value = slow.value
-			fast1 = fast2.next
-			fast2 = fast1.next
-			if fast1.value == slow_value or fast2.value == slow_value:
+		slow = self.head_address
+		fast = self.head_address
+		while True:
+			for step in range(2):
+				fast = self.next_address(fast)
+				if fast == None or fast == 0 or fast == self.node_address:
+					return False
+			slow = self.next_address(slow)
+			if slow == fast:
 				return True
-			slow = slow.next
-		return False
 
 	def num_children(self):
 		global _list_capping_size
@@ -250,6 +292,7 @@ class stdlist_SynthProvider:
 
 	def num_children_impl(self):
 		global _list_capping_size
+		global _list_index_stride
 		logger = lldb.formatters.Logger.Logger()
 		try:
 			next_val = self.head.GetValueAsUnsigned(0)
@@ -263,17 +306,59 @@ class stdlist_SynthProvider:
 				return 1
 			if self.has_loop():
 				return 0
-			size = 2
-			current = stdlist_entry(self.head)
-			while current.next.value != self.node_address:
+			# counting requires a full walk anyway, so we fill in the checkpoints as we go
+			self.checkpoints = [next_val]
+			size = 1
+			current = next_val
+			while True:
+				current = self.next_address(current)
+				if current == None or current == 0:
+					return 0
+				if current == self.node_address:
+					break
+				if size % _list_index_stride == 0:
+					self.checkpoints.append(current)
 				size = size + 1
-				current = current.next
-				if size > _list_capping_size:
+				if size >= _list_capping_size:
 					return _list_capping_size
-			return (size - 1)
+			return size
 		except:
 			return 0;
 
+	# returns the address of the node at position index, starting from whichever
+	# of the cursor or the closest preceding checkpoint requires fewer steps
+	def node_address_at_index(self,index):
+		global _list_index_stride
+		logger = lldb.formatters.Logger.Logger()
+		if len(self.checkpoints) == 0:
+			self.checkpoints = [self.head_address]
+		checkpoint = min(index // _list_index_stride, len(self.checkpoints) - 1)
+		current_index = checkpoint * _list_index_stride
+		current = self.checkpoints[checkpoint]
+		if self.cursor_index != None and current_index <= self.cursor_index <= index:
+			current_index = self.cursor_index
+			current = self.cursor_address
+		while current_index < index:
+			current = self.next_address(current)
+			if current == None or current == 0 or current == self.node_address:
+				return None
+			current_index = current_index + 1
+			if current_index % _list_index_stride == 0 and current_index // _list_index_stride == len(self.checkpoints):
+				self.checkpoints.append(current)
+		self.cursor_index = current_index
+		self.cursor_address = current
+		return current
+
+	def get_value_offset(self):
+		logger = lldb.formatters.Logger.Logger()
+		if self.value_offset == None:
+			# every node has the same layout as the first one, so we only need to ask once
+			value = self.head.Dereference().GetChildMemberWithName('__value_')
+			if not(value.IsValid()):
+				return False
+			self.value_offset = value.GetLoadAddress() - self.head_address
+		return True
+
 	def get_child_index(self,name):
 		logger = lldb.formatters.Logger.Logger()
 		try:
@@ -289,13 +374,13 @@ class stdlist_SynthProvider:
 		if index >= self.num_children():
 			return None;
 		try:
-			current = stdlist_iterator(self.head)
-			current = current.advance(index)
+			if not(self.get_value_offset()):
+				return None
+			current = self.node_address_at_index(index)
+			if current == None:
+				return None
 			# we do not return __value_ because then all our children would be named __value_
-			# we need to make a copy of __value__ with the right name - unfortunate
-			obj = current.GetChildMemberWithName('__value_')
-			obj_data = obj.GetData()
-			return self.valobj.CreateValueFromData('[' + str(index) + ']',obj_data,self.data_type)
+			return self.valobj.CreateValueFromAddress('[' + str(index) + ']',current + self.value_offset,self.data_type)
 		except:
 			return None
 
@@ -310,16 +395,31 @@ class stdlist_SynthProvider:
 			data_type = None
 		return data_type
 
+	def get_next_offset(self,impl):
+		logger = lldb.formatters.Logger.Logger()
+		node_type = impl.GetType()
+		for i in range(node_type.GetNumberOfFields()):
+			field = node_type.GetFieldAtIndex(i)
+			if field.GetName() == '__next_':
+				return field.GetOffsetInBytes()
+		return self.pointer_size
+
 	def update(self):
 		logger = lldb.formatters.Logger.Logger()
 		self.count = None
+		self.reset_node_index()
 		try:
 			impl = self.valobj.GetChildMemberWithName('__end_')
 			self.node_address = self.valobj.AddressOf().GetValueAsUnsigned(0)
 			self.head = impl.GetChildMemberWithName('__next_')
 			self.tail = impl.GetChildMemberWithName('__prev_')
+			self.head_address = self.head.GetValueAsUnsigned(0)
 			self.data_type = self.extract_type()
 			self.data_size = self.data_type.GetByteSize()
+			self.process = self.valobj.GetProcess()
+			self.pointer_size = self.process.GetAddressByteSize()
+			self.pointer_format = ('<' if self.process.GetByteOrder() == lldb.eByteOrderLittle else '>') + ('Q' if self.pointer_size == 8 else 'I')
+			self.next_offset = self.get_next_offset(impl)
 		except:
 			pass
 
@@ -453,21 +553,28 @@ class stdmap_SynthProvider:
 		self.valobj = valobj;
 		self.pointer_size = self.valobj.GetProcess().GetAddressByteSize()
 		self.count = None
+		self.node_addresses = None
 
 	def update(self):
 		logger = lldb.formatters.Logger.Logger()
 		self.count = None
+		# the in-order list of node addresses is computed on first access and then
+		# reused by every child fetch until the next stop
+		self.node_addresses = None
 		try:
 			# we will set this to True if we find out that discovering a node in the map takes more steps than the overall size of the RB tree
 			# if this gets set to True, then we will merrily return None for any child from that moment on
 			self.garbage = False
 			self.tree = self.valobj.GetChildMemberWithName('__tree_')
 			self.root_node = self.tree.GetChildMemberWithName('__begin_node_')
+			self.process = self.valobj.GetProcess()
+			self.pointer_format = ('<' if self.process.GetByteOrder() == lldb.eByteOrderLittle else '>') + ('Q' if self.pointer_size == 8 else 'I')
 			# this data is either lazily-calculated, or cannot be inferred at this moment
 			# we still need to mark it as None, meaning "please set me ASAP"
 			self.data_type = None
 			self.data_size = None
 			self.skip_size = None
+			self.links_offset = None
 		except:
 			pass
 
@@ -508,17 +615,103 @@ class stdmap_SynthProvider:
 		else:
 			return True
 
-	def get_value_offset(self,node):
+	# the debug info for libc++ std::map is such that __begin_node_ has a very nice and useful type
+	# out of which we can grab the information we need - every other node has a less informative
+	# type which omits all value information and only contains housekeeping information for the RB tree
+	# all nodes share the same layout though, so we learn the offsets once from __begin_node_
+	# and then work on raw node addresses
+	def get_node_layout(self):
+		logger = lldb.formatters.Logger.Logger()
+		if self.skip_size == None or self.links_offset == None:
+			node_address = self.root_node.GetValueAsUnsigned(0)
+			deref = self.root_node.Dereference()
+			if node_address == 0 or not(deref.IsValid()):
+				return False
+			offsets = []
+			for name in ['__value_', '__left_', '__right_', '__parent_']:
+				field = deref.GetChildMemberWithName(name)
+				if not(field.IsValid()):
+					return False
+				offsets.append(field.GetLoadAddress() - node_address)
+			self.skip_size = offsets[0]
+			# __left_, __right_ and __parent_ are adjacent, so a single read fetches all of them
+			self.links_offset = min(offsets[1:])
+			self.links_size = max(offsets[1:]) - self.links_offset + self.pointer_size
+			self.left_offset = offsets[1] - self.links_offset
+			self.right_offset = offsets[2] - self.links_offset
+			self.parent_offset = offsets[3] - self.links_offset
+		return True
+
+	# returns the (left, right, parent) tuple for the node at address, or None if it cannot be read
+	def read_node_links(self,address,links_cache):
+		logger = lldb.formatters.Logger.Logger()
+		links = links_cache.get(address)
+		if links == None:
+			error = lldb.SBError()
+			data = self.process.ReadMemory(address + self.links_offset,self.links_size,error)
+			if error.Fail() or data is None or len(data) != self.links_size:
+				logger >> "Unable to read tree node at " + hex(address)
+				return None
+			links = (struct.unpack(self.pointer_format,data[self.left_offset:self.left_offset+self.pointer_size])[0],
+			         struct.unpack(self.pointer_format,data[self.right_offset:self.right_offset+self.pointer_size])[0],
+			         struct.unpack(self.pointer_format,data[self.parent_offset:self.parent_offset+self.pointer_size])[0])
+			links_cache[address] = links
+		return links
+
+	# the same algorithm as stdmap_iterator.increment_node, on raw addresses
+	def next_node_address(self,address,max_count,links_cache):
 		logger = lldb.formatters.Logger.Logger()
-		if self.skip_size == None:
-			node_type = node.GetType()
-			fields_count = node_type.GetNumberOfFields()
-			for i in range(fields_count):
-				field = node_type.GetFieldAtIndex(i)
-				if field.GetName() == '__value_':
-					self.skip_size = field.GetOffsetInBytes()
+		links = self.read_node_links(address,links_cache)
+		if links == None:
+			return None
+		steps = 0
+		if links[1] != 0:
+			address = links[1]
+			while True:
+				links = self.read_node_links(address,links_cache)
+				if links == None:
+					return None
+				if links[0] == 0:
+					return address
+				address = links[0]
+				steps += 1
+				if steps > max_count:
+					logger >> "Returning None - we overflowed"
+					return None
+		while True:
+			parent = links[2]
+			if parent == 0:
+				return None
+			parent_links = self.read_node_links(parent,links_cache)
+			if parent_links == None:
+				return None
+			if parent_links[0] == address:
+				return parent
+			steps += 1
+			if steps > max_count:
+				logger >> "Returning None - we overflowed"
+				return None
+			address = parent
+			links = parent_links
+
+	def get_node_addresses(self):
+		global _address_array_typecode
+		logger = lldb.formatters.Logger.Logger()
+		if self.node_addresses == None:
+			count = self.num_children()
+			addresses = array.array(_address_array_typecode)
+			links_cache = {}
+			current = self.root_node.GetValueAsUnsigned(0)
+			while len(addresses) < count:
+				if current == None or current == 0:
+					logger >> "Tree is garbage - could only find " + str(len(addresses)) + " nodes"
+					self.garbage = True
 					break
-		return (self.skip_size != None)
+				addresses.append(current)
+				if len(addresses) < count:
+					current = self.next_node_address(current,count,links_cache)
+			self.node_addresses = addresses
+		return self.node_addresses
 
 	def get_child_index(self,name):
 		logger = lldb.formatters.Logger.Logger()
@@ -534,43 +727,17 @@ class stdmap_SynthProvider:
 			return None
 		if index >= self.num_children():
 			return None;
-		if self.garbage:
-			logger >> "Returning None since this tree is garbage"
-			return None
 		try:
-			iterator = stdmap_iterator(self.root_node,max_count=self.num_children())
-			# the debug info for libc++ std::map is such that __begin_node_ has a very nice and useful type
-			# out of which we can grab the information we need - every other node has a less informative
-			# type which omits all value information and only contains housekeeping information for the RB tree
-			# hence, we need to know if we are at a node != 0, so that we can still get at the data
-			need_to_skip = (index > 0)
-			current = iterator.advance(index)
-			if current == None:
-				logger >> "Tree is garbage - returning None"
-				self.garbage = True
-				return None
-			if self.get_data_type():
-				if not(need_to_skip):
-					current = current.Dereference()
-					obj = current.GetChildMemberWithName('__value_')
-					obj_data = obj.GetData()
-					self.get_value_offset(current) # make sure we have a valid offset for the next items
-					# we do not return __value_ because then we would end up with a child named
-					# __value_ instead of [0]
-					return self.valobj.CreateValueFromData('[' + str(index) + ']',obj_data,self.data_type)
-				else:
-					# FIXME we need to have accessed item 0 before accessing any other item!
-					if self.skip_size == None:
-						logger >> "You asked for item > 0 before asking for item == 0, I will fetch 0 now then retry"
-						if self.get_child_at_index(0):
-							return self.get_child_at_index(index)
-						else:
-							logger >> "item == 0 could not be found. sorry, nothing can be done here."
-							return None
-					return current.CreateChildAtOffset('[' + str(index) + ']',self.skip_size,self.data_type)
-			else:
+			if not(self.get_data_type()) or not(self.get_node_layout()):
 				logger >> "Unable to infer data-type - returning None (should mark tree as garbage here?)"
 				return None
+			node_addresses = self.get_node_addresses()
+			if self.garbage or index >= len(node_addresses):
+				logger >> "Returning None since this tree is garbage"
+				return None
+			# we do not return __value_ because then we would end up with a child named
+			# __value_ instead of [0]
+			return self.valobj.CreateValueFromAddress('[' + str(index) + ']',node_addresses[index] + self.skip_size,self.data_type)
 		except Exception as err:
 			logger >> "Hit an exception: " + str(err)
 			return None
@@ -782,6 +949,15 @@ def __lldb_init_module(debugger,dict):
 	debugger.HandleCommand('type synthetic add -l libcxx.stdsharedptr_SynthProvider -x "^(std::__1::)weak_ptr<.+>$" -w libcxx')
 
 _map_capping_size = 255
+# Python 2 has no 'Q' array typecode, but 'L' is 64-bit wide on LP64 hosts
+try:
+	array.array('Q')
+	_address_array_typecode = 'Q'
+except ValueError:
+	_address_array_typecode = 'L'
 _list_capping_size = 255
 _list_uses_loop_detector = True
+_list_index_stride = 64
+_list_read_chunk_size = 512
+_list_max_cached_chunks = 256
 _deque_capping_size = 255
@@ -11,11 +11,19 @@ Use the following to get only the benchmark results in your terminal output:
 
     ./bench.py -e /Volumes/data/lldb/svn/regression/build/Debug/lldb -x '-F Driver::MainLoop()' 2>&1 | grep -P '^lldb.*benchmark:'
 
+The laps of every Stopwatch are also appended to a results file (see --results),
+one JSON record per benchmark run with the commit, host, laps, stddev and
+percentiles.  Use --compare to check a run for regressions against a rolling
+baseline of the runs before it, or against another run:
+
+    ./bench.py --compare
+    ./bench.py --compare <baseline-run-id> <run-id>
+
 See also bench-history.
 """
 
 import os, sys
-import re
+import commands, json, math, platform, re, time
 from optparse import OptionParser
 
 # dotest.py invocation with no '-e exe-path' uses lldb as the inferior program,
@@ -37,6 +45,142 @@ benches = [
     './dotest.py -v +b -n %E -p TestDoAttachThenDisassembly.py'
 ]
 
+def get_commit():
+    """Return the revision of the lldb checkout, from git or svn."""
+    (status, output) = commands.getstatusoutput('git rev-parse --short HEAD 2>/dev/null')
+    if status == 0 and output:
+        return output.strip()
+    (status, output) = commands.getstatusoutput('svn info 2>/dev/null')
+    if status == 0:
+        match = re.search(r'^Revision: (\d+)', output, re.MULTILINE)
+        if match:
+            return 'r' + match.group(1)
+    return ''
+
+def load_results(path):
+    """Read the benchmark records, one JSON object per line, from path and
+    return a list of (run_id, records) in the order the runs were recorded."""
+    runs = []
+    run_records = {}
+    if not os.path.exists(path):
+        return runs
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            run_id = record['run_id']
+            if run_id not in run_records:
+                run_records[run_id] = []
+                runs.append((run_id, run_records[run_id]))
+            run_records[run_id].append(record)
+    return runs
+
+def mann_whitney_u(xs, ys):
+    """
+    Return the two-sided p-value of the Mann-Whitney U test that the samples
+    xs and ys come from the same distribution, using the normal approximation
+    with a correction for ties.  It makes no assumption about the shape of the
+    distributions, which is why it is used for timings with long tails.
+    """
+    n1 = len(xs)
+    n2 = len(ys)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    values = sorted([(x, 0) for x in xs] + [(y, 1) for y in ys])
+    n = n1 + n2
+    rank_sum = 0.0
+    tie_sum = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and values[j + 1][0] == values[i][0]:
+            j += 1
+        # Tied values share the average of their ranks.
+        rank = (i + j) / 2.0 + 1
+        count = j - i + 1
+        tie_sum += count ** 3 - count
+        for k in range(i, j + 1):
+            if values[k][1] == 0:
+                rank_sum += rank
+        i = j + 1
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    mean = n1 * n2 / 2.0
+    variance = n1 * n2 / 12.0 * ((n + 1) - tie_sum / (n * (n - 1))) if n > 1 else 0.0
+    if variance <= 0.0:
+        return 1.0
+    z = (abs(u - mean) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0.0) / math.sqrt(2))
+
+def median(nums):
+    nums = sorted(nums)
+    mid = len(nums) / 2
+    if len(nums) % 2:
+        return nums[mid]
+    return (nums[mid - 1] + nums[mid]) / 2.0
+
+def compare_runs(baseline_records, records, alpha, threshold):
+    """
+    Compare the laps of each benchmark in records with the laps of the same
+    benchmark in baseline_records, which may come from several runs.  A
+    benchmark regressed when its median got slower by more than threshold
+    percent and the difference is significant at the alpha level.  Prints a
+    line per benchmark and returns the number of regressions.
+    """
+    baseline_laps = {}
+    for record in baseline_records:
+        baseline_laps.setdefault(record['name'], []).extend(record['laps'])
+    regressions = 0
+    for record in records:
+        name = record['name']
+        if name not in baseline_laps:
+            print "NEW:        %s median=%f" % (name, median(record['laps']))
+            continue
+        old_median = median(baseline_laps[name])
+        new_median = median(record['laps'])
+        change = (new_median - old_median) * 100.0 / old_median if old_median else 0.0
+        p = mann_whitney_u(baseline_laps[name], record['laps'])
+        if p < alpha and change > threshold:
+            status = "REGRESSION:"
+            regressions += 1
+        elif p < alpha and change < -threshold:
+            status = "IMPROVED:  "
+        else:
+            status = "OK:        "
+        print "%s %s median=%f baseline=%f (%+.1f%%, p=%.4f)" % (status, name, new_median, old_median, change, p)
+    return regressions
+
+def compare(opts, args):
+    """Compare two runs, or one run against the runs before it."""
+    runs = load_results(opts.results)
+    run_ids = [run_id for (run_id, records) in runs]
+    if not runs:
+        print "No benchmark results in %s" % (opts.results)
+        return 0
+    for run_id in args:
+        if run_id not in run_ids:
+            print "Unknown run id: %s" % (run_id)
+            return 1
+    candidate = args[-1] if args else run_ids[-1]
+    candidate_idx = run_ids.index(candidate)
+    if len(args) > 1:
+        baseline_runs = [runs[run_ids.index(args[0])]]
+    else:
+        baseline_runs = runs[max(0, candidate_idx - opts.baseline_runs):candidate_idx]
+    if not baseline_runs:
+        print "No baseline runs before %s" % (candidate)
+        return 0
+    print "Comparing run %s with %s:" % (candidate, ", ".join([run_id for (run_id, records) in baseline_runs]))
+    baseline_records = []
+    for (run_id, records) in baseline_runs:
+        baseline_records.extend(records)
+    regressions = compare_runs(baseline_records, runs[candidate_idx][1], opts.alpha, opts.threshold)
+    if regressions:
+        print "%d benchmark(s) regressed." % (regressions)
+        return 1
+    return 0
+
 def main():
     """Read the items from 'benches' and run the command line one by one."""
     parser = OptionParser(usage="""\
@@ -52,9 +196,41 @@ Run the standard benchmarks defined in the list named 'benches'.\
                       dest='break_spec',
                       help='The lldb breakpoint spec for the target program.')
 
+    parser.add_option('-r', '--results',
+                      type='string', action='store',
+                      dest='results', default='bench-results.jsonl',
+                      help='The file the benchmark records are appended to and compared from.')
+    parser.add_option('-c', '--compare',
+                      action='store_true',
+                      dest='compare', default=False,
+                      help='Compare the runs given as arguments, or the last run with the runs before it, instead of running the benchmarks.')
+    parser.add_option('-b', '--baseline-runs',
+                      type='int', action='store',
+                      dest='baseline_runs', default=5,
+                      help='The number of earlier runs the rolling baseline is made of.')
+    parser.add_option('-a', '--alpha',
+                      type='float', action='store',
+                      dest='alpha', default=0.01,
+                      help='The significance level of a regression.')
+    parser.add_option('-t', '--threshold',
+                      type='float', action='store',
+                      dest='threshold', default=5.0,
+                      help='The percentage the median must get slower by to be a regression.')
+
     # Parses the options, if any.
     opts, args = parser.parse_args()
-                          
+    opts.results = os.path.abspath(opts.results)
+
+    if opts.compare:
+        sys.exit(compare(opts, args))
+
+    # Tell lldbbench.BenchBase where to record the results of this run.
+    run_id = time.strftime('%Y%m%d-%H%M%S')
+    os.environ['LLDB_BENCH_RESULTS'] = opts.results
+    os.environ['LLDB_BENCH_RUN_ID'] = run_id
+    os.environ['LLDB_BENCH_COMMIT'] = get_commit()
+    os.environ['LLDB_BENCH_HOST'] = '%s (%s)' % (platform.node(), platform.platform())
+
     print "Starting bench runner...."
 
     for item in benches:
@@ -67,5 +243,9 @@ Run the standard benchmarks defined in the list named 'benches'.\
 
     print "Bench runner done."
 
+    # Check the new run against the runs before it.
+    if run_id in [recorded_run_id for (recorded_run_id, records) in load_results(opts.results)]:
+        compare(opts, [run_id])
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,78 @@
+"""Test the time it takes crashlog.py to parse a large darwin crash log."""
+
+import os, sys
+import tempfile
+import unittest2
+import lldb
+from lldbbench import *
+
+class CrashLogParsingBench(BenchBase):
+
+    mydir = TestBase.compute_mydir(__file__)
+
+    def setUp(self):
+        BenchBase.setUp(self)
+        # With no -y count, the stopwatch decides how many laps to run.
+        self.count = lldb.bmIterationCount
+        (fd, self.crash_log_path) = tempfile.mkstemp(suffix='.crash')
+        f = os.fdopen(fd, 'w')
+        self.write_crash_log(f, num_threads=2000, num_frames=32, num_images=2000)
+        f.close()
+
+    def tearDown(self):
+        os.remove(self.crash_log_path)
+        BenchBase.tearDown(self)
+
+    def write_crash_log(self, f, num_threads, num_frames, num_images):
+        """Write a synthetic crash log with lots of threads, frames and images."""
+        f.write('Process:         a.out [1234]\n')
+        f.write('Path:            /tmp/a.out\n')
+        f.write('Identifier:      a.out\n')
+        f.write('Version:         1.0 (1)\n')
+        f.write('Parent Process:  launchd [1]\n')
+        f.write('\n')
+        f.write('Report Version:  9\n')
+        f.write('Crashed Thread:  0\n')
+        f.write('\n')
+        f.write('Exception Type:  EXC_BAD_ACCESS (SIGSEGV)\n')
+        f.write('Exception Codes: KERN_INVALID_ADDRESS at 0x0000000000000000\n')
+        f.write('\n')
+        for thread_idx in range(num_threads):
+            if thread_idx == 0:
+                f.write('Thread 0 Crashed:\n')
+            else:
+                f.write('Thread %u:\n' % thread_idx)
+            for frame_idx in range(num_frames):
+                image_idx = (thread_idx + frame_idx) % num_images
+                f.write('%-3u lib%u.dylib \t0x%16.16x func%u + %u\n' % (frame_idx, image_idx, 0x100000000 + image_idx * 0x10000 + frame_idx * 4, frame_idx, frame_idx * 4))
+            f.write('\n')
+        f.write('Thread 0 crashed with X86 Thread State (64-bit):\n')
+        f.write('  rax: 0x0000000000000000  rbx: 0x0000000000000001  rcx: 0x0000000000000002  rdx: 0x0000000000000003\n')
+        f.write('  rip: 0x0000000100000000  rfl: 0x0000000000010246  cr2: 0x0000000000000000\n')
+        f.write('\n')
+        f.write('Binary Images:\n')
+        for image_idx in range(num_images):
+            f.write('0x%x - 0x%x +lib%u.dylib (1.0) <%8.8X-0000-0000-0000-000000000000> /usr/lib/lib%u.dylib\n' % (0x100000000 + image_idx * 0x10000, 0x10000ffff + image_idx * 0x10000, image_idx, image_idx, image_idx))
+        f.write('\n')
+
+    @benchmarks_test
+    @unittest2.skipUnless(sys.platform.startswith("darwin"), "crashlog.py only handles darwin crash logs")
+    def test_parse_crash_log(self):
+        """Test parsing a crash log with 2000 threads and 2000 images."""
+        from lldb.macosx import crashlog
+        print
+        self.stopwatch.reset()
+        for i in self.stopwatch.iterations(self.count):
+            with self.stopwatch:
+                crash_log = crashlog.CrashLog(self.crash_log_path)
+        self.assertTrue(crash_log.error is None)
+        self.assertTrue(len(crash_log.threads) == 2000)
+        self.assertTrue(len(crash_log.images) == 2000)
+        print "crashlog.py parse benchmark:", self.stopwatch
+
+
+if __name__ == '__main__':
+    import atexit
+    lldb.SBDebugger.Initialize()
+    atexit.register(lambda: lldb.SBDebugger.Terminate())
+    unittest2.main()
@@ -33,9 +33,8 @@ class DisassembleDriverMainLoop(BenchBase):
         self.function = 'Driver::MainLoop()'
         self.lldb_avg = None
         self.gdb_avg = None
+        # With no -y count, the stopwatch decides how many laps to run.
         self.count = lldb.bmIterationCount
-        if self.count <= 0:
-            self.count = 5
 
     @benchmarks_test
     def test_run_lldb_then_gdb(self):
@@ -86,7 +85,7 @@ class DisassembleDriverMainLoop(BenchBase):
 
         # Reset the stopwatch now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             with self.stopwatch:
                 # Disassemble the function.
                 child.sendline('disassemble -f')
@@ -126,7 +125,7 @@ class DisassembleDriverMainLoop(BenchBase):
 
         # Reset the stopwatch now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             with self.stopwatch:
                 # Disassemble the function.
                 child.sendline('disassemble')
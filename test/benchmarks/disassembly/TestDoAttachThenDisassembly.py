@@ -18,9 +18,8 @@ class AttachThenDisassemblyBench(BenchBase):
             self.exe = lldb.bmExecutable
         else:
             self.exe = self.lldbHere
+        # With no -y count, the stopwatch decides how many laps to run.
         self.count = lldb.bmIterationCount
-        if self.count <= 0:
-            self.count = 10
 
     @benchmarks_test
     def test_attach_then_disassembly(self):
@@ -62,7 +61,7 @@ class AttachThenDisassemblyBench(BenchBase):
             
         # Reset the stopwatch now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             with self.stopwatch:
                 # Disassemble the function.
                 self.runCmd("disassemble -f")
@@ -18,9 +18,8 @@ class XCode41Vs42GDBDisassembly(BenchBase):
         self.function = 'Driver::MainLoop()'
         self.gdb_41_avg = None
         self.gdb_42_avg = None
+        # With no -y count, the stopwatch decides how many laps to run.
         self.count = lldb.bmIterationCount
-        if self.count <= 0:
-            self.count = 5
 
     @benchmarks_test
     def test_run_41_then_42(self):
@@ -67,7 +66,7 @@ class XCode41Vs42GDBDisassembly(BenchBase):
 
         # Reset the stopwatch now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             with self.stopwatch:
                 # Disassemble the function.
                 child.sendline('disassemble')
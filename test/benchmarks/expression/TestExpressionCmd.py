@@ -14,9 +14,8 @@ class ExpressionEvaluationCase(BenchBase):
         BenchBase.setUp(self)
         self.source = 'main.cpp'
         self.line_to_break = line_number(self.source, '// Set breakpoint here.')
+        # With no -y count, the stopwatch decides how many laps to run.
         self.count = lldb.bmIterationCount
-        if self.count <= 0:
-            self.count = 25
 
     @benchmarks_test
     def test_expr_cmd(self):
@@ -37,7 +36,7 @@ class ExpressionEvaluationCase(BenchBase):
 
         # Reset the stopwatch now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             # So that the child gets torn down after the test.
             self.child = pexpect.spawn('%s %s %s' % (self.lldbHere, self.lldbOption, exe))
             child = self.child
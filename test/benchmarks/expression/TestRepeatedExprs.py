@@ -16,9 +16,8 @@ class RepeatedExprsCase(BenchBase):
         self.line_to_break = line_number(self.source, '// Set breakpoint here.')
         self.lldb_avg = None
         self.gdb_avg = None
+        # With no -y count, the stopwatch decides how many laps to run.
         self.count = lldb.bmIterationCount
-        if self.count <= 0:
-            self.count = 100
 
     @benchmarks_test
     def test_compare_lldb_to_gdb(self):
@@ -58,7 +57,7 @@ class RepeatedExprsCase(BenchBase):
 
         # Reset the stopwatch now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             with self.stopwatch:
                 child.sendline(expr_cmd1)
                 child.expect_exact(prompt)
@@ -103,7 +102,7 @@ class RepeatedExprsCase(BenchBase):
 
         # Reset the stopwatch now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             with self.stopwatch:
                 child.sendline(expr_cmd1)
                 child.expect_exact(prompt)
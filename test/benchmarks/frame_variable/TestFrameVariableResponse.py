@@ -21,9 +21,8 @@ class FrameVariableResponseBench(BenchBase):
         else:
             self.break_spec = '-n main'
 
+        # With no -y count, the stopwatch decides how many laps to run.
         self.count = lldb.bmIterationCount
-        if self.count <= 0:
-            self.count = 20
 
     @benchmarks_test
     def test_startup_delay(self):
@@ -39,7 +38,7 @@ class FrameVariableResponseBench(BenchBase):
 
         # Reset the stopwatchs now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             # So that the child gets torn down after the test.
             self.child = pexpect.spawn('%s %s %s' % (self.lldbHere, self.lldbOption, exe))
             child = self.child
@@ -0,0 +1,85 @@
+"""Test the response time of the libc++ std::list Python synthetic provider."""
+
+import os, sys
+import unittest2
+import lldb
+import pexpect
+from lldbbench import *
+
+class LibcxxListSynthProviderBench(BenchBase):
+
+    mydir = TestBase.compute_mydir(__file__)
+
+    def setUp(self):
+        BenchBase.setUp(self)
+        self.source = 'main.cpp'
+        self.line_to_break = line_number(self.source, '// Set breakpoint here.')
+        self.provider = os.path.join(os.environ["LLDB_TEST"], os.pardir, 'examples', 'synthetic', 'libcxx.py')
+        # With no -y count, the stopwatch decides how many laps to run.
+        self.count = lldb.bmIterationCount
+
+    @benchmarks_test
+    @skipIfLinux # No standard locations for libc++ on Linux, so skip for now
+    def test_frame_variable_list(self):
+        """Test 'frame variable' on std::list objects of 1k, 10k and 100k elements."""
+        self.buildDefault()
+        self.exe_name = 'a.out'
+
+        print
+        for name in ['list_1k', 'list_10k', 'list_100k']:
+            self.run_frame_variable_list(self.exe_name, name, self.count)
+            print "lldb %s benchmark:" % name, self.stopwatch
+
+    def run_frame_variable_list(self, exe_name, var_name, count):
+        exe = os.path.join(os.getcwd(), exe_name)
+
+        # Set self.child_prompt, which is "(lldb) ".
+        self.child_prompt = '(lldb) '
+        prompt = self.child_prompt
+
+        # So that the child gets torn down after the test.
+        self.child = pexpect.spawn('%s %s %s' % (self.lldbExec, self.lldbOption, exe))
+        child = self.child
+
+        # Turn on logging for what the child sends back.
+        if self.TraceOn():
+            child.logfile_read = sys.stdout
+
+        child.expect_exact(prompt)
+        child.sendline('command script import %s' % self.provider)
+        child.expect_exact(prompt)
+        # Make sure neither lldb nor the provider caps the number of children.
+        child.sendline('settings set target.max-children-count 100000')
+        child.expect_exact(prompt)
+        child.sendline('script libcxx._list_capping_size = 100000')
+        child.expect_exact(prompt)
+        child.sendline('breakpoint set -f %s -l %d' % (self.source, self.line_to_break))
+        child.expect_exact(prompt)
+        child.sendline('run')
+        child.expect_exact(prompt)
+
+        # Reset the stopwatch now.
+        self.stopwatch.reset()
+        for i in self.stopwatch.iterations(count):
+            with self.stopwatch:
+                # Redefining the synthetic provider throws away the provider
+                # instance, and with it the cached node index.
+                child.sendline('type synthetic add -l libcxx.stdlist_SynthProvider -x "^(std::__1::)list<.+>$" -w libcxx')
+                child.expect_exact(prompt)
+                child.sendline('frame variable %s' % var_name)
+                child.expect_exact(prompt, timeout=600)
+
+        child.sendline('quit')
+        try:
+            self.child.expect(pexpect.EOF)
+        except:
+            pass
+
+        self.child = None
+
+
+if __name__ == '__main__':
+    import atexit
+    lldb.SBDebugger.Initialize()
+    atexit.register(lambda: lldb.SBDebugger.Terminate())
+    unittest2.main()
@@ -0,0 +1,19 @@
+#include <list>
+
+int main()
+{
+    std::list<int> list_1k;
+    std::list<int> list_10k;
+    std::list<int> list_100k;
+
+    for (int i = 0; i < 100000; i++)
+    {
+        if (i < 1000)
+            list_1k.push_back(i);
+        if (i < 10000)
+            list_10k.push_back(i);
+        list_100k.push_back(i);
+    }
+
+    return 0; // Set breakpoint here.
+}
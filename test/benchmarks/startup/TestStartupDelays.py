@@ -26,9 +26,8 @@ class StartupDelaysBench(BenchBase):
         else:
             self.break_spec = '-n main'
 
+        # With no -y count, the stopwatch decides how many laps to run.
         self.count = lldb.bmIterationCount
-        if self.count <= 0:
-            self.count = 30
 
     @benchmarks_test
     def test_startup_delay(self):
@@ -47,7 +46,7 @@ class StartupDelaysBench(BenchBase):
         # Reset the stopwatchs now.
         self.stopwatch.reset()
         self.stopwatch2.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count, self.stopwatch2, self.stopwatch3):
             # So that the child gets torn down after the test.
             self.child = pexpect.spawn('%s %s' % (self.lldbHere, self.lldbOption))
             child = self.child
@@ -12,9 +12,8 @@ class RunHooksThenSteppingsBench(BenchBase):
 
     def setUp(self):
         BenchBase.setUp(self)
+        # With no -y count, the stopwatch decides how many laps to run.
         self.count = lldb.bmIterationCount
-        if self.count <= 0:
-            self.count = 50
 
     @benchmarks_test
     def test_lldb_runhooks_then_steppings(self):
@@ -44,7 +43,7 @@ class RunHooksThenSteppingsBench(BenchBase):
 
         # Reset the stopwatch now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             with self.stopwatch:
                 # Step through the function.
                 child.sendline('next') # Aka 'thread step-over'.
@@ -21,9 +21,8 @@ class SteppingSpeedBench(BenchBase):
         else:
             self.break_spec = '-n main'
 
+        # With no -y count, the stopwatch decides how many laps to run.
         self.count = lldb.bmIterationCount
-        if self.count <= 0:
-            self.count = 50
 
         #print "self.exe=%s" % self.exe
         #print "self.break_spec=%s" % self.break_spec
@@ -56,7 +55,7 @@ class SteppingSpeedBench(BenchBase):
 
         # Reset the stopwatch now.
         self.stopwatch.reset()
-        for i in range(count):
+        for i in self.stopwatch.iterations(count):
             with self.stopwatch:
                 # Disassemble the function.
                 child.sendline('next') # Aka 'thread step-over'.
@@ -20,14 +20,20 @@ Type:
 for available options.
 """
 
+import ast
 import atexit
 import commands
+import hashlib
+import imp
+import json
 import os
 import platform
 import progress
+import re
 import signal
 import subprocess
 import sys
+import tempfile
 import textwrap
 import time
 import inspect
@@ -222,6 +228,14 @@ parsable = False
 # The regular expression pattern to match against eligible filenames as our test cases.
 regexp = None
 
+# The index of the classes and methods in each test file, keyed by the file path,
+# which is cached in a file in the temporary directory, outside of the source
+# tree, so that the tests selected by the filterspecs can be found without
+# importing every file.
+testIndex = {}
+testIndexFile = None
+testIndexChanged = False
+
 # By default, tests are executed in place and cleanups are performed afterwards.
 # Use '-r dir' option to relocate the tests and their intermediate files to a
 # different directory and to forgo any cleanups.  The directory specified must
@@ -1052,6 +1066,118 @@ def setupSysPath():
     if dumpSysPath:
         print "sys.path:", sys.path
 
+def indexTestFile(path):
+    """Return a dictionary of the top level class names in the test file to the
+    names of the functions defined in their bodies, plus the other top level
+    names, including the ones bound by imports, under the '' key, by parsing the
+    file instead of importing it."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    index = {'': []}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            index[node.name] = [item.name for item in node.body if isinstance(item, ast.FunctionDef)]
+        elif isinstance(node, ast.FunctionDef):
+            index[''].append(node.name)
+        elif isinstance(node, ast.Assign):
+            index[''].extend([target.id for target in node.targets if isinstance(target, ast.Name)])
+        elif isinstance(node, ast.Import):
+            # "import a.b" binds "a".
+            index[''].extend([alias.asname or alias.name.split('.')[0] for alias in node.names])
+        elif isinstance(node, ast.ImportFrom):
+            # "from a import *" is recorded as "*".
+            index[''].extend([alias.asname or alias.name for alias in node.names])
+    return index
+
+def getTestFileIndex(path):
+    """Return the index of the test file, from the on-disk cache if the file has
+    not changed since it was indexed."""
+    global testIndex
+    global testIndexChanged
+
+    st = os.stat(path)
+    entry = testIndex.get(path)
+    if entry and entry[0] == st.st_mtime and entry[1] == st.st_size:
+        return entry[2]
+    try:
+        index = indexTestFile(path)
+    except SyntaxError:
+        # Let the import report the error.
+        index = None
+    testIndex[path] = [st.st_mtime, st.st_size, index]
+    testIndexChanged = True
+    return index
+
+def loadTestIndex():
+    """Load the test file index cache."""
+    global testIndex
+    global testIndexFile
+
+    # Each test root gets its own cache file.
+    test_root_hash = hashlib.md5(os.path.abspath(os.environ["LLDB_TEST"])).hexdigest()
+    testIndexFile = os.path.join(tempfile.gettempdir(), "lldb-dotest-index-%s.json" % test_root_hash)
+    try:
+        with open(testIndexFile) as f:
+            testIndex = json.load(f)
+    except (IOError, ValueError):
+        testIndex = {}
+
+def saveTestIndex():
+    """Save the test file index cache if any test file was indexed."""
+    if testIndexChanged:
+        # Write a temporary file and rename it into place, so that concurrent
+        # test runs never read a partially written index.
+        try:
+            (fd, temp_path) = tempfile.mkstemp(dir=os.path.dirname(testIndexFile), prefix=".lldb-dotest-index-")
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(testIndex, f)
+            os.rename(temp_path, testIndexFile)
+        except (IOError, OSError):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+def filterspecMayMatch(index, filterspec):
+    """Return False if the filterspec can't match anything in the indexed test
+    file.  Methods may be inherited from another module, so a filterspec that
+    names a class in the file but not one of its own methods may still match."""
+    if index is None or '*' in index['']:
+        return True
+    name = filterspec.split('.')[0]
+    return name in index or name in index['']
+
+def importTestModule(path):
+    """Import the test file under a unique name derived from its path relative to
+    the test root, so test files with the same name in different directories
+    don't collide, and add its directory to sys.path for the modules next to it."""
+    path = os.path.abspath(path)
+    module_dir = os.path.dirname(path)
+    relpath = os.path.relpath(os.path.splitext(path)[0], os.environ["LLDB_TEST"])
+    if relpath.startswith(os.pardir):
+        relpath = os.path.splitext(path)[0].lstrip(os.sep)
+    module_name = '.'.join([re.sub(r'\W', '_', part) for part in relpath.split(os.sep)])
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    if not sys.path.count(module_dir):
+        sys.path.insert(0, module_dir)
+    module = imp.new_module(module_name)
+    module.__file__ = path
+    # Use absolute imports only, there are no parent packages to import from.
+    module.__package__ = ''
+    sys.modules[module_name] = module
+    try:
+        with open(path) as f:
+            code = compile(f.read(), path, 'exec')
+        exec code in module.__dict__
+    except:
+        del sys.modules[module_name]
+        raise
+    return module
+
 def visit(prefix, dir, names):
     """Visitor function for os.path.walk(path, visit, arg)."""
 
@@ -1080,12 +1206,10 @@ def visit(prefix, dir, names):
                     #print "Filename: '%s' does not match pattern: '%s'" % (name, regexp)
                     continue
 
-            # We found a match for our test.  Add it to the suite.
-
-            # Update the sys.path first.
-            if not sys.path.count(dir):
-                sys.path.insert(0, dir)
-            base = os.path.splitext(name)[0]
+            # We found a match for our test.  Add it to the suite.  The module is
+            # only imported once we know that some of its tests will be run.
+            path = os.path.join(dir, name)
+            module = None
 
             # Thoroughly check the filterspec against the base module and admit
             # the (base, filterspec) combination only when it makes sense.
@@ -1093,7 +1217,11 @@ def visit(prefix, dir, names):
             for filterspec in filters:
                 # Optimistically set the flag to True.
                 filtered = True
-                module = __import__(base)
+                if not filterspecMayMatch(getTestFileIndex(path), filterspec):
+                    filtered = False
+                    continue
+                if not module:
+                    module = importTestModule(path)
                 parts = filterspec.split('.')
                 obj = module
                 for part in parts:
@@ -1121,7 +1249,9 @@ def visit(prefix, dir, names):
                 # A simple case of just the module name.  Also the failover case
                 # from the filterspec branch when the (base, filterspec) combo
                 # doesn't make sense.
-                suite.addTests(unittest2.defaultTestLoader.loadTestsFromName(base))
+                if not module:
+                    module = importTestModule(path)
+                suite.addTests(unittest2.defaultTestLoader.loadTestsFromModule(module))
 
 
 def lldbLoggings():
@@ -1214,8 +1344,10 @@ if not skip_long_running_test:
 #
 # Walk through the testdirs while collecting tests.
 #
+loadTestIndex()
 for testdir in testdirs:
     os.path.walk(testdir, visit, 'Test')
+saveTestIndex()
 
 #
 # Now that we have loaded all the test cases, run the whole test suite.
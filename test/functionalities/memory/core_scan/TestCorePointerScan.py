@@ -0,0 +1,273 @@
+"""
+Test the ELF core file pointer scanner and the reverse reference index used
+by the 'ptr_refs', 'cstr_refs' and 'ptr_chain' commands in
+examples/darwin/heap_find/heap.py.
+"""
+
+import os, time
+import imp
+import random
+import struct
+import unittest2
+import lldb
+from lldbtest import *
+
+# Segment types and flags from the ELF specification.
+PT_LOAD = 1
+PT_NOTE = 4
+PF_X = 1
+PF_W = 2
+PF_R = 4
+
+def make_elf_core(path, segments, is_64, big_endian):
+    """Write an ELF core file at path with one program header for each
+    (p_type, p_flags, p_vaddr, data, p_memsz) tuple in segments, and return
+    the (p_vaddr, p_offset, p_filesz) of each segment."""
+    byte_order = '>' if big_endian else '<'
+    if is_64:
+        (ehdr_size, phdr_size) = (64, 56)
+    else:
+        (ehdr_size, phdr_size) = (52, 32)
+    ident = '\x7fELF' + ('\x02' if is_64 else '\x01') + ('\x02' if big_endian else '\x01') + '\x01'
+    ident += '\0' * (16 - len(ident))
+    addr_format = 'Q' if is_64 else 'I'
+    # e_type = ET_CORE, e_machine, e_version, e_entry, e_phoff, e_shoff,
+    # e_flags, e_ehsize, e_phentsize, e_phnum, e_shentsize, e_shnum, e_shstrndx
+    ehdr = ident + struct.pack(byte_order + 'HHI' + addr_format * 3 + 'IHHHHHH',
+                               4, 0, 1, 0, ehdr_size, 0, 0, ehdr_size, phdr_size, len(segments), 0, 0, 0)
+    phdrs = ''
+    contents = ''
+    layout = list()
+    offset = ehdr_size + phdr_size * len(segments)
+    for (p_type, p_flags, p_vaddr, data, p_memsz) in segments:
+        if is_64:
+            phdrs += struct.pack(byte_order + 'IIQQQQQQ', p_type, p_flags, offset, p_vaddr, 0, len(data), p_memsz, 0)
+        else:
+            phdrs += struct.pack(byte_order + 'IIIIIIII', p_type, offset, p_vaddr, 0, len(data), p_memsz, p_flags, 0)
+        layout.append((p_vaddr, offset, len(data)))
+        contents += data
+        offset += len(data)
+    f = open(path, 'wb')
+    f.write(ehdr + phdrs + contents)
+    f.close()
+    return layout
+
+class CoreFileProcess:
+    """Reads the memory of an ELF core file the way an SBProcess would."""
+    def __init__(self, path, layout, ptr_size, big_endian):
+        f = open(path, 'rb')
+        self.contents = f.read()
+        f.close()
+        self.layout = layout
+        self.ptr_size = ptr_size
+        self.big_endian = big_endian
+
+    def GetUniqueID(self):
+        return 1
+
+    def GetStopID(self):
+        return 1
+
+    def GetAddressByteSize(self):
+        return self.ptr_size
+
+    def GetByteOrder(self):
+        if self.big_endian:
+            return lldb.eByteOrderBig
+        return lldb.eByteOrderLittle
+
+    def ReadMemory(self, addr, size, error):
+        for (p_vaddr, p_offset, p_filesz) in self.layout:
+            if p_vaddr <= addr and addr + size <= p_vaddr + p_filesz:
+                start = p_offset + addr - p_vaddr
+                return self.contents[start:start + size]
+        error.SetErrorString('memory read failed for 0x%x' % (addr))
+        return None
+
+class CorePointerScanTestCase(TestBase):
+
+    mydir = TestBase.compute_mydir(__file__)
+
+    def setUp(self):
+        # Call super's setUp().
+        TestBase.setUp(self)
+        self.core_path = os.path.join(os.getcwd(), "synthetic.core")
+        # heap.py installs its commands in lldb.debugger when it is imported.
+        saved_debugger = lldb.debugger
+        lldb.debugger = self.dbg
+        try:
+            self.heap = imp.load_source('heap', os.path.join(os.environ["LLDB_SRC"], "examples", "darwin", "heap_find", "heap.py"))
+        finally:
+            lldb.debugger = saved_debugger
+        def cleanup():
+            if os.path.exists(self.core_path):
+                os.remove(self.core_path)
+        self.addTearDownHook(cleanup)
+
+    def test_elf64_little_endian(self):
+        """Test finding pointers in the writable segments of a 64-bit little endian ELF core file."""
+        self.core_pointer_scan(True, False)
+
+    def test_elf32_big_endian(self):
+        """Test finding pointers in the writable segments of a 32-bit big endian ELF core file."""
+        self.core_pointer_scan(False, True)
+
+    def test_elf64_cstrings(self):
+        """Test finding C strings in the writable segments of a 64-bit little endian ELF core file."""
+        def plant(size, strings):
+            data = bytearray(size)
+            for (offset, string) in strings:
+                data[offset:offset + len(string)] = string[:size - offset]
+            return str(data)
+        segments = [
+            (PT_LOAD, PF_R | PF_W, 0x10000, plant(0x40, [(0x3, 'hello'), (0x1e, 'hello'), (0x3d, 'hello')]), 0x40),
+            (PT_LOAD, PF_R, 0x30000, plant(0x40, [(0x10, 'hello')]), 0x40),
+            (PT_LOAD, PF_R | PF_W, 0x40000, plant(0x20, [(0x0, 'hello')]), 0x20),
+        ]
+        layout = make_elf_core(self.core_path, segments, True, False)
+        regions = self.heap.get_elf_core_writable_regions(self.core_path)
+        process = CoreFileProcess(self.core_path, layout, 8, False)
+        # "lo" overlaps each "hello", and the last "hello" in the first
+        # segment is cut off at its end.
+        expected = [(0x10000, 0x10040, 0x10003, 'hello'), (0x10000, 0x10040, 0x10006, 'lo'),
+                    (0x10000, 0x10040, 0x1001e, 'hello'), (0x10000, 0x10040, 0x10021, 'lo'),
+                    (0x40000, 0x40020, 0x40000, 'hello'), (0x40000, 0x40020, 0x40003, 'lo')]
+        # Small chunks make sure that strings that span two chunks are found once.
+        for chunk_size in (1024*1024, 7, 3, 1):
+            matches = sorted(self.heap.scan_memory_for_strings(process, regions, ['hello', 'lo'], chunk_size))
+            self.assertTrue(matches == expected,
+                            "chunk size %u found %s, expected %s" % (chunk_size, matches, expected))
+
+    def test_reverse_reference_index(self):
+        """Test that the reverse reference index holds exactly the words that point into the regions, sorted by value."""
+        random.seed(17)
+        region_sizes = [(0x10000, 0x400), (0x20000, 0x1000), (0x7f0000, 0x800)]
+        def random_word():
+            # Mostly pointers into or just around the regions, and some
+            # values that point nowhere
+            (region_start, region_size) = random.choice(region_sizes)
+            choice = random.randrange(4)
+            if choice == 0:
+                return random.randrange(0, 1 << 48)
+            elif choice == 1:
+                return region_start + region_size + random.randrange(0, 16)
+            return region_start + random.randrange(0, region_size)
+        segments = list()
+        for (region_start, region_size) in region_sizes:
+            data = struct.pack('<%uQ' % (region_size / 8), *[random_word() for i in range(region_size / 8)])
+            segments.append((PT_LOAD, PF_R | PF_W, region_start, data, region_size))
+        layout = make_elf_core(self.core_path, segments, True, False)
+        process = CoreFileProcess(self.core_path, layout, 8, False)
+        regions = self.heap.get_elf_core_writable_regions(self.core_path)
+
+        # Find the references by checking every word.
+        expected = list()
+        for (region_start, region_end) in regions:
+            for addr in range(region_start, region_end, 8):
+                (value, ) = struct.unpack('<Q', process.ReadMemory(addr, 8, lldb.SBError()))
+                for (start_addr, end_addr) in regions:
+                    if start_addr <= value < end_addr:
+                        expected.append((value, addr))
+        expected.sort()
+        self.assertTrue(len(expected) > 0)
+
+        # Regions that overlap, like the data sections and the stacks that
+        # are used when the memory regions can't be listed, must not add any
+        # word twice.
+        overlapping_regions = regions + [(0x10100, 0x10200), (0x203f0, 0x20800)]
+        # Small chunks sort many runs that have to be merged.
+        for chunk_size in (1024*1024, 0x100, 64, 8):
+            for index_regions in (regions, overlapping_regions):
+                index = self.heap.ReverseReferenceIndex(process, index_regions, chunk_size)
+                refs = zip(index.values, index.refs)
+                self.assertTrue(refs == expected,
+                                "chunk size %u indexed %u references, expected %u" % (chunk_size, len(refs), len(expected)))
+        for (value, addr) in expected[:32]:
+            self.assertTrue((value, addr) in index.find_refs(value, value + 1))
+
+    def test_find_chains(self):
+        """Test finding the chain of pointers from a root that keeps an address alive."""
+        root_start = 0x10000
+        heap_start = 0x50000
+        target_addr = heap_start + 0x200
+        def plant(size, pointers):
+            data = bytearray(size)
+            for (offset, pointer) in pointers:
+                data[offset:offset + 8] = struct.pack('<Q', pointer)
+            return str(data)
+        segments = [
+            # A global that points to the start of object A.
+            (PT_LOAD, PF_R | PF_W, root_start, plant(0x20, [(0x8, heap_start)]), 0x20),
+            # Object A points to object B from offset 0x30, object B points
+            # to the target from offset 0x18.  Object C also points to the
+            # target, but nothing points to C.
+            (PT_LOAD, PF_R | PF_W, heap_start, plant(0x400, [(0x30, heap_start + 0x100),
+                                                              (0x118, target_addr),
+                                                              (0x308, target_addr)]), 0x400),
+        ]
+        layout = make_elf_core(self.core_path, segments, True, False)
+        process = CoreFileProcess(self.core_path, layout, 8, False)
+        index = self.heap.ReverseReferenceIndex(process, self.heap.get_elf_core_writable_regions(self.core_path))
+        def is_root(addr):
+            return root_start <= addr < root_start + 0x20
+
+        chain = [root_start + 0x8, heap_start + 0x30, heap_start + 0x118, target_addr]
+        chains = index.find_chains(target_addr, is_root, 4, 256, 8)
+        self.assertTrue(chains == [chain], "found chains %s, expected %s" % (chains, [chain]))
+        # The global points 0x30 bytes before the pointer in object A, which
+        # a --max-offset of 0x30 still allows.
+        self.assertTrue(index.find_chains(target_addr, is_root, 4, 0x30, 8) == [chain])
+        self.assertTrue(index.find_chains(target_addr, is_root, 4, 0x2f, 8) == [])
+        # The chain has three pointers in it.
+        self.assertTrue(index.find_chains(target_addr, is_root, 3, 256, 8) == [chain])
+        self.assertTrue(index.find_chains(target_addr, is_root, 2, 256, 8) == [])
+
+    def core_pointer_scan(self, is_64, big_endian):
+        """Plant pointers in a synthetic core file and find the addresses that refer to them."""
+        ptr_size = 8 if is_64 else 4
+        pointer_format = ('>' if big_endian else '<') + ('Q' if is_64 else 'I')
+        def plant(size, pointers):
+            data = bytearray(size)
+            for (offset, pointer) in pointers:
+                data[offset:offset + ptr_size] = struct.pack(pointer_format, pointer)
+            return str(data)
+        heap_block = 0x20010
+        other_block = 0x20018
+        segments = [
+            # A note segment, which must be ignored.
+            (PT_NOTE, 0, 0, plant(0x20, [(0x8, heap_block)]), 0),
+            # A writable segment with aligned pointers, and a misaligned copy
+            # of one that must not be reported.
+            (PT_LOAD, PF_R | PF_W, 0x10000, plant(0x100, [(0x8, heap_block), (0x40, heap_block), (0x80, other_block), (0xc3, heap_block)]), 0x100),
+            # A read-only segment, which can't hold references that matter.
+            (PT_LOAD, PF_R | PF_X, 0x30000, plant(0x40, [(0x10, heap_block)]), 0x40),
+            # A writable segment that has no contents in the core file.
+            (PT_LOAD, PF_R | PF_W, 0x20000, '', 0x1000),
+            # Another writable segment, with a pointer in its last word.
+            (PT_LOAD, PF_R | PF_W, 0x40000, plant(0x20, [(0x20 - ptr_size, heap_block)]), 0x20),
+        ]
+        layout = make_elf_core(self.core_path, segments, is_64, big_endian)
+
+        regions = self.heap.get_elf_core_writable_regions(self.core_path)
+        self.assertTrue(regions == [(0x10000, 0x10100), (0x40000, 0x40020)],
+                        "unexpected writable regions: %s" % (regions))
+
+        process = CoreFileProcess(self.core_path, layout, ptr_size, big_endian)
+        expected = [(0x10000, 0x10100, 0x10008, heap_block),
+                    (0x10000, 0x10100, 0x10040, heap_block),
+                    (0x10000, 0x10100, 0x10080, other_block),
+                    (0x40000, 0x40020, 0x40020 - ptr_size, heap_block)]
+        # Small chunks make sure that matches aren't lost between chunks.
+        for chunk_size in (1024*1024, 4 * ptr_size, ptr_size):
+            matches = list(self.heap.scan_memory_for_pointers(process, regions, [heap_block, other_block], chunk_size))
+            self.assertTrue(matches == expected,
+                            "chunk size %u found %s, expected %s" % (chunk_size, matches, expected))
+
+        self.assertRaises(ValueError, self.heap.get_elf_core_writable_regions, os.path.join(os.environ["LLDB_SRC"], "test", "functionalities", "memory", "core_scan", "TestCorePointerScan.py"))
+
+
+if __name__ == '__main__':
+    import atexit
+    lldb.SBDebugger.Initialize()
+    atexit.register(lambda: lldb.SBDebugger.Terminate())
+    unittest2.main()
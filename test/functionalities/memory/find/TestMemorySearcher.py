@@ -0,0 +1,81 @@
+"""
+Test the chunked pattern search used by the 'memfind' command in examples/python/memory.py.
+"""
+
+import os, time
+import imp
+import unittest2
+import lldb
+from lldbtest import *
+import lldbutil
+
+class MemorySearcherTestCase(TestBase):
+
+    mydir = TestBase.compute_mydir(__file__)
+
+    @unittest2.skipUnless(sys.platform.startswith("darwin"), "requires Darwin")
+    @dsym_test
+    def test_memory_searcher_with_dsym(self):
+        """Test that patterns are found in memory with any chunk size, including chunks shorter than the patterns."""
+        self.buildDsym()
+        self.memory_searcher()
+
+    @dwarf_test
+    def test_memory_searcher_with_dwarf(self):
+        """Test that patterns are found in memory with any chunk size, including chunks shorter than the patterns."""
+        self.buildDwarf()
+        self.memory_searcher()
+
+    def setUp(self):
+        # Call super's setUp().
+        TestBase.setUp(self)
+        # Find the line number to break inside main().
+        self.line = line_number('main.c', '// Set break point at this line.')
+
+    def memory_searcher(self):
+        """Search g_buffer with every chunk size from 1 byte up."""
+        memory = imp.load_source('memory', os.path.join(os.environ["LLDB_SRC"], "examples", "python", "memory.py"))
+
+        exe = os.path.join(os.getcwd(), "a.out")
+        target = self.dbg.CreateTarget(exe)
+        self.assertTrue(target, VALID_TARGET)
+
+        lldbutil.run_break_set_by_file_and_line (self, "main.c", self.line, num_expected_locations=1, loc_exact=True)
+        process = target.LaunchSimple (None, None, self.get_process_working_directory())
+        self.assertTrue(process, PROCESS_IS_VALID)
+        self.assertTrue(process.GetState() == lldb.eStateStopped, STOPPED_DUE_TO_BREAKPOINT)
+
+        buffer = target.FindFirstGlobalVariable("g_buffer")
+        self.assertTrue(buffer.IsValid())
+        start_addr = buffer.GetLoadAddress()
+        end_addr = start_addr + buffer.GetByteSize()
+        error = lldb.SBError()
+        data = process.ReadMemory(start_addr, end_addr - start_addr, error)
+        self.assertTrue(error.Success())
+
+        patterns = [memory.MemoryPattern('needle', 'needle'),
+                    memory.MemoryPattern('haystack', 'haystack!'),
+                    memory.parse_hex_pattern('12??567?')]
+        # Find the matches the slow way to compare with.
+        expected = []
+        for pattern in patterns:
+            for offset in range(len(data) - len(pattern) + 1):
+                if data[offset:].startswith(pattern.key, pattern.key_offset) and pattern.matches(data, offset):
+                    expected.append((start_addr + offset, pattern.name))
+        expected.sort()
+        self.assertTrue(len(expected) == 6)
+
+        searcher = memory.MemorySearcher(patterns)
+        for chunk_size in range(1, len(data) + 2):
+            matches = []
+            for (addr, pattern) in searcher.search_memory(process, start_addr, end_addr, chunk_size):
+                self.assertTrue(pattern is not None, "failed to read memory with chunk size %u" % (chunk_size))
+                matches.append((addr, pattern.name))
+            self.assertTrue(sorted(matches) == expected, "chunk size %u found %s, expected %s" % (chunk_size, sorted(matches), expected))
+
+
+if __name__ == '__main__':
+    import atexit
+    lldb.SBDebugger.Initialize()
+    atexit.register(lambda: lldb.SBDebugger.Terminate())
+    unittest2.main()
@@ -0,0 +1,20 @@
+//===-- main.c ----------------------------------------------------*- C -*-===//
+//
+//                     The LLVM Compiler Infrastructure
+//
+// This file is distributed under the University of Illinois Open Source
+// License. See LICENSE.TXT for details.
+//
+//===----------------------------------------------------------------------===//
+#include <stdio.h>
+#include <string.h>
+
+// The patterns are planted so that, with small chunk sizes, many of them
+// straddle the boundary between two chunks.
+char g_buffer[] = "xxneedleyyhaystack!needle\x12\x34\x56\x78needlehaystack!zz";
+
+int main (int argc, char const *argv[])
+{
+    printf("%u\n", (unsigned)strlen(g_buffer)); // Set break point at this line.
+    return 0;
+}
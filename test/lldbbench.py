@@ -1,7 +1,54 @@
+import json
+import math
+import os
+import random
+import sys
 import time
-#import numpy
 from lldbtest import *
 
+def monotonicClock():
+    """
+    Return a function that reads a monotonic, high resolution clock in seconds,
+    which unlike time.time() does not jump when the system time is adjusted.
+    Falls back to time.time() if no such clock can be found.
+    """
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+    try:
+        import ctypes, ctypes.util
+        if sys.platform.startswith('darwin'):
+            class mach_timebase_info_data_t(ctypes.Structure):
+                _fields_ = [('numer', ctypes.c_uint32), ('denom', ctypes.c_uint32)]
+            libc = ctypes.CDLL(ctypes.util.find_library('c'))
+            libc.mach_absolute_time.restype = ctypes.c_uint64
+            timebase = mach_timebase_info_data_t()
+            libc.mach_timebase_info(ctypes.byref(timebase))
+            scale = float(timebase.numer) / timebase.denom / 1e9
+            return lambda: libc.mach_absolute_time() * scale
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+        librt = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'))
+        clock_id = 4 if sys.platform.startswith('freebsd') else 1 # CLOCK_MONOTONIC
+        ts = timespec()
+        def clock():
+            if librt.clock_gettime(clock_id, ctypes.byref(ts)) != 0:
+                raise OSError("clock_gettime() failed")
+            return ts.tv_sec + ts.tv_nsec * 1e-9
+        clock()
+        return clock
+    except (ImportError, OSError, AttributeError, TypeError):
+        return time.time
+
+clock = monotonicClock()
+
+def median(nums):
+    """Return the median of a non-empty list of numbers."""
+    nums = sorted(nums)
+    mid = len(nums) / 2
+    if len(nums) % 2:
+        return nums[mid]
+    return (nums[mid - 1] + nums[mid]) / 2.0
+
 class Stopwatch(object):
     """Stopwatch provides a simple utility to start/stop your stopwatch multiple
     times.  Each start/stop is equal to a lap, with its elapsed time accumulated
@@ -23,8 +70,33 @@ class Stopwatch(object):
     # Reset the stopwatch as we are about to perform other kind of operations.
     sw.reset()
     ...
+
+    The iterations() generator runs some warm-up laps first, which are not
+    recorded, and, when no lap count is given, keeps going until enough laps
+    have been run for the statistics to be meaningful:
+
+    for i in sw.iterations(count):
+        with sw:
+            ...
+
+    Besides the average, the stopwatch reports the median, the standard
+    deviation, the laps that are outliers by their distance from the median in
+    units of the median absolute deviation (MAD), and a bootstrap confidence
+    interval of the median of the remaining laps.
     """
 
+    # The number of laps run by iterations() before recording laps, and when it
+    # isn't given a count, the minimum wall-clock time and number of laps and
+    # the maximum number of laps.  The defaults can be set with the environment.
+    warmup = int(os.environ.get("LLDB_BENCH_WARMUP", "1"))
+    min_time = float(os.environ.get("LLDB_BENCH_MIN_TIME", "1.0"))
+    min_laps = int(os.environ.get("LLDB_BENCH_MIN_LAPS", "5"))
+    max_laps = int(os.environ.get("LLDB_BENCH_MAX_LAPS", "1000"))
+
+    # A lap is an outlier if its modified z-score, 0.6745 * |x - median| / MAD,
+    # is bigger than this (Iglewicz and Hoaglin).
+    outlier_threshold = 3.5
+
     #############################################################
     #
     # Context manager interfaces to support the 'with' statement.
@@ -44,19 +116,26 @@ class Stopwatch(object):
         self.stop()
 
     def reset(self):
+        # Keep the laps of the previous round of measurements, if any, so that
+        # they can still be recorded once the test is done.
+        runs = getattr(self, '__runs__', [])
+        if getattr(self, '__nums__', None):
+            runs.append(self.__nums__)
+        self.__runs__ = runs
         self.__laps__ = 0
         self.__total_elapsed__ = 0.0
         self.__start__ = None
         self.__stop__ = None
         self.__elapsed__ = 0.0
         self.__nums__ = []
+        self.__warmup_left__ = 0
 
     def __init__(self):
         self.reset()
 
     def start(self):
         if self.__start__ is None:
-            self.__start__ = time.time()
+            self.__start__ = clock()
         else:
             raise Exception("start() already called, did you forget to stop() first?")
         # Return self to facilitate the context manager __enter__ protocol.
@@ -64,15 +143,48 @@ class Stopwatch(object):
 
     def stop(self):
         if self.__start__ is not None:
-            self.__stop__ = time.time()
-            elapsed = self.__stop__ - self.__start__
-            self.__total_elapsed__ += elapsed
-            self.__laps__ += 1
-            self.__nums__.append(elapsed)
+            self.__stop__ = clock()
+            if self.__warmup_left__ > 0:
+                self.__warmup_left__ -= 1
+            else:
+                self.addLap(self.__stop__ - self.__start__)
             self.__start__ = None # Reset __start__ to be None again.
         else:
             raise Exception("stop() called without first start()?")
 
+    def addLap(self, elapsed):
+        """Add a lap that took 'elapsed' seconds."""
+        self.__total_elapsed__ += elapsed
+        self.__laps__ += 1
+        self.__nums__.append(elapsed)
+
+    def iterations(self, count=0, *stopwatches):
+        """
+        Generate the iterations of a benchmark loop: 'warmup' laps that are not
+        recorded by this stopwatch, or the other 'stopwatches' used in the loop,
+        followed by 'count' laps.  If count isn't positive, laps are run until
+        at least 'min_laps' laps have been run and 'min_time' seconds have
+        passed since the first of them, or 'max_laps' laps have been run.
+
+        The time budget is wall-clock time, including the parts of the loop
+        that aren't measured, so that loops with an expensive setup, such as
+        launching a new debugger, don't run many more laps than cheap ones.
+        """
+        for sw in (self,) + stopwatches:
+            sw.__warmup_left__ = self.warmup
+        for i in range(self.warmup):
+            yield i
+        i = 0
+        start = clock()
+        while True:
+            if count > 0:
+                if i >= count:
+                    return
+            elif i >= self.max_laps or (i >= self.min_laps and clock() - start >= self.min_time):
+                return
+            yield self.warmup + i
+            i += 1
+
     def laps(self):
         """Gets the number of laps. One lap is equal to a start/stop action."""
         return self.__laps__
@@ -81,18 +193,86 @@ class Stopwatch(object):
         """Equal to total elapsed time divided by the number of laps."""
         return self.__total_elapsed__ / self.__laps__
 
-    #def sigma(self):
-    #    """Return the standard deviation of the available samples."""
-    #    if self.__laps__ <= 0:
-    #        return None
-    #    return numpy.std(self.__nums__)
+    def sigma(self, reject_outliers=False):
+        """Return the standard deviation of the available samples."""
+        nums = self.inliers() if reject_outliers else self.__nums__
+        if not nums:
+            return None
+        avg = sum(nums) / len(nums)
+        return math.sqrt(sum([(x - avg) ** 2 for x in nums]) / len(nums))
+
+    def median(self):
+        """Return the median of the available samples."""
+        if self.__laps__ <= 0:
+            return None
+        return median(self.__nums__)
+
+    def mad(self):
+        """Return the median absolute deviation from the median of the available samples."""
+        if self.__laps__ <= 0:
+            return None
+        m = median(self.__nums__)
+        return median([abs(x - m) for x in self.__nums__])
+
+    def outliers(self):
+        """Return the samples that are too far from the median, see 'outlier_threshold'."""
+        mad = self.mad()
+        if not mad:
+            return []
+        m = median(self.__nums__)
+        return [x for x in self.__nums__ if 0.6745 * abs(x - m) / mad > self.outlier_threshold]
+
+    def inliers(self):
+        """Return the samples that are not outliers."""
+        outliers = self.outliers()
+        return [x for x in self.__nums__ if x not in outliers]
+
+    def confidenceInterval(self, level=0.95, resamples=1000):
+        """
+        Return the (low, high) bootstrap confidence interval of the median of
+        the samples that are not outliers, at the given confidence level.  The
+        resampling is seeded so the same laps always give the same interval.
+        """
+        nums = self.inliers()
+        if not nums:
+            return None
+        rng = random.Random(0)
+        n = len(nums)
+        medians = sorted([median([nums[rng.randrange(n)] for j in range(n)]) for i in range(resamples)])
+        lo = int(math.floor((1.0 - level) / 2 * (resamples - 1)))
+        hi = int(math.ceil((1.0 + level) / 2 * (resamples - 1)))
+        return (medians[lo], medians[hi])
+
+    def percentile(self, p):
+        """Return the p-th percentile (0 to 100) of the available samples,
+        interpolating between the two closest ranks."""
+        if self.__laps__ <= 0:
+            return None
+        nums = sorted(self.__nums__)
+        rank = (len(nums) - 1) * p / 100.0
+        lo = int(math.floor(rank))
+        hi = min(lo + 1, len(nums) - 1)
+        return nums[lo] + (nums[hi] - nums[lo]) * (rank - lo)
+
+    def runs(self):
+        """Gets the laps of every round of measurements, including the current
+        one, as a list of lists of elapsed times."""
+        if self.__nums__:
+            return self.__runs__ + [self.__nums__]
+        return list(self.__runs__)
 
     def __str__(self):
-        return "Avg: %f (Laps: %d, Total Elapsed Time: %f, min=%f, max=%f)" % (self.avg(),
+        (ci_low, ci_high) = self.confidenceInterval()
+        return "Avg: %f (Laps: %d, Total Elapsed Time: %f, min=%f, max=%f, median=%f, stddev=%f, outliers=%d, 95%% CI=[%f, %f])" % (self.avg(),
                                                                                self.__laps__,
                                                                                self.__total_elapsed__,
                                                                                min(self.__nums__),
-                                                                               max(self.__nums__))
+                                                                               max(self.__nums__),
+                                                                               self.median(),
+                                                                               self.sigma(True),
+                                                                               len(self.outliers()),
+                                                                               ci_low,
+                                                                               ci_high)
 
 class BenchBase(TestBase):
     """
@@ -106,7 +286,52 @@ class BenchBase(TestBase):
 
     def tearDown(self):
         """Fixture for unittest test case teardown."""
+        self.recordStopwatches()
         super(BenchBase, self).tearDown()
         #TestBase.tearDown(self)
         del self.stopwatch
 
+    def recordStopwatches(self):
+        """
+        Append one JSON record for each round of measurements of each Stopwatch
+        attribute of this benchmark to the file named by the LLDB_BENCH_RESULTS
+        environment variable, if it is set.  See also bench.py.
+        """
+        path = os.environ.get("LLDB_BENCH_RESULTS")
+        if not path:
+            return
+        with open(path, "a") as f:
+            for attr, stopwatch in sorted(self.__dict__.items()):
+                if not isinstance(stopwatch, Stopwatch):
+                    continue
+                runs = stopwatch.runs()
+                for (idx, nums) in enumerate(runs):
+                    name = "%s:%s" % (self.id(), attr)
+                    if len(runs) > 1:
+                        name += "#%d" % idx
+                    f.write(json.dumps(benchmarkRecord(name, nums)) + "\n")
+
+def benchmarkRecord(name, nums):
+    """Return a dictionary that describes the laps of one benchmark run."""
+    sw = Stopwatch()
+    for elapsed in nums:
+        sw.addLap(elapsed)
+    return {"name": name,
+            "run_id": os.environ.get("LLDB_BENCH_RUN_ID", ""),
+            "commit": os.environ.get("LLDB_BENCH_COMMIT", ""),
+            "host": os.environ.get("LLDB_BENCH_HOST", ""),
+            "time": time.time(),
+            "laps": nums,
+            "count": sw.laps(),
+            "avg": sw.avg(),
+            "stddev": sw.sigma(),
+            "min": min(nums),
+            "max": max(nums),
+            "p50": sw.percentile(50),
+            "p90": sw.percentile(90),
+            "p99": sw.percentile(99),
+            "median": sw.median(),
+            "mad": sw.mad(),
+            "outliers": len(sw.outliers()),
+            "ci95": sw.confidenceInterval()}
+
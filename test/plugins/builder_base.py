@@ -10,10 +10,21 @@ to define the default CC being used.
 
 Same idea holds for LLDB_ARCH environment variable, which maps to the ARCH make
 variable.
+
+If the LLDB_BUILD_CACHE environment variable is set to a directory, the build
+products of clean builds are saved there, keyed by a hash of the sources, the
+Makefiles, the compiler and the make variables.  A later clean build with the
+same key copies the saved products into the test directory instead of running
+make.  The least recently used builds are removed once the cache grows
+beyond LLDB_BUILD_CACHE_SIZE megabytes (1024 by default).
 """
 
+import hashlib
+import json
 import os
 import platform
+import shutil
+import tempfile
 import lldbtest
 
 def getArchitecture():
@@ -84,40 +95,222 @@ def getCmdLine(d):
     # Note the leading space character.
     return " " + cmdline
 
+# Environment variables that the Makefiles read and so change what gets built.
+buildCacheEnvVarNames = ["ARCH", "CC", "CXX", "CFLAGS", "CFLAGS_EXTRAS", "CXXFLAGS",
+                         "LDFLAGS", "LD_EXTRAS", "ARCHFLAG", "MAKE_DSYM", "SDKROOT",
+                         "TRIPLE", "DEVELOPER_DIR"]
+
+def getBuildCacheDir():
+    """Returns the build cache directory, or None if the cache is disabled"""
+    return os.environ.get("LLDB_BUILD_CACHE")
+
+def getBuildCacheMaxSize():
+    """Returns the maximum size of the build cache in bytes"""
+    return int(os.environ.get("LLDB_BUILD_CACHE_SIZE", "1024")) * 1024 * 1024
+
+def getCompilerIdentity(compiler):
+    """
+    Helper function to return a string that changes whenever the compiler
+    that the make system will use is replaced.
+    """
+    cc = compiler if compiler else getCompiler()
+    paths = [cc]
+    if not os.path.isabs(cc):
+        paths = [os.path.join(d, cc) for d in os.environ.get("PATH", "").split(os.pathsep)]
+    for path in paths:
+        if os.path.isfile(path):
+            st = os.stat(os.path.realpath(path))
+            return "%s %u %u" % (os.path.realpath(path), st.st_size, st.st_mtime)
+    return cc
+
+def getBuildDirSnapshot(build_dir):
+    """
+    Helper function to return a dictionary of the relative paths of all files
+    under build_dir to their (size, mtime), the test scripts are skipped.
+    """
+    snapshot = {}
+    for root, dirs, files in os.walk(build_dir):
+        for name in files:
+            if name.endswith(".py") or name.endswith(".pyc"):
+                continue
+            path = os.path.join(root, name)
+            st = os.lstat(path)
+            snapshot[os.path.relpath(path, build_dir)] = (st.st_size, st.st_mtime)
+    return snapshot
+
+def getBuildCacheKey(build_dir, snapshot, make_command, compiler):
+    """
+    Helper function to return a hash of everything that goes into a build:
+    the sources and Makefile in build_dir, the files in the make directory
+    (Makefile.rules), the compiler, the make command line and the environment
+    variables that the Makefiles read.
+    """
+    sha = hashlib.sha1()
+    make_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "make")
+    inputs = [(relpath, os.path.join(build_dir, relpath)) for relpath in sorted(snapshot.keys())]
+    inputs += [(os.path.join("make", name), os.path.join(make_dir, name)) for name in sorted(os.listdir(make_dir))]
+    for (relpath, path) in inputs:
+        sha.update(relpath + "\0")
+        if os.path.islink(path):
+            sha.update(os.readlink(path) + "\0")
+        elif os.path.isfile(path):
+            with open(path, "rb") as f:
+                sha.update(f.read())
+            sha.update("\0")
+    sha.update(getCompilerIdentity(compiler) + "\0")
+    sha.update(make_command + "\0")
+    sha.update(platform.platform() + "\0")
+    for name in buildCacheEnvVarNames:
+        sha.update("%s=%s\0" % (name, os.environ.get(name, "")))
+    return sha.hexdigest()
+
+def restoreFromBuildCache(cache_dir, key, build_dir):
+    """
+    Helper function to copy the build products cached under key into
+    build_dir.  Returns False if there is no such cache entry, or if it was
+    evicted while being copied.
+    """
+    entry_dir = os.path.join(cache_dir, key)
+    try:
+        with open(os.path.join(entry_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        # Mark the entry as recently used first, so that other test runs are
+        # unlikely to pick it for eviction while it is being copied.
+        os.utime(entry_dir, None)
+    except (IOError, OSError, ValueError):
+        return False
+    # Copy rather than hard link the files, so that a test that modifies
+    # its build products in place cannot corrupt the cache entry.
+    restored = []
+    try:
+        for relpath in manifest["files"]:
+            src = os.path.join(entry_dir, "files", relpath)
+            dst = os.path.join(build_dir, relpath)
+            if not os.path.isdir(os.path.dirname(dst)):
+                os.makedirs(os.path.dirname(dst))
+            if os.path.lexists(dst):
+                os.remove(dst)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            else:
+                shutil.copy2(src, dst)
+            restored.append(dst)
+    except (IOError, OSError):
+        # The entry was evicted, don't leave a partial build behind for make
+        # to consider up to date.
+        for dst in restored:
+            try:
+                os.remove(dst)
+            except OSError:
+                pass
+        return False
+    return True
+
+def storeInBuildCache(cache_dir, key, build_dir, snapshot):
+    """
+    Helper function to copy the files that the build created or changed in
+    build_dir into a new cache entry, and evict the least recently used
+    entries if the cache has grown too big.
+    """
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    # Fill a temporary directory and rename it into place so that concurrent
+    # test runs sharing the cache never see a partial entry.
+    temp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    products = []
+    size = 0
+    for (relpath, stat) in sorted(getBuildDirSnapshot(build_dir).items()):
+        if snapshot.get(relpath) == stat:
+            continue
+        src = os.path.join(build_dir, relpath)
+        dst = os.path.join(temp_dir, "files", relpath)
+        if not os.path.isdir(os.path.dirname(dst)):
+            os.makedirs(os.path.dirname(dst))
+        if os.path.islink(src):
+            os.symlink(os.readlink(src), dst)
+        else:
+            shutil.copy2(src, dst)
+            size += stat[0]
+        products.append(relpath)
+    with open(os.path.join(temp_dir, "manifest.json"), "w") as f:
+        json.dump({"files" : products, "size" : size}, f)
+    try:
+        os.rename(temp_dir, os.path.join(cache_dir, key))
+    except OSError:
+        # Another test run stored the same build first.
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    evictFromBuildCache(cache_dir, getBuildCacheMaxSize())
+
+def evictFromBuildCache(cache_dir, max_size):
+    """Remove the least recently used cache entries until the cache fits in max_size bytes"""
+    entries = []
+    total_size = 0
+    for name in os.listdir(cache_dir):
+        # Skip the entries that are being stored or evicted.
+        if name.startswith("."):
+            continue
+        entry_dir = os.path.join(cache_dir, name)
+        try:
+            with open(os.path.join(entry_dir, "manifest.json")) as f:
+                size = json.load(f)["size"]
+            entries.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+        except (IOError, OSError, ValueError):
+            continue
+        total_size += size
+    for (mtime, size, entry_dir) in sorted(entries):
+        if total_size <= max_size:
+            break
+        # Rename the entry out of the way in one step before removing it, so
+        # that a concurrent restoreFromBuildCache() never finds a manifest
+        # whose files are half deleted, and one that is already copying the
+        # entry fails cleanly and falls back to running make.
+        evict_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".evict-")
+        try:
+            os.rename(entry_dir, os.path.join(evict_dir, "entry"))
+        except OSError:
+            # Another test run evicted it first.
+            pass
+        shutil.rmtree(evict_dir, ignore_errors=True)
+        total_size -= size
+
+def runMake(sender, make_args, compiler, dictionary, clean):
+    """
+    Helper function to run make with make_args, after 'make clean' if clean
+    is True.  When the LLDB_BUILD_CACHE environment variable names a
+    directory, clean builds are looked up in that cache and only run make on
+    a miss.
+    """
+    make_command = getMake() + make_args
+    clean_command = getMake() + "clean" + getCmdLine(dictionary)
+    cache_dir = getBuildCacheDir()
+    if not clean:
+        lldbtest.system(["/bin/sh", "-c", make_command], sender=sender)
+    elif not cache_dir:
+        lldbtest.system(["/bin/sh", "-c", clean_command + ";" + make_command], sender=sender)
+    else:
+        lldbtest.system(["/bin/sh", "-c", clean_command], sender=sender)
+        build_dir = os.getcwd()
+        snapshot = getBuildDirSnapshot(build_dir)
+        key = getBuildCacheKey(build_dir, snapshot, make_command, compiler)
+        if not restoreFromBuildCache(cache_dir, key, build_dir):
+            lldbtest.system(["/bin/sh", "-c", make_command], sender=sender)
+            storeInBuildCache(cache_dir, key, build_dir, snapshot)
+
 
 def buildDefault(sender=None, architecture=None, compiler=None, dictionary=None, clean=True):
     """Build the binaries the default way."""
-    if clean:
-        lldbtest.system(["/bin/sh", "-c",
-                         getMake() + "clean" + getCmdLine(dictionary) + ";"
-                         + getMake()
-                         + getArchSpec(architecture) + getCCSpec(compiler)
-                         + getCmdLine(dictionary)],
-                        sender=sender)
-    else:
-        lldbtest.system(["/bin/sh", "-c",
-                         getMake() + getArchSpec(architecture) + getCCSpec(compiler)
-                         + getCmdLine(dictionary)],
-                        sender=sender)
+    runMake(sender,
+            getArchSpec(architecture) + getCCSpec(compiler) + getCmdLine(dictionary),
+            compiler, dictionary, clean)
 
     # True signifies that we can handle building default.
     return True
 
 def buildDwarf(sender=None, architecture=None, compiler=None, dictionary=None, clean=True):
     """Build the binaries with dwarf debug info."""
-    if clean:
-        lldbtest.system(["/bin/sh", "-c",
-                         getMake() + "clean" + getCmdLine(dictionary)
-                         + ";" + getMake() + "MAKE_DSYM=NO"
-                         + getArchSpec(architecture) + getCCSpec(compiler)
-                         + getCmdLine(dictionary)],
-                        sender=sender)
-    else:
-        lldbtest.system(["/bin/sh", "-c",
-                         getMake() + "MAKE_DSYM=NO"
-                         + getArchSpec(architecture) + getCCSpec(compiler)
-                         + getCmdLine(dictionary)],
-                        sender=sender)
+    runMake(sender,
+            "MAKE_DSYM=NO" + getArchSpec(architecture) + getCCSpec(compiler) + getCmdLine(dictionary),
+            compiler, dictionary, clean)
 
     # True signifies that we can handle building dwarf.
     return True